@@ -1,5 +1,5 @@
 import os
-from flask import Flask, g, send_from_directory
+from flask import Flask, g, request, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from config import Config
@@ -11,6 +11,9 @@ BASE_DIR = os.path.dirname(__file__)
 FRONTEND_BUILD_DIR = os.path.normpath(os.path.join(BASE_DIR, '..', 'frontend', 'build'))
 
 
+# Request header selecting a batch for just that request
+BATCH_HEADER = "X-Batch-Id"
+
 db = SQLAlchemy()
 mail = Mail()
 
@@ -37,9 +40,32 @@ def create_app(serve_frontend: bool = True):
     # -------------------------------------------------
     # Attach active batch to every request
     # -------------------------------------------------
+    # An admin request may name another registered batch than the global
+    # default (X-Batch-Id header or ?batch_id=), so one admin can review last
+    # year while marks are entered for the new one without a global switch.
+    # Other callers are refused; requests without a usable token keep the
+    # default and are left to token_required.
     @app.before_request
     def load_active_batch():
         g.active_batch = get_active_batch()
+        g.batch_override = False
+        requested = (request.headers.get(BATCH_HEADER) or request.args.get("batch_id") or "").strip()
+        if not requested:
+            return None
+
+        from auth import request_principal
+        principal = request_principal()
+        if principal is None:
+            return None
+        if str(principal.user_type or "").upper() != "ADMIN":
+            return {"error": "Only admins can select a batch per request"}, 403
+
+        from services.batch_registry import is_registered
+        if not is_registered(requested):
+            return {"error": f"Unknown batch: {requested}"}, 400
+        g.active_batch = requested
+        g.batch_override = True
+        return None
 
     # ---------------- Blueprints ----------------
     from routes.teacher_routes import teacher_bp
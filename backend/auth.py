@@ -7,7 +7,8 @@ import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from config import Config
 from app import db
-from models import Teacher, TeacherSubjectAllocation, Subject, Admin
+from models import Teacher, TeacherSubjectAllocation, Admin
+from services import subject_catalog, principal_cache
 
 # Utility functions used by tests and other modules
 def hash_password(password: str) -> str:
@@ -40,6 +41,23 @@ def verify_token(token: str):
     except Exception:
         return None
 
+
+def request_principal():
+    """
+    Principal behind the request's bearer token, or None when there is no
+    token or it is invalid, expired or for an inactive user. Used outside
+    token_required (e.g. by the per-request batch hook in app.py).
+    """
+    header = request.headers.get("Authorization") or ""
+    parts = header.split(" ")
+    if len(parts) < 2 or not parts[1]:
+        return None
+    data = verify_token(parts[1])
+    if not isinstance(data, dict):
+        return None
+    role = (data.get("role") or data.get("user_type") or "").upper()
+    return principal_cache.get_principal(role, data.get("user_id"))
+
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 # ======================================================
@@ -67,30 +85,12 @@ def token_required(f):
             )
             if not isinstance(data, dict):
                 data = {}
-            # Support tokens issued for both teachers and admins.
-            # Prefer Admin lookup when token indicates ADMIN role to avoid id collisions.
+            # Support tokens issued for both teachers and admins
+            # (cached briefly; see services/principal_cache.py)
             role = (data.get("role") or data.get("user_type") or "").upper()
-            user = None
-            if role == "ADMIN":
-                user = Admin.query.get(data.get("user_id"))
-            else:
-                user = Teacher.query.get(data.get("user_id"))
+            principal = principal_cache.get_principal(role, data.get("user_id"))
 
-            # If role was ADMIN but admin record not found, fallback to Teacher only if present
-            if role == "ADMIN" and user is None:
-                user = Teacher.query.get(data.get("user_id"))
-
-            # Debug logging to assist with tracing token/user resolution during development
-            try:
-                print(f"[auth.token_required] token data={data}, role={role}, resolved_user={user}")
-            except Exception:
-                pass
-
-            # If teacher lookup failed and role indicates ADMIN, try Admin table
-            if user is None and role == "ADMIN":
-                user = Admin.query.get(data.get("user_id"))
-
-            if not user or not getattr(user, "active", True):
+            if principal is None:
                 return {"error": "Invalid or inactive user"}, 401
 
         except jwt.ExpiredSignatureError:
@@ -98,13 +98,9 @@ def token_required(f):
         except Exception:
             return {"error": "Invalid token"}, 401
 
-        # extra-safety: ensure `user` is defined and not None for static checkers
-        if user is None:
-            return {"error": "Invalid or inactive user"}, 401
-
         return f(
-            user_id=getattr(user, "teacher_id", None) or getattr(user, "admin_id", None),
-            user_type=getattr(user, "role", role),
+            user_id=principal.user_id,
+            user_type=principal.user_type,
             *args,
             **kwargs
         )
@@ -184,7 +180,7 @@ def me(user_id=None, user_type=None):
 
     allocation_data = []
     for alloc in allocations:
-        subject = Subject.query.get(alloc.subject_id)
+        subject = subject_catalog.get_subject(alloc.subject_id)
         if subject:
             allocation_data.append({
                 "subject_id": subject.subject_id,
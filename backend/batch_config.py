@@ -1,7 +1,20 @@
 # backend/batch_config.py
+"""
+Active academic batch, persisted in active_batch.json.
+
+The value is held in memory: `get_active_batch()` (called by every request)
+reads it without locking or touching the file. `set_active_batch()` updates
+it immediately in this process and replaces the file atomically; other
+worker processes pick the switch up through a daemon thread that stats the
+file every WATCH_INTERVAL_SECONDS and reloads it when its (inode, mtime)
+changes.
+"""
 import json
 import os
+import tempfile
 import threading
+import time
+import traceback
 
 ACTIVE_BATCH_FILE = os.path.join(
     os.path.dirname(__file__),
@@ -11,23 +24,93 @@ ACTIVE_BATCH_FILE = os.path.join(
 _batch_lock = threading.Lock()
 DEFAULT_BATCH = "2024"
 
+# How often the watcher checks active_batch.json for switches made by other
+# processes (<= 0 disables the watcher)
+WATCH_INTERVAL_SECONDS = float(os.getenv("ACTIVE_BATCH_WATCH_SECONDS", "1.0"))
 
-def get_active_batch() -> str:
-    """
-    Returns the currently active academic batch/year.
-    """
+# (batch_id, file version); replaced as a whole, never mutated, so readers
+# need no lock
+_state = None
+_watcher = None
+
+
+def _file_version():
+    try:
+        st = os.stat(ACTIVE_BATCH_FILE)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns)
+
+
+def _write(batch_id: str):
+    # caller holds _batch_lock
+    global _state
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(ACTIVE_BATCH_FILE), prefix=".active_batch", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"active_batch": str(batch_id)}, f, indent=2)
+        os.replace(tmp_path, ACTIVE_BATCH_FILE)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _state = (str(batch_id), _file_version())
+
+
+def _load():
+    # caller holds _batch_lock
+    global _state
+    version = _file_version()
+    if version is None:
+        _write(DEFAULT_BATCH)
+        return
+
+    try:
+        with open(ACTIVE_BATCH_FILE, "r") as f:
+            data = json.load(f)
+        _state = (data.get("active_batch", DEFAULT_BATCH), version)
+    except Exception:
+        _write(DEFAULT_BATCH)
+
+
+def refresh():
+    """Reload the active batch if active_batch.json changed on disk."""
     with _batch_lock:
-        if not os.path.exists(ACTIVE_BATCH_FILE):
-            set_active_batch(DEFAULT_BATCH)
-            return DEFAULT_BATCH
+        if _state is None or _state[1] != _file_version():
+            _load()
 
+
+def _watch():
+    while True:
+        time.sleep(WATCH_INTERVAL_SECONDS)
         try:
-            with open(ACTIVE_BATCH_FILE, "r") as f:
-                data = json.load(f)
-                return data.get("active_batch", DEFAULT_BATCH)
+            refresh()
         except Exception:
-            set_active_batch(DEFAULT_BATCH)
-            return DEFAULT_BATCH
+            traceback.print_exc()
+
+
+def _start_watcher():
+    global _watcher
+    if WATCH_INTERVAL_SECONDS <= 0:
+        return
+    with _batch_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=_watch, name="active-batch-watch", daemon=True)
+            _watcher.start()
+
+
+def get_active_batch() -> str:
+    """
+    Returns the currently active academic batch/year.
+    """
+    state = _state
+    if state is None:
+        refresh()
+        _start_watcher()
+        state = _state
+    return state[0]
 
 
 def set_active_batch(batch_id: str):
@@ -38,5 +121,4 @@ def set_active_batch(batch_id: str):
         raise ValueError("batch_id cannot be empty")
 
     with _batch_lock:
-        with open(ACTIVE_BATCH_FILE, "w") as f:
-            json.dump({"active_batch": str(batch_id)}, f, indent=2)
+        _write(batch_id)
@@ -40,6 +40,38 @@ CORS_ORIGINS = os.getenv(
 # Default increased to 20 (can be overridden via .env)
 GRACE_MAX = int(os.getenv("GRACE_MAX", "20"))
 
+# --------------------------------------------------
+# Background Result Generation
+# --------------------------------------------------
+# Worker threads used by services/result_jobs.py
+RESULT_JOB_WORKERS = int(os.getenv("RESULT_JOB_WORKERS", "2"))
+# Worker threads used when regenerating a whole batch at once
+RESULT_BATCH_WORKERS = int(os.getenv("RESULT_BATCH_WORKERS", "4"))
+
+# --------------------------------------------------
+# Excel Export Cache
+# --------------------------------------------------
+# Rendered /admin/results/export-excel workbooks, reused until the batch's
+# data changes; oldest files are evicted once the directory exceeds the cap
+EXPORT_CACHE_DIR = os.getenv(
+    "EXPORT_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "export_cache")
+)
+EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "200"))
+
+# --------------------------------------------------
+# Bulk Marksheet PDFs
+# --------------------------------------------------
+# Worker processes rendering per-student PDFs for /admin/results/marksheets
+MARKSHEET_PDF_WORKERS = int(os.getenv("MARKSHEET_PDF_WORKERS", "4"))
+# Below this many students the job renders inline (no process pool start-up)
+MARKSHEET_PDF_POOL_MIN = int(os.getenv("MARKSHEET_PDF_POOL_MIN", "60"))
+# Finished bulk PDFs / zips kept here until their job is trimmed
+MARKSHEET_PDF_DIR = os.getenv(
+    "MARKSHEET_PDF_DIR",
+    os.path.join(EXPORT_CACHE_DIR, "marksheets")
+)
+
 # --------------------------------------------------
 # Master Excel Configuration (Optional)
 # --------------------------------------------------
@@ -1,14 +1,18 @@
 """
 db_utils.py
 
-Utility helpers used by the backend. This file now only contains a
-graceful restart helper previously shared by the multi-database flow.
+Utility helpers used by the backend: a graceful restart helper previously
+shared by the multi-database flow, and a dialect-aware bulk upsert used by
+the set-based write paths (with `count_existing` to tell its inserts from
+its updates).
 """
 import os
 import signal
 import threading
 import time
 
+from sqlalchemy import func, select, tuple_
+
 _restart_lock = threading.Lock()
 _restart_scheduled = False
 
@@ -38,3 +42,67 @@ def schedule_restart(delay_seconds: int = 1):
 
     t = threading.Thread(target=_restart, daemon=True)
     t.start()
+
+
+def bulk_upsert(session, model, rows, key_columns, update_columns):
+    """Insert `rows` into `model`'s table, updating `update_columns` on key clashes.
+
+    `rows` is a list of dicts with identical keys. `key_columns` must match a
+    unique constraint of the table. MySQL uses ``INSERT ... ON DUPLICATE KEY
+    UPDATE`` and SQLite uses ``INSERT ... ON CONFLICT DO UPDATE``; both run as
+    a single executemany. Other dialects fall back to one ORM merge per row.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {c: stmt.inserted[c] for c in update_columns}
+        )
+        session.execute(stmt, rows)
+        return
+
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+        session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        existing = session.query(model).filter_by(
+            **{c: row[c] for c in key_columns}
+        ).first()
+        if existing is None:
+            session.add(model(**row))
+        else:
+            for c in update_columns:
+                setattr(existing, c, row[c])
+
+
+def count_existing(session, model, rows, key_columns, chunk_size=500):
+    """Number of `rows` whose `key_columns` values already exist in `model`'s table.
+
+    Run before `bulk_upsert` in the same transaction, ``len(rows) - count``
+    is the number of rows the upsert inserts. Keys are looked up in chunks
+    of `chunk_size` through the unique index.
+    """
+    table = model.__table__
+    key = tuple_(*(table.c[c] for c in key_columns))
+    found = 0
+    for i in range(0, len(rows), chunk_size):
+        keys = [tuple(row[c] for c in key_columns) for row in rows[i:i + chunk_size]]
+        found += session.execute(
+            select(func.count()).select_from(table).where(key.in_(keys))
+        ).scalar()
+    return found
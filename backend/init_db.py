@@ -99,6 +99,15 @@ def init_database():
             # Extended test data should be seeded explicitly using `seed_data.py`
             # or `scripts/populate_sample_data.py` when needed.
         
+        # Move batches from the legacy registry.json into batch_registry (idempotent)
+        try:
+            from services.batch_registry import import_legacy_registry
+            added = import_legacy_registry()
+            print(f"[OK] Batch registry ready ({added} batches added)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[WARN] Warning: Could not import batch registry: {e}")
+
         # Ensure active batch persistence exists and is current
         try:
             current = get_active_batch()
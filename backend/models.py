@@ -194,6 +194,8 @@ class Student(db.Model):
             "batch_id", "roll_no", "division",
             name="uq_batch_roll_div"
         ),
+        # division listings ordered by roll no
+        db.Index("ix_students_batch_div_roll", "batch_id", "division", "roll_no"),
     )
 
 
@@ -239,12 +241,21 @@ class Mark(db.Model):
             "batch_id", "roll_no", "division", "subject_id",
             name="uq_batch_roll_div_sub"
         ),
+        # division scans and per-subject mark lists; per-student lookups are
+        # served by the unique key above
+        db.Index("ix_marks_batch_div_subject", "batch_id", "division", "subject_id"),
     )
 
     # ✅ VALIDATION: prevent PE / EVS numeric marks
     @validates("subject_id")
     def validate_subject(self, key, subject_id):
-        subject = Subject.query.get(subject_id)
+        # Resolved from the in-memory catalog; only subjects it has not seen
+        # yet (e.g. created earlier in this transaction) cost a query
+        from services import subject_catalog
+
+        subject = subject_catalog.get_subject(subject_id)
+        if subject is None:
+            subject = Subject.query.get(subject_id)
 
         if not subject:
             raise ValueError("Invalid subject")
@@ -313,6 +324,8 @@ class Result(db.Model):
             "batch_id", "roll_no", "division",
             name="uq_batch_result"
         ),
+        # division summaries and toppers (published count, avg/order by percentage)
+        db.Index("ix_results_batch_div_pub_pct", "batch_id", "division", "is_published", "percentage"),
     )
 
     def get_subject_data(self, code):
@@ -344,3 +357,84 @@ class Result(db.Model):
 
     def __repr__(self):
         return f"<Result roll={self.roll_no} div={self.division}>"
+
+
+# =====================================================
+# RESULT WATERMARKS (LAST GENERATION PER DIVISION)
+# =====================================================
+class ResultWatermark(db.Model):
+    """
+    Fingerprint of the marks/students a division's results were last
+    generated from. Reads compare it with the live fingerprint and skip
+    regeneration when nothing changed.
+    """
+    __tablename__ = "result_watermarks"
+
+    watermark_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    batch_id = db.Column(db.String(10), nullable=False)
+    division = db.Column(db.String(10), nullable=False)
+
+    fingerprint = db.Column(db.String(255), nullable=False)
+    generated_at = db.Column(db.DateTime, default=now, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "batch_id", "division",
+            name="uq_watermark_batch_div"
+        ),
+    )
+
+
+class DivisionVersion(db.Model):
+    """
+    Per-division write counter. services/batch_registry.py bumps it in the
+    same transaction as every student or mark write of the division, so it
+    changes even when an edit leaves the division's aggregates (counts,
+    sums, second-precision updated_at) as they were. Part of the result
+    watermark fingerprint.
+    """
+    __tablename__ = "division_versions"
+
+    batch_id = db.Column(db.String(10), primary_key=True)
+    division = db.Column(db.String(10), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=now, onupdate=now, nullable=False)
+
+
+# =====================================================
+# BATCH REGISTRY
+# =====================================================
+class BatchRegistry(db.Model):
+    """
+    One row per academic batch. The row counts are kept current by
+    services/batch_registry.py in every transaction that writes students,
+    marks or results of the batch, so listing batches never scans them.
+    """
+    __tablename__ = "batch_registry"
+
+    batch_id = db.Column(db.String(10), primary_key=True)
+    description = db.Column(db.String(255))
+    is_active = db.Column(db.Boolean, default=False, nullable=False, index=True)
+    created_by = db.Column(db.String(50))
+
+    student_count = db.Column(db.Integer, default=0, nullable=False)
+    mark_count = db.Column(db.Integer, default=0, nullable=False)
+    result_count = db.Column(db.Integer, default=0, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=now, nullable=False)
+    updated_at = db.Column(db.DateTime, default=now, onupdate=now, nullable=False)
+
+    def to_dict(self):
+        return {
+            "batch_id": self.batch_id,
+            "description": self.description or "",
+            "is_active": bool(self.is_active),
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "student_count": self.student_count or 0,
+            "mark_count": self.mark_count or 0,
+            "result_count": self.result_count or 0,
+        }
+
+    def __repr__(self):
+        return f"<BatchRegistry {self.batch_id}>"
@@ -1,23 +1,36 @@
 # backend/routes/admin_routes.py
 
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, current_app
 
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func, Integer
 
 from app import db
-from typing import Any, Dict, Optional, cast
+from typing import Any, Dict, cast
 from auth import generate_token
 from models import (
     Teacher,
     Subject,
     Student,
-    TeacherSubjectAllocation
+    TeacherSubjectAllocation,
+    BatchRegistry
 )
 from schemas import StudentSchema
 from auth import token_required
 from decorators import admin_required
-from services.result_service import generate_results_for_division
+from services.result_service import (
+    generate_results_for_division,
+    generate_results_for_batch,
+    ensure_results_for_division,
+)
+from services.result_jobs import result_jobs, enqueue_division_results
+from services.marksheet_jobs import marksheet_jobs
+from services import batch_registry
+from services.marksheet_pdf import BULK_FORMATS, reportlab_available, render_pdf, marksheet_data
+from services.master_excel import lookup_master_marks
+from services.result_read_model import build_division_rows, build_student_row, catalog_codes
+from services import subject_catalog
+from services.student_import import import_students as import_student_workbook
 from batch_config import get_active_batch, set_active_batch
 from models import Result, Subject, Mark
 from flask import send_file
@@ -26,18 +39,7 @@ import os
 import json
 from datetime import datetime
 import math
-
-letter: Optional[Any] = None
-canvas_module: Optional[Any] = None
-try:
-    import importlib
-    _rl_pages = importlib.import_module('reportlab.lib.pagesizes')
-    _rl_canvas = importlib.import_module('reportlab.pdfgen.canvas')
-    letter = getattr(_rl_pages, 'letter', None)
-    canvas_module = _rl_canvas
-except Exception:
-    letter = None
-    canvas_module = None
+import time
 
 from werkzeug.security import generate_password_hash
 from email_utils import send_teacher_credentials_email
@@ -47,18 +49,6 @@ admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
 student_schema = StudentSchema()
 
-SUBJECT_ORDER = {
-    "ENG": 1,
-    "HINDI": 2, "IT": 2,
-    "ECO": 3,
-    "BK": 4,
-    "OC": 5,
-    "MATHS": 6, "SP": 6,
-    "EVS": 7,
-    "PE": 8
-}
-
-
 # ======================================================
 # 1️⃣ Add Student
 # ======================================================
@@ -237,7 +227,7 @@ def list_allocations(user_id=None, user_type=None):
     result = []
     for a in allocations:
         teacher = Teacher.query.get(a.teacher_id)
-        subj = Subject.query.get(a.subject_id)
+        subj = subject_catalog.get_subject(a.subject_id)
         result.append({
             "allocation_id": a.allocation_id,
             "teacher_id": a.teacher_id,
@@ -259,17 +249,77 @@ def list_allocations(user_id=None, user_type=None):
 @admin_required
 def generate_results(user_id=None, user_type=None):
     """
-    Generate / update results for a division (admin only)
+    Generate / update results for a division (admin only).
+
+    Send {"all_divisions": true} instead of a division to regenerate every
+    division of the active batch in parallel; the response then lists
+    per-division row counts and timings.
     """
-    division = (request.json or {}).get("division")
+    data = request.json or {}
+    batch_id = g.active_batch
+
+    if data.get("all_divisions"):
+        started = time.perf_counter()
+        try:
+            divisions = generate_results_for_batch(batch_id)
+        except Exception as ex:
+            db.session.rollback()
+            return {"error": "Failed to generate results", "details": str(ex)}, 500
+        return jsonify({
+            "message": f"Results generated for {len(divisions)} divisions",
+            "batch_id": batch_id,
+            "divisions": divisions,
+            "total_results": sum(d["results"] for d in divisions),
+            "seconds": round(time.perf_counter() - started, 3),
+        }), 200
+
+    division = data.get("division")
     if not division:
         return {"error": "division is required"}, 400
 
-    generate_results_for_division(division, g.active_batch)
+    generate_results_for_division(division, batch_id)
 
     return {"message": f"Results generated for division {division}"}, 200
 
 
+# ======================================================
+# 5.1 Background result-generation jobs
+# ======================================================
+@admin_bp.route("/results/jobs", methods=["POST"])
+@token_required
+@admin_required
+def enqueue_result_job(user_id=None, user_type=None):
+    """
+    Queue regeneration of a division in the background (admin only).
+    Returns the job, merged with an already queued one for the same division.
+    """
+    division = (request.json or {}).get("division")
+    if not division:
+        return {"error": "division is required"}, 400
+
+    job = enqueue_division_results(division, g.active_batch)
+    return jsonify(job), 202
+
+
+@admin_bp.route("/results/jobs", methods=["GET"])
+@token_required
+@admin_required
+def list_result_jobs(user_id=None, user_type=None):
+    """List queued, running and recently finished result jobs (newest first)."""
+    status = request.args.get("status")
+    return jsonify(result_jobs.list(status=status)), 200
+
+
+@admin_bp.route("/results/jobs/<int:job_id>", methods=["GET"])
+@token_required
+@admin_required
+def get_result_job(job_id, user_id=None, user_type=None):
+    job = result_jobs.get(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    return jsonify(job), 200
+
+
 # ======================================================
 # 6️⃣ Get available divisions (admin)
 # ======================================================
@@ -296,78 +346,48 @@ def list_divisions(user_id=None, user_type=None):
 @token_required
 @admin_required
 def list_batches(user_id=None, user_type=None):
-    """Return available batches and currently active batch.
-
-    Prefer the persisted registry.json if present so admins can view
-    previously created batches and their metadata.
+    """Return registered batches (with student/mark/result counts) and the
+    globally active batch, from the batch_registry table. A batch selected
+    for this request only (X-Batch-Id / ?batch_id=) is reported separately
+    as `batch_override`.
     """
-    reg_path = os.path.join(os.path.dirname(__file__), '..', 'registry.json')
-    active = None
     try:
-        active = g.active_batch
+        active = get_active_batch()
     except Exception:
-        try:
-            active = get_active_batch()
-        except Exception:
-            active = None
-
-    if os.path.exists(reg_path):
-        try:
-            with open(reg_path, 'r', encoding='utf-8') as f:
-                reg = json.load(f)
-            batches = reg.get('batches', [])
-            return jsonify({"batches": batches, "active_batch": active}), 200
-        except Exception:
-            pass
-
-    # Fallback: derive batches from existing Student.batch_id values
-    batches = Student.query.with_entities(Student.batch_id).distinct().all()  # type: ignore[attr-defined]
-    batch_list = [b[0] for b in batches if b[0] is not None]
-    return jsonify({"batches": batch_list, "active_batch": active}), 200
-
-
+        active = None
+    override = g.active_batch if getattr(g, "batch_override", False) else None
 
+    batches = [b.to_dict() for b in batch_registry.list_batches()]
+    return jsonify({"batches": batches, "active_batch": active, "batch_override": override}), 200
 
 
 @admin_bp.route('/batches/create', methods=['POST'])
 @token_required
 @admin_required
 def create_batch(user_id=None, user_type=None):
-    """Create/register a new batch (admin only). This records the batch
-    in backend/registry.json and does not modify data; seeding can be
-    performed separately via `seed_data.py`.
+    """Create/register a new batch (admin only). This adds a batch_registry
+    row and does not modify data; seeding can be performed separately via
+    `seed_data.py`.
     """
     data = request.json or {}
     batch_id = data.get('batch_id') or data.get('batch')
     if not batch_id or not str(batch_id).strip():
         return {"error": "batch_id is required"}, 400
+    batch_id = str(batch_id).strip()
+    if len(batch_id) > BatchRegistry.batch_id.type.length:
+        return {"error": f"batch_id must be at most {BatchRegistry.batch_id.type.length} characters"}, 400
 
-    reg_path = os.path.join(os.path.dirname(__file__), '..', 'registry.json')
     try:
-        if os.path.exists(reg_path):
-            with open(reg_path, 'r', encoding='utf-8') as f:
-                reg = json.load(f)
-        else:
-            reg = {"batches": []}
-
-        batches = reg.get('batches', [])
-        # Avoid duplicates
-        if any(b.get('batch_id') == batch_id for b in batches):
-            return {"error": "batch already exists"}, 409
-
-        entry = {
-            "batch_id": str(batch_id),
-            "created_at": datetime.utcnow().isoformat(),
-            "is_active": False,
-            "created_by": user_id or 'admin'
-        }
-        batches.append(entry)
-        reg['batches'] = batches
-        with open(reg_path, 'w', encoding='utf-8') as f:
-            json.dump(reg, f, indent=2)
-
-        return {"success": True, "batch": entry}, 201
+        # the primary key makes concurrent creates of the same batch safe
+        entry = batch_registry.register_batch(
+            batch_id, created_by=user_id or 'admin', description=data.get('description')
+        )
+        return {"success": True, "batch": entry.to_dict()}, 201
+    except IntegrityError:
+        db.session.rollback()
+        return {"error": "batch already exists"}, 409
     except Exception as e:
+        db.session.rollback()
         return {"error": "Failed to register batch", "details": str(e)}, 500
 
 
@@ -375,39 +395,32 @@ def create_batch(user_id=None, user_type=None):
 @token_required
 @admin_required
 def switch_batch_with_registry(user_id=None, user_type=None):
-    """Switch active batch and update registry.json to mark active batch."""
+    """Switch active batch and flag it (only it) active in the batch registry."""
     data = request.json or {}
     batch_id = data.get('batch_id')
     if not batch_id:
         return {"error": "batch_id is required"}, 400
 
+    previous = get_active_batch()
     try:
-        # Persist active batch
-        set_active_batch(batch_id)
+        # Registry first: if it fails, the active batch file is untouched
+        batch_registry.mark_active(batch_id)
+    except Exception as ex:
+        db.session.rollback()
+        return {"error": "Failed to set active batch", "details": str(ex)}, 500
 
-        # Update registry.json active flags if present
-        reg_path = os.path.join(os.path.dirname(__file__), '..', 'registry.json')
-        if os.path.exists(reg_path):
-            with open(reg_path, 'r', encoding='utf-8') as f:
-                reg = json.load(f)
-            changed = False
-            for b in reg.get('batches', []):
-                if b.get('batch_id') == batch_id:
-                    if not b.get('is_active'):
-                        b['is_active'] = True
-                        changed = True
-                else:
-                    if b.get('is_active'):
-                        b['is_active'] = False
-                        changed = True
-            if changed:
-                with open(reg_path, 'w', encoding='utf-8') as f:
-                    json.dump(reg, f, indent=2)
-
-        return {"message": f"Active batch set to {batch_id}"}, 200
+    try:
+        set_active_batch(batch_id)
     except Exception as ex:
+        # put the registry flag back on the batch that is still active
+        try:
+            batch_registry.mark_active(previous)
+        except Exception:
+            db.session.rollback()
         return {"error": "Failed to set active batch", "details": str(ex)}, 500
 
+    return {"message": f"Active batch set to {batch_id}"}, 200
+
 
 # ======================================================
 # 7️⃣ Fetch results by division or roll_no (admin)
@@ -419,9 +432,6 @@ def switch_batch_with_registry(user_id=None, user_type=None):
 def fetch_results(user_id=None, user_type=None):
     roll_no = request.args.get("roll_no")
     division = request.args.get("division")
-    # function-scoped default to avoid UnboundLocalError when different branches
-    # conditionally set this variable later.
-    excel_marks = None
 
     # If roll_no provided, optionally restrict by division
     if roll_no:
@@ -432,257 +442,29 @@ def fetch_results(user_id=None, user_type=None):
         if not students:
             return {"error": "Student not found"}, 404
 
-        # Ensure results are generated for involved divisions
-        for s in students:
+        # Ensure results are up-to-date for involved divisions (skipped when
+        # no marks changed since the last generation)
+        for div in {s.division for s in students}:
             try:
-                generate_results_for_division(s.division, g.active_batch)
+                ensure_results_for_division(div, g.active_batch)
             except Exception:
-                pass
+                db.session.rollback()
 
-        # Build rows for each matching student (usually one)
+        # Build rows for each matching student (usually one), like the division table
+        code_by_id, core_codes = catalog_codes()
+        subject_ids_by_code = {code: sid for sid, code in code_by_id.items()}
         rows = []
-        # Prefer master Excel file data if available
-        from config import MASTER_EXCEL_PATH, MASTER_EXCEL_SHEET
-        use_excel = False
-        try:
-            import os
-            if os.path.exists(MASTER_EXCEL_PATH):
-                use_excel = True
-        except Exception:
-            use_excel = False
         for s in students:
-            # If a master Excel exists, try to read detailed marks from it for this roll
-            excel_marks = None
-            if use_excel:
-                try:
-                    import openpyxl, io
-                    data = openpyxl.load_workbook(MASTER_EXCEL_PATH, data_only=True)
-                    if MASTER_EXCEL_SHEET in data.sheetnames:
-                        sh = data[MASTER_EXCEL_SHEET]
-                        # build header map
-                        it = sh.iter_rows(values_only=True)
-                        headers = [str(x).strip().lower() if x is not None else '' for x in next(it)]
-                        def idx_of(names):
-                            for n in names:
-                                if n in headers:
-                                    return headers.index(n)
-                            return None
-                        r_idx = idx_of(['roll_no', 'roll', 'rollno'])
-                        d_idx = idx_of(['division', 'div'])
-                        # subject column may be subject code
-                        subj_idx = idx_of(['subject', 'subject_code', 'subject_id'])
-                        u1_idx = idx_of(['unit1'])
-                        u2_idx = idx_of(['unit2'])
-                        term_idx = idx_of(['term'])
-                        annual_idx = idx_of(['annual'])
-                        grace_idx = idx_of(['internal', 'grace'])
-                        for row in it:
-                            if not row or all(c is None for c in row):
-                                continue
-                            rv = row[r_idx] if r_idx is not None and r_idx < len(row) else None
-                            dv = row[d_idx] if d_idx is not None and d_idx < len(row) else None
-                            if rv is None:
-                                continue
-                            if str(rv).strip() == str(s.roll_no).strip() and (not division or (dv and str(dv).strip() == str(s.division).strip())):
-                                # found matching excel row
-                                excel_marks = {
-                                    'unit1': row[u1_idx] if u1_idx is not None and u1_idx < len(row) else None,
-                                    'unit2': row[u2_idx] if u2_idx is not None and u2_idx < len(row) else None,
-                                    'term': row[term_idx] if term_idx is not None and term_idx < len(row) else None,
-                                    'annual': row[annual_idx] if annual_idx is not None and annual_idx < len(row) else None,
-                                    'internal': row[grace_idx] if grace_idx is not None and grace_idx < len(row) else None,
-                                }
-                                break
-                except Exception:
-                    excel_marks = None
-
             result = Result.query.filter_by(roll_no=s.roll_no, division=s.division, batch_id=g.active_batch).first()
-            # If result is missing, fall back to available Marks so UI can show partial data
             marks = Mark.query.filter_by(roll_no=s.roll_no, division=s.division, batch_id=g.active_batch).all()
-            if marks is None:
-                marks = []
-            
-            # Build subjects map with validation
-            all_subjects_list = Subject.query.all()
-            if all_subjects_list is None:
-                all_subjects_list = []
-            subjects_map = {}
-            for sub in all_subjects_list:
-                if sub is not None and hasattr(sub, 'subject_id') and hasattr(sub, 'subject_code'):
-                    subjects_map[sub.subject_id] = sub.subject_code
-            
-            mark_map = {}
-            for m in marks:
-                if m is None or not hasattr(m, 'subject_id'):
-                    continue
-                code = subjects_map.get(m.subject_id)
-                if code is not None:  # Explicit None check before using code
-                    mark_map[code] = m
-
-            # If a master Excel was used in the roll_no path, it's local there; for division path
-            # ensure excel_marks is defined to avoid UnboundLocalError. We do not auto-load
-            # the master Excel for whole-division queries here (keeps behavior simple).
-            excel_marks = None
-            subject_entries = []
-            total_avg = 0
-            total_grace = 0
-
-            # Build the list of subject codes to display: core subjects, any optional subjects, and any codes present in marks
-            all_subjects = Subject.query.filter_by(active=True).all()
-            include_codes = set()
-            for sub in all_subjects:
-                if sub.subject_type == 'CORE':
-                    include_codes.add(sub.subject_code)
-            if s.optional_subject:
-                include_codes.add(s.optional_subject)
-            if s.optional_subject_2:
-                include_codes.add(s.optional_subject_2)
-            # include any codes present in mark rows to avoid missing any entered subjects
-            include_codes.update(mark_map.keys())
-
-            # Custom sort function
-            def get_subject_order(code):
-                return SUBJECT_ORDER.get(code, 99)
-
-            # iterate in sorted order
-            for code in sorted(include_codes, key=get_subject_order):
-                # handle grade-only subjects separately
-                if code in ("EVS", "PE"):
-                    # Check Result first
-                    res_grade = getattr(result, f"{code.lower()}_grade", None) if result else None
-                    if res_grade:
-                        # Found in Result
-                        subject_entries.append({
-                             "code": code,
-                             "grade": res_grade,
-                             "mark": {
-                                 "unit1": None, "unit2": None, "term": None, "annual": None,
-                                 "internal": 0, "sub_avg": 0, "tot": 0, "grace": 0
-                             }
-                        })
-                    else:
-                        # Fallback to Marks table if any
-                        m = mark_map.get(code)
-                        if m and m.annual is not None:
-                            a = m.annual
-                            grade = None
-                            if a >= 75: grade = 'A+'
-                            elif a >= 60: grade = 'A'
-                            elif a >= 50: grade = 'B'
-                            elif a >= 35: grade = 'C'
-                            else: grade = 'F'
-                            
-                            subject_entries.append({
-                                "code": code, 
-                                "grade": grade, 
-                                "mark": {
-                                    "annual": m.annual, 
-                                    "mark_id": m.mark_id, 
-                                    "unit1": m.unit1, 
-                                    "unit2": m.unit2, 
-                                    "term": m.term, 
-                                    "tot": m.tot, 
-                                    "sub_avg": m.sub_avg, 
-                                    "internal": getattr(m, 'internal', 0),
-                                    "grace": getattr(result, f"{code.lower()}_grace", 0) if result else 0
-                                }
-                            })
-                        else:
-                            # Force entry even if no data (as empty grade)
-                            subject_entries.append({
-                                "code": code,
-                                "grade": "-",
-                                "mark": {
-                                    "unit1": None, "unit2": None, "term": None, "annual": None,
-                                    "internal": 0, "sub_avg": 0, "tot": 0, "grace": 0
-                                }
-                            })
-                    continue
-
-                avg, grace = (None, 0.0)
-                if result:
-                    avg, grace = result.get_subject_data(code)
-                else:
-                    m = mark_map.get(code)
-                    avg = m.annual if m and m.annual is not None else None
-                    grace = getattr(m, 'internal', 0) if m else 0
-
-                final = None
-                if avg is not None:
-                    final = (avg or 0) + (grace or 0)
-                    total_avg += avg or 0
-                    total_grace += grace or 0
-
-                # include detailed mark breakdown if available; prefer excel row values when present
-                m = mark_map.get(code)
-                mark_detail = None
-                if excel_marks is not None and isinstance(excel_marks, dict):
-                    # order: unit1, term, unit2, internal, annual, grace, total
-                    try:
-                        total_val = None
-                        u1 = float(excel_marks.get('unit1') or 0)
-                        u2 = float(excel_marks.get('unit2') or 0)
-                        term_v = float(excel_marks.get('term') or 0)
-                        annual_v = float(excel_marks.get('annual') or 0)
-                        total_val = u1 + u2 + term_v + annual_v
-                    except (TypeError, ValueError):
-                        total_val = None
-                    mark_detail = {
-                        "unit1": excel_marks.get('unit1'),
-                        "term": excel_marks.get('term'),
-                        "unit2": excel_marks.get('unit2'),
-                        "internal": excel_marks.get('internal'),
-                        "annual": excel_marks.get('annual'),
-                        "grace": None,
-                        "total": total_val,
-                    }
-                elif m is not None:
-                    total_val = m.tot if m.tot is not None else ((m.unit1 or 0) + (m.unit2 or 0) + (m.term or 0) + (m.annual or 0))
-                    mark_detail = {
-                        "unit1": m.unit1,
-                        "term": m.term,
-                        "unit2": m.unit2,
-                        "internal": getattr(m, 'internal', 0),
-                        "annual": m.annual,
-                        "grace": grace,
-                        "total": total_val,
-                    }
-
-                subject_entries.append({
-                    "code": code,
-                    "avg": avg,
-                    "grace": grace,
-                    "final": final,
-                    "mark": mark_detail if mark_detail is not None else {"unit1": None, "unit2": None, "term": None, "annual": None, "internal": 0, "sub_avg": 0, "tot": 0, "grace": 0}
-                })
-                
-                # Ensure mark_detail has sub_avg if not present
-                if subject_entries[-1]["mark"]:
-                    if "sub_avg" not in subject_entries[-1]["mark"]:
-                        # try generic
-                        if m is not None:
-                            subject_entries[-1]["mark"]["sub_avg"] = m.sub_avg if hasattr(m, 'sub_avg') else 0
-                        else:
-                            subject_entries[-1]["mark"]["sub_avg"] = 0
-
-            final_total = None
-            if subject_entries:
-                # Only show final_total if percentage exists (i.e., result fully computed)
-                perc = getattr(result, "percentage", None) if result else None
-                if perc is not None:
-                    final_total = total_avg + total_grace
-
-            rows.append({
-                "roll_no": s.roll_no,
-                "name": s.name,
-                "division": s.division,
-                "subjects": subject_entries,
-                "total_avg": round(total_avg, 2),
-                "total_grace": round(total_grace, 2),
-                "final_total": round(final_total, 2) if final_total is not None else None,
-                "percentage": getattr(result, "percentage", None) if result else None,
-                "overall_grade": getattr(result, "overall_grade", None) if result else None,
-            })
+            mark_map = {code_by_id[m.subject_id]: m for m in marks if m.subject_id in code_by_id}
+
+            # master Excel index is parsed once and cached by file mtime/size
+            def excel_marks(code, s=s):
+                return lookup_master_marks(s.roll_no, s.division, (code, subject_ids_by_code.get(code)))
+
+            row = build_student_row(s, result, mark_map, core_codes, excel_marks)
+            rows.append({"division": s.division, **row})
 
         # If caller requested a single roll_no, return single object
         if len(rows) == 1:
@@ -693,187 +475,14 @@ def fetch_results(user_id=None, user_type=None):
     if not division:
         return {"error": "division or roll_no is required"}, 400
 
-    # regenerate results for the division
+    # regenerate results for the division if marks changed since last run
     try:
-        generate_results_for_division(division, g.active_batch)
+        ensure_results_for_division(division, g.active_batch)
     except Exception:
-        pass
-
-    # Build rows for entire division
-    students = Student.query.filter_by(division=division, batch_id=g.active_batch).order_by(Student.roll_no).all()
-    if students is None:
-        students = []
-    rows = []
-    for idx, s in enumerate(students, start=1):
-        if s is None:
-            continue
-        result = Result.query.filter_by(roll_no=s.roll_no, division=s.division, batch_id=g.active_batch).first()
-        # Prepare mark map to allow partial display when Result row missing
-        marks = Mark.query.filter_by(roll_no=s.roll_no, division=s.division, batch_id=g.active_batch).all()
-        if marks is None:
-            marks = []
-        
-        # Build subjects map with validation
-        all_subjects_list = Subject.query.all()
-        if all_subjects_list is None:
-            all_subjects_list = []
-        subjects_map = {}
-        for sub in all_subjects_list:
-            if sub is not None and hasattr(sub, 'subject_id') and hasattr(sub, 'subject_code'):
-                subjects_map[sub.subject_id] = sub.subject_code
-        
-        mark_map = {}
-        for m in marks:
-            if m is None or not hasattr(m, 'subject_id'):
-                continue
-            code = subjects_map.get(m.subject_id)
-            if code is not None:  # Explicit None check before using code
-                mark_map[code] = m
-
-        subject_entries = []
-        total_avg = 0
-        total_grace = 0
-
-        # Build display set: core subjects + student's optionals + any subjects present in marks
-        all_subjects = Subject.query.filter_by(active=True).all()
-        include_codes = set()
-        for sub in all_subjects:
-            if sub.subject_type == 'CORE':
-                include_codes.add(sub.subject_code)
-        if s.optional_subject:
-            include_codes.add(s.optional_subject)
-        if s.optional_subject_2:
-            include_codes.add(s.optional_subject_2)
-        include_codes.update(mark_map.keys())
-
-        # Custom sort function
-        def get_subject_order(code):
-            return SUBJECT_ORDER.get(code, 99)
-
-        for code in sorted(include_codes, key=get_subject_order):
-            # grade-only subjects
-            if code in ("EVS", "PE"):
-                # Check Result first
-                res_grade = getattr(result, f"{code.lower()}_grade", None) if result else None
-                if res_grade:
-                     subject_entries.append({
-                         "code": code, 
-                         "grade": res_grade,
-                         "mark": {
-                             "unit1": None, "unit2": None, "term": None, "annual": None,
-                             "internal": 0, "sub_avg": 0, "tot": 0, "grace": 0
-                         }
-                     })
-                else:
-                     m = mark_map.get(code)
-                     if m and m.annual is not None:
-                        a = m.annual
-                        grade = None
-                        if a >= 75: grade = 'A+'
-                        elif a >= 60: grade = 'A'
-                        elif a >= 50: grade = 'B'
-                        elif a >= 35: grade = 'C'
-                        else: grade = 'F'
-                        subject_entries.append({
-                            "code": code, 
-                            "grade": grade, 
-                            "mark": {
-                                "unit1": m.unit1, 
-                                "term": m.term, 
-                                "unit2": m.unit2, 
-                                "internal": getattr(m, 'internal', 0), 
-                                "annual": m.annual, 
-                                "grace": getattr(result, f"{code.lower()}_grace", 0) if result else getattr(m, 'internal', 0), 
-                                "total": m.tot,
-                                "sub_avg": m.sub_avg
-                            }
-                        })
-                     else:
-                        # Force entry even if no data (as empty grade)
-                        subject_entries.append({
-                            "code": code,
-                            "grade": "-",
-                            "mark": {
-                                "unit1": None, "unit2": None, "term": None, "annual": None,
-                                "internal": 0, "sub_avg": 0, "tot": 0, "grace": 0
-                            }
-                        })
-                continue
+        db.session.rollback()
 
-            avg, grace = (None, 0.0)
-            if result:
-                avg, grace = result.get_subject_data(code)
-            else:
-                m = mark_map.get(code)
-                avg = m.annual if m and m.annual is not None else None
-                grace = getattr(m, 'internal', 0) if m else 0
-
-            final = None
-            if avg is not None:
-                final = (avg or 0) + (grace or 0)
-                total_avg += avg or 0
-                total_grace += grace or 0
-
-            m = mark_map.get(code)
-            mark_detail = None
-            if m:
-                total_val = m.tot if m.tot is not None else ((m.unit1 or 0) + (m.unit2 or 0) + (m.term or 0) + (m.annual or 0))
-                mark_detail = {
-                    "unit1": m.unit1,
-                    "term": m.term,
-                    "unit2": m.unit2,
-                    "internal": getattr(m, 'internal', 0),
-                    "annual": m.annual,
-                    "grace": grace,
-                    "total": total_val,
-                }
-            elif excel_marks is not None:
-                # excel marks available but no DB mark row
-                m_internal = excel_marks.get('internal')
-                total_val = None
-                try:
-                    u1 = float(excel_marks.get('unit1') or 0)
-                    u2 = float(excel_marks.get('unit2') or 0)
-                    term_v = float(excel_marks.get('term') or 0)
-                    annual_v = float(excel_marks.get('annual') or 0)
-                    total_val = u1 + u2 + term_v + annual_v
-                except Exception:
-                    total_val = None
-                mark_detail = {
-                    "unit1": excel_marks.get('unit1'),
-                    "term": excel_marks.get('term'),
-                    "unit2": excel_marks.get('unit2'),
-                    "internal": m_internal,
-                    "annual": excel_marks.get('annual'),
-                    "grace": None,
-                    "total": total_val,
-                }
-
-            subject_entries.append({"code": code, "avg": avg, "grace": grace, "final": final, "mark": mark_detail})
-
-            # Ensure mark_detail has sub_avg if not present
-            if subject_entries[-1]["mark"] and "sub_avg" not in subject_entries[-1]["mark"]:
-                     # try generic
-                     if m: subject_entries[-1]["mark"]["sub_avg"] = m.sub_avg
-                     else: subject_entries[-1]["mark"]["sub_avg"] = 0
-
-        final_total = None
-        if subject_entries:
-            perc = getattr(result, "percentage", None) if result else None
-            if perc is not None:
-                final_total = total_avg + total_grace
-
-        rows.append({
-            "seq": idx,
-            "roll_no": s.roll_no,
-            "name": s.name,
-            "subjects": subject_entries,
-            "total_avg": round(total_avg, 2),
-            "total_grace": round(total_grace, 2),
-            "final_total": round(final_total, 2) if final_total is not None else None,
-            "percentage": getattr(result, "percentage", None) if result else None,
-            "overall_grade": getattr(result, "overall_grade", None) if result else None,
-        })
+    # Build rows for entire division (students, results, marks, subjects: one query each)
+    rows = build_division_rows(division, g.active_batch)
 
     return jsonify(rows), 200
 
@@ -894,81 +503,96 @@ def student_marksheet_pdf(roll_no, user_id=None, user_type=None):
     if not division:
         return {"error": "division is required"}, 400
 
-    # ensure results are up-to-date
+    # ensure results are up-to-date (no-op unless marks changed)
     try:
-        generate_results_for_division(division, g.active_batch)
+        ensure_results_for_division(division, g.active_batch)
     except Exception:
-        pass
+        db.session.rollback()
 
     res = Result.query.filter_by(roll_no=roll_no, division=division, batch_id=g.active_batch).first()
     if not res:
         return {"error": "Result not found"}, 404
 
-    if canvas_module is None or letter is None:
+    if not reportlab_available():
         return {"error": "reportlab not installed on server. Install reportlab in requirements."}, 501
 
-    buf = BytesIO()
-    # canvas_module is the imported reportlab.pdfgen.canvas module
-    CanvasClass = getattr(canvas_module, 'Canvas', None)
-    if CanvasClass is None:
-        return {"error": "reportlab canvas API not available"}, 501
-    c = CanvasClass(buf, pagesize=cast(Any, letter))
-    width, height = cast(Any, letter)
-
-    # Header
-    c.setFont('Helvetica-Bold', 16)
-    c.drawString(40, height - 50, 'Official Marksheet')
-    c.setFont('Helvetica', 12)
-    c.drawString(40, height - 70, f'Name: {res.name}  |  Roll: {res.roll_no}  |  Division: {res.division}')
-
-    # Table header
-    y = height - 110
-    c.setFont('Helvetica-Bold', 11)
-    c.drawString(40, y, 'Subject')
-    c.drawString(260, y, 'Annual')
-    c.drawString(360, y, 'Internal')
-    c.drawString(460, y, 'Final')
-    c.setFont('Helvetica', 11)
-    y -= 18
-
-    # iterate known subjects and map to result fields
-    mapping = [
-        ('ENG', 'eng_avg', 'eng_grace'),
-        ('ECO', 'eco_avg', 'eco_grace'),
-        ('BK', 'bk_avg', 'bk_grace'),
-        ('OC', 'oc_avg', 'oc_grace'),
-        ('HINDI', 'hindi_avg', 'hindi_grace'),
-        ('IT', 'it_avg', 'it_grace'),
-        ('MATHS', 'maths_avg', 'maths_grace'),
-        ('SP', 'sp_avg', 'sp_grace')
-    ]
-
-    total = 0
-    for code, avg_field, grace_field in mapping:
-        avg = getattr(res, avg_field, None)
-        grace = getattr(res, grace_field, 0) or 0
-        if avg is None:
-            continue
-        final = (avg or 0) + (grace or 0)
-        c.drawString(40, y, code)
-        c.drawRightString(320, y, f'{round(avg,2)}')
-        c.drawRightString(420, y, f'{round(grace,2)}')
-        c.drawRightString(520, y, f'{round(final,2)}')
-        total += final
-        y -= 16
-
-    y -= 8
-    c.setFont('Helvetica-Bold', 12)
-    c.drawString(40, y, f'Total: {round(res.percentage * (len(mapping) / len(mapping)),2) if res.percentage is not None else "-"}')
-    c.drawRightString(520, y, f'Percentage: {res.percentage or "-"}')
-
-    c.showPage()
-    c.save()
-    buf.seek(0)
+    buf = BytesIO(render_pdf([marksheet_data(res)]))
 
     return send_file(buf, mimetype='application/pdf', as_attachment=True, download_name=f'{roll_no}_marksheet.pdf')
 
 
+# ======================================================
+# Bulk marksheet PDFs for a division / batch (admin only)
+# ======================================================
+def _marksheet_job_view(job):
+    view = dict(job)
+    view.pop("file", None)   # server-side path; served by /download
+    view["progress"] = round(100 * job["done"] / job["total"], 1) if job["total"] else (100.0 if job["status"] == "done" else 0.0)
+    return view
+
+
+@admin_bp.route('/results/marksheets', methods=['POST'])
+@token_required
+@admin_required
+def enqueue_marksheets(user_id=None, user_type=None):
+    """
+    Render marksheets for a whole division (or the whole batch when no
+    division is given) in the background.
+
+    Body: {"division": "A" (optional), "format": "pdf" | "zip"}
+      - pdf: one multi-page PDF, one page per student (drawn in a single pass)
+      - zip: one PDF per student (rendered in a process pool for large batches,
+        see MARKSHEET_PDF_WORKERS / MARKSHEET_PDF_POOL_MIN)
+    Poll GET /results/marksheets/<job_id> for progress, then download from
+    /results/marksheets/<job_id>/download.
+    """
+    data = request.get_json(silent=True) or {}
+    division = (data.get("division") or "").strip().upper() or None
+    fmt = (data.get("format") or "pdf").strip().lower()
+    if fmt not in BULK_FORMATS:
+        return {"error": f"format must be one of: {', '.join(BULK_FORMATS)}"}, 400
+
+    if not reportlab_available():
+        return {"error": "reportlab not installed on server. Install reportlab in requirements."}, 501
+
+    job = marksheet_jobs.enqueue(current_app._get_current_object(), g.active_batch, division, fmt)
+    return jsonify(_marksheet_job_view(job)), 202
+
+
+@admin_bp.route('/results/marksheets/<int:job_id>', methods=['GET'])
+@token_required
+@admin_required
+def get_marksheet_job(job_id, user_id=None, user_type=None):
+    job = marksheet_jobs.get(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    return jsonify(_marksheet_job_view(job)), 200
+
+
+@admin_bp.route('/results/marksheets/<int:job_id>/download', methods=['GET'])
+@token_required
+@admin_required
+def download_marksheets(job_id, user_id=None, user_type=None):
+    job = marksheet_jobs.get(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    if job["status"] != "done":
+        return {"error": f"Job is {job['status']}", "job": _marksheet_job_view(job)}, 409
+
+    path = marksheet_jobs.file_for(job_id)
+    if not path or not os.path.exists(path):
+        return {"error": "File no longer available"}, 410
+
+    scope = f"DIV {job['division']}" if job["division"] else "All Divisions"
+    safe_batch = str(job["batch_id"]).replace("/", "-").replace("\\", "-")
+    if job["format"] == "zip":
+        mimetype = "application/zip"
+    else:
+        mimetype = "application/pdf"
+    return send_file(path, mimetype=mimetype, as_attachment=True,
+                     download_name=f"Marksheets {safe_batch} {scope}.{job['format']}")
+
+
 
 
 # ======================================================
@@ -1236,7 +860,8 @@ def import_students(user_id=None, user_type=None):
     try:
         import openpyxl
         print("[IMPORT] Loading workbook")
-        wb = openpyxl.load_workbook(file.stream, data_only=True)
+        # read-only: rows are streamed, never the whole workbook in memory
+        wb = openpyxl.load_workbook(file.stream, read_only=True, data_only=True)
         print(f"[IMPORT] Workbook loaded with sheets: {wb.sheetnames}")
     except Exception as e:
         print(f"[IMPORT] Failed to read Excel file: {str(e)}")
@@ -1245,99 +870,28 @@ def import_students(user_id=None, user_type=None):
 
     if not wb.sheetnames:
         print("[IMPORT] No sheets in workbook")
+        wb.close()
         return {"error": "Excel file contains no sheets"}, 400
 
-    students_created = 0
-    errors = []
+    try:
+        batch_id = g.active_batch
+    except Exception:
+        try:
+            batch_id = get_active_batch()
+        except Exception:
+            batch_id = None
 
-    for sheet_name in wb.sheetnames:
-        sheet = wb[sheet_name]
-        rows = list(sheet.iter_rows(values_only=True))
-        
-        print(f"[IMPORT] Processing sheet '{sheet_name}' with {len(rows)} rows")
-        
-        if not rows:
-            continue
-        
-        # Skip header row
-        data_rows = rows[1:]
-        
-        for row_idx, row in enumerate(data_rows, start=2):  # start=2 because Excel rows are 1-indexed, and we skipped header
-            if not row or all(cell is None or str(cell).strip() == '' for cell in row):
-                continue
-            
-            try:
-                # Map columns: Roll Number (0), Name (1), Division (2), Optional Subject 1 (3), Optional Subject 2 (4)
-                roll_no = str(row[0]).strip() if len(row) > 0 and row[0] is not None else None
-                name = str(row[1]).strip() if len(row) > 1 and row[1] is not None else None
-                division = str(row[2]).strip() if len(row) > 2 and row[2] is not None else None
-                optional_subject = str(row[3]).strip() if len(row) > 3 and row[3] is not None and str(row[3]).strip() != '' else None
-                optional_subject_2 = str(row[4]).strip() if len(row) > 4 and row[4] is not None and str(row[4]).strip() != '' else None
-                
-                print(f"[IMPORT] Processing row {row_idx}: roll_no={roll_no}, name={name}, division={division}")
-                
-                if not roll_no or not name or not division:
-                    errors.append(f"Sheet '{sheet_name}', Row {row_idx}: Missing required fields (Roll Number, Name, Division)")
-                    continue
-                
-                # Create student and assign to active batch
-                student = Student()
-                student.roll_no = roll_no
-                student.name = name
-                student.division = division.upper()
-                student.optional_subject = optional_subject
-                student.optional_subject_2 = optional_subject_2
-                try:
-                    student.batch_id = g.active_batch
-                except Exception:
-                    try:
-                        student.batch_id = get_active_batch()
-                    except Exception:
-                        student.batch_id = None
-                
-                try:
-                    db.session.add(student)
-                    db.session.commit()
-                    students_created += 1
-                    
-                    print(f"[IMPORT] Created student: {roll_no} ({name}) in {division}")
-                    
-                    # Automatically create empty Mark rows for the 4 main/core subjects
-                    main_codes = ("ENG", "ECO", "BK", "OC")
-                    subjects = Subject.query.filter(Subject.subject_code.in_(main_codes)).all()  # type: ignore[attr-defined]
-                    if subjects is None:
-                        subjects = []
-                    for subj in subjects:
-                        if subj is None or not hasattr(subj, 'subject_id'):
-                            continue
-                        # avoid duplicate mark rows if any exist
-                        exists = Mark.query.filter_by(roll_no=student.roll_no, division=student.division, subject_id=subj.subject_id).first()
-                        if not exists:
-                            m = Mark()
-                            m.roll_no = student.roll_no
-                            m.division = student.division
-                            m.subject_id = subj.subject_id
-                            m.batch_id = student.batch_id
-                            m.unit1 = 0
-                            m.unit2 = 0
-                            m.term = 0
-                            m.annual = 0
-                            m.tot = 0
-                            m.sub_avg = 0
-                            m.internal = 0
-                            m.entered_by = None
-                            db.session.add(m)
-                    db.session.commit()
-                    
-                except IntegrityError:
-                    db.session.rollback()
-                    errors.append(f"Sheet '{sheet_name}', Row {row_idx}: Student {roll_no} in division {division} already exists")
-                except Exception as e:
-                    db.session.rollback()
-                    errors.append(f"Sheet '{sheet_name}', Row {row_idx}: Failed to create student - {str(e)}")
-                    
-            except Exception as e:
-                errors.append(f"Sheet '{sheet_name}', Row {row_idx}: Error processing row - {str(e)}")
+    try:
+        students_created, errors = import_student_workbook(wb, batch_id)
+    except IntegrityError as e:
+        # Another request inserted one of these students mid-import; nothing was written
+        return {"error": "No students imported", "details": [f"Import conflicted with existing data: {str(e.orig)}"]}, 409
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {"error": "No students imported", "details": [f"Database error: {str(e)}"]}, 500
+    finally:
+        wb.close()
 
     print(f"[IMPORT] Import completed: {students_created} students created, {len(errors)} errors")
     
@@ -1364,39 +918,60 @@ def export_results_to_excel(user_id=None, user_type=None):
     
     Generates a multi-sheet workbook for the entire batch.
     Includes per-division sheets and a consolidated summary.
+    The rendered file is cached until the batch's data changes and is served
+    with an ETag, so repeat downloads (If-None-Match) cost nothing.
+
+    Optional query params narrow the export:
+      - divisions: comma-separated divisions, e.g. ?divisions=A,C
+      - sheets: comma-separated subset of detail, ledger, names, summary
     """
-    # Division param is no longer strictly required for generation, 
-    # but we might still accept it if we wanted to filter (though requirement is Batch Wide).
-    # For now, we ignore division param or use it just for logging.
+    # The legacy `division` param is still ignored (the dashboard always sends
+    # it but expects the whole batch); use `divisions` to filter.
     
     try:
         # Import Excel export utility
-        from services.excel_export import generate_excel_for_batch
+        from services.excel_export import generate_excel_for_batch, SHEET_TYPES
+        from services.export_cache import export_etag, get_or_build
         
         batch_id = g.active_batch
         if not batch_id:
              return {"error": "No active batch found"}, 400
 
-        # Generate the workbook
-        wb = generate_excel_for_batch(batch_id)
-        
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+        divisions = sorted({d.strip().upper() for d in request.args.get("divisions", "").split(",") if d.strip()})
+        sheets = sorted({s.strip().lower() for s in request.args.get("sheets", "").split(",") if s.strip()})
+        unknown = [s for s in sheets if s not in SHEET_TYPES]
+        if unknown:
+            return {"error": f"Unknown sheet type(s): {', '.join(unknown)}",
+                    "allowed": list(SHEET_TYPES)}, 400
+
+        etag = export_etag(batch_id, variant=f"{','.join(divisions)}|{','.join(sheets)}",
+                           divisions=divisions or None)
+        if request.if_none_match.contains(etag):
+            not_modified = current_app.response_class(status=304)
+            not_modified.set_etag(etag)
+            return not_modified
+
+        # Render the (write-only) workbook once per data version
+        fh = get_or_build(etag, lambda: generate_excel_for_batch(
+            batch_id, divisions=divisions or None, sheets=sheets or None))
         
         # Generate filename
-        # Format: FYJC Result {batch_id}.xlsx
+        # Format: FYJC Result {batch_id}[ DIV A-C].xlsx
         # We might want to sanitize batch_id to be safe for filenames
         safe_batch = str(batch_id).replace("/", "-").replace("\\", "-")
         filename = f"FYJC Result {safe_batch}.xlsx"
+        if divisions:
+            safe_divs = "-".join(divisions).replace("/", "-").replace("\\", "-")
+            filename = f"FYJC Result {safe_batch} DIV {safe_divs}.xlsx"
         
-        # Return as file download
+        # Return as file download (streamed from the open handle)
         return send_file(
-            output,
+            fh,
             mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            etag=etag,
+            conditional=True,
         )
     
     except Exception as e:
@@ -1,7 +1,7 @@
 # routes/analytics_routes.py
 
 from flask import Blueprint, jsonify, request, g
-from sqlalchemy import func
+from sqlalchemy import func, case, and_
 
 from app import db
 from models import Student, Result
@@ -21,32 +21,89 @@ def health_check():
 # ======================================================
 # 2️⃣ Division Summary
 # ======================================================
+def _empty_summary(division):
+    return {
+        "division": division,
+        "total_students": 0,
+        "results": 0,
+        "results_published": 0,
+        "passed": 0,
+        "failed": 0,
+        "condonation": 0,
+        "pending": 0,
+        "grade_distribution": {},
+        "average_percentage": 0,
+    }
+
+
 @analytics_bp.route("/division-summary", methods=["GET"])
 @token_required
 def division_summary(user_id=None, user_type=None):
     """
-    Summary statistics for a division
+    Summary statistics for a division, or for every division of the batch
+    when no division is given (one entry per division under "divisions").
+
+    Counts, published results, average percentage, pass/fail/condonation
+    counts and the grade distribution all come from one grouped query.
+    Results still missing marks (percentage NULL) count as pending.
     """
-    division = request.args.get("division")
-    if not division:
-        return {"error": "division is required"}, 400
+    # divisions are stored upper-case; the filter matches "a" under the
+    # MySQL collation, so the lookup below must use the same spelling
+    division = (request.args.get("division") or "").strip().upper() or None
 
-    total_students = Student.query.filter_by(division=division, batch_id=g.active_batch).count()
-    results_published = Result.query.filter_by(
-        division=division,
-        is_published=True,
-        batch_id=g.active_batch
-    ).count()
+    # effective grade: incomplete results keep a stale overall_grade
+    grade = case((Result.percentage.is_(None), None), else_=Result.overall_grade)
+    query = db.session.query(
+        Student.division,
+        grade,
+        func.count(Student.student_id),
+        func.count(Result.result_id),
+        func.sum(case((Result.is_published.is_(True), 1), else_=0)),
+        func.sum(Result.percentage),
+        func.count(Result.percentage),
+    ).outerjoin(
+        Result,
+        and_(
+            Result.batch_id == Student.batch_id,
+            Result.roll_no == Student.roll_no,
+            Result.division == Student.division,
+        ),
+    ).filter(Student.batch_id == g.active_batch)
+    if division:
+        query = query.filter(Student.division == division)
+    rows = query.group_by(Student.division, grade).all()
+
+    summaries = {}
+    for div, grade_name, students, results, published, pct_sum, pct_count in rows:
+        s = summaries.setdefault(div, dict(_empty_summary(div), _pct_sum=0.0, _pct_count=0))
+        s["total_students"] += students
+        s["results"] += results
+        s["results_published"] += published or 0
+        s["_pct_sum"] += pct_sum or 0.0
+        s["_pct_count"] += pct_count
+
+        if grade_name is None:
+            s["pending"] += students
+            continue
+        s["grade_distribution"][grade_name] = students
+        if grade_name == "Fail":
+            s["failed"] += students
+        else:
+            s["passed"] += students
+            if "Condonation" in grade_name:
+                s["condonation"] += students
 
-    avg_percentage = db.session.query(
-        func.avg(Result.percentage)
-    ).filter(Result.division == division, Result.batch_id == g.active_batch).scalar()
+    for s in summaries.values():
+        pct_sum, pct_count = s.pop("_pct_sum"), s.pop("_pct_count")
+        avg_percentage = pct_sum / pct_count if pct_count else None
+        s["average_percentage"] = round(avg_percentage, 2) if avg_percentage else 0
+
+    if division:
+        return jsonify(summaries.get(division) or _empty_summary(division)), 200
 
     return jsonify({
-        "division": division,
-        "total_students": total_students,
-        "results_published": results_published,
-        "average_percentage": round(avg_percentage, 2) if avg_percentage else 0
+        "batch_id": g.active_batch,
+        "divisions": [summaries[d] for d in sorted(summaries)],
     }), 200
 
 
@@ -67,7 +124,8 @@ def division_topper(user_id=None, user_type=None):
 
     toppers = Result.query.filter_by(
         division=division,
-        is_published=True
+        is_published=True,
+        batch_id=g.active_batch
     ).order_by(Result.percentage.desc()).limit(limit).all()
 
     return jsonify([
@@ -1,13 +1,13 @@
 # routes/subject_routes.py
 
 from flask import Blueprint, jsonify
-from models import Subject
+from services import subject_catalog
 
 subject_bp = Blueprint("subjects", __name__)
 
 @subject_bp.route("/subjects", methods=["GET"])
 def list_subjects():
-    subjects = Subject.query.filter_by(active=True).all()
+    subjects = sorted(subject_catalog.all_subjects(active_only=True), key=lambda s: s.subject_id)
     return jsonify([
         {
             "subject_id": s.subject_id,
@@ -7,12 +7,15 @@ from typing import Any, Dict, cast
 import math
 from models import (
     Student,
-    Subject,
     Mark,
     TeacherSubjectAllocation
 )
 from models import Result, Teacher
-from services.result_service import generate_results_for_division
+from services.result_service import generate_result_for_student, division_fingerprint
+from services.result_jobs import enqueue_division_results
+from services import subject_catalog, batch_registry
+from db_utils import bulk_upsert, count_existing
+from models import now
 
 from schemas import EnterMarkSchema, UpdateMarkSchema
 from auth import token_required, hash_password, verify_password
@@ -34,6 +37,10 @@ teacher_bp = Blueprint("teacher", __name__, url_prefix="/teacher")
 enter_mark_schema = EnterMarkSchema()
 update_mark_schema = UpdateMarkSchema()
 
+# Unique key and written columns for bulk Mark upserts
+MARK_KEY_COLUMNS = ("batch_id", "roll_no", "division", "subject_id")
+MARK_VALUE_COLUMNS = ("unit1", "unit2", "term", "annual", "tot", "sub_avg", "internal", "updated_at")
+
 
 # ======================================================
 # Helper: check teacher allocation
@@ -53,7 +60,7 @@ def _check_teacher_allocation(teacher_id, subject_id, division):
     # the division can enter core subject marks without explicit per-subject
     # allocation). This keeps optional-subject checks strict.
     try:
-        subject = Subject.query.get(subject_id)
+        subject = subject_catalog.get_subject(subject_id)
         # Only apply the CORE fallback for numeric-mark subjects. Grade-only
         # subjects (PE/EVS) must be handled by the exact allocation above.
         if subject and subject.subject_eval_type == "MARKS" and (subject.subject_type or "").upper() == "CORE":
@@ -69,11 +76,64 @@ def _check_teacher_allocation(teacher_id, subject_id, division):
     return None
 
 
+def _allocation_checker(allocs, relaxed=False):
+    """
+    In-memory equivalent of `_check_teacher_allocation` over a teacher's
+    pre-fetched allocations, so bulk paths can check every row without a
+    query. With `relaxed`, any allocation at all also admits CORE subjects
+    (the fallback used by the marks list/batch endpoints).
+    """
+    exact = {(a.subject_id, a.division) for a in allocs}
+    divisions = {a.division for a in allocs}
+
+    def allowed(subject_id, division):
+        if (subject_id, division) in exact:
+            return True
+        subject = subject_catalog.get_subject(subject_id)
+        if not subject or (subject.subject_type or "").upper() != "CORE":
+            return False
+        if subject.subject_eval_type == "MARKS" and division in divisions:
+            return True
+        return relaxed and bool(allocs)
+
+    return allowed
+
+
+def _students_by_key(keys):
+    """Fetch the active batch's students for (roll_no, division) keys in one query."""
+    keys = [(str(r), d) for r, d in keys if r and d]
+    if not keys:
+        return {}
+    wanted = set(keys)
+    found = Student.query.filter(
+        Student.batch_id == g.active_batch,
+        Student.roll_no.in_({r for r, _ in keys}),
+        Student.division.in_({d for _, d in keys}),
+    ).all()
+    return {
+        (st.roll_no, st.division): st
+        for st in found
+        if (st.roll_no, st.division) in wanted
+    }
+
+
+def _read_upload_rows(f):
+    """Read-only (streaming) parse of the first sheet of an uploaded workbook.
+    Returns the row tuples, or None when the workbook has no sheets."""
+    wb = openpyxl.load_workbook(io.BytesIO(f.read()), read_only=True, data_only=True)
+    try:
+        if not wb.sheetnames:
+            return None
+        return list(wb[wb.sheetnames[0]].iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
 # ======================================================
 # Helpers: determine if all marks for a subject/division exist
 # ======================================================
 def _eligible_student_count_for_subject(subject_id, division):
-    subject = Subject.query.get(subject_id)
+    subject = subject_catalog.get_subject(subject_id)
     if not subject:
         return 0
 
@@ -113,7 +173,7 @@ def get_students(user_id=None, user_type=None):
     if not subject_code or not division:
         return {"error": "subject_code and division are required"}, 400
 
-    subject = Subject.query.filter_by(subject_code=subject_code).first()
+    subject = subject_catalog.get_subject_by_code(subject_code)
     if not subject:
         return {"error": "Invalid subject"}, 404
 
@@ -161,7 +221,7 @@ def enter_marks(user_id=None, user_type=None):
     """
     data = cast(Dict[str, Any], enter_mark_schema.load(request.json or {}))
 
-    subject = Subject.query.get(data.get("subject_id"))
+    subject = subject_catalog.get_subject(data.get("subject_id"))
     if not subject:
         return {"error": "Invalid subject"}, 404
 
@@ -221,6 +281,10 @@ def enter_marks(user_id=None, user_type=None):
     tot = unit1 + unit2 + term + annual + internal
     sub_avg = math.ceil(tot / 2)  # normalize to 100
 
+    # taken before the write; lets the per-student recompute keep the
+    # division watermark current
+    fingerprint_before = division_fingerprint(data["division"], g.active_batch)
+
     mark = Mark()
     mark.roll_no = data.get("roll_no")
     mark.division = data.get("division")
@@ -238,9 +302,9 @@ def enter_marks(user_id=None, user_type=None):
     db.session.add(mark)
     db.session.commit()
 
-    # Trigger result generation/update for this division
+    # Recompute only this student's Result row
     try:
-        generate_results_for_division(data.get("division"), g.active_batch)
+        generate_result_for_student(mark.roll_no, mark.division, g.active_batch, fingerprint_before)
     except Exception as e:
         print(f"Error generating results: {e}")
 
@@ -262,7 +326,7 @@ def update_marks(mark_id, user_id=None, user_type=None):
     if not mark:
         return {"error": "Marks not found"}, 404
 
-    subject = Subject.query.get(mark.subject_id)
+    subject = subject_catalog.get_subject(mark.subject_id)
     if not subject:
         return {"error": "Invalid subject"}, 404
 
@@ -272,6 +336,9 @@ def update_marks(mark_id, user_id=None, user_type=None):
     if not allocation:
         return {"error": "Not authorized"}, 403
 
+    # taken before the mark changes (a later query would autoflush them)
+    fingerprint_before = division_fingerprint(mark.division, mark.batch_id)
+
     # validate ranges again server-side
     unit1 = float(data.get("unit1", 0))
     unit2 = float(data.get("unit2", 0))
@@ -301,20 +368,18 @@ def update_marks(mark_id, user_id=None, user_type=None):
     # subject/division have been submitted.
     if "internal" in data:
         # allow internal to be set/updated at any time; enforce allowed range
-        g = data.get("internal", getattr(mark, 'internal', 0))
-        if g is None:
-            g = 0
-        if float(g) < 0 or float(g) > GRACE_MAX:
+        internal_val = data.get("internal", getattr(mark, 'internal', 0))
+        if internal_val is None:
+            internal_val = 0
+        if float(internal_val) < 0 or float(internal_val) > GRACE_MAX:
             return {"error": f"Internal must be between 0 and {GRACE_MAX}"}, 400
-        mark.internal = g
-
-    db.session.commit()
+        mark.internal = internal_val
 
     db.session.commit()
 
-    # Trigger result generation/update for this division
+    # Recompute only this student's Result row
     try:
-        generate_results_for_division(mark.division, g.active_batch)
+        generate_result_for_student(mark.roll_no, mark.division, mark.batch_id, fingerprint_before)
     except Exception as e:
         print(f"Error generating results: {e}")
 
@@ -346,7 +411,7 @@ def list_marks(user_id=None, user_type=None):
     if not alloc and user_type != "ADMIN":
         # attempt relaxed fallbacks for CORE subjects: if the teacher has any
         # allocation in the same division or any allocation at all, allow read.
-        subj = Subject.query.get(subject_id)
+        subj = subject_catalog.get_subject(subject_id)
         if subj and (subj.subject_type or "").upper() == "CORE":
             same_div = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id, division=division).first()
             any_alloc = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id).first()
@@ -359,7 +424,7 @@ def list_marks(user_id=None, user_type=None):
     # If the subject is optional, restrict to students who selected it.
     students_query = Student.query.filter_by(division=division, batch_id=g.active_batch)
     # determine subject code for optional filtering
-    subj = Subject.query.get(subject_id)
+    subj = subject_catalog.get_subject(subject_id)
     if subj and subj.subject_code in ("HINDI", "IT"):
         students_query = students_query.filter(Student.optional_subject == subj.subject_code)
     if subj and subj.subject_code in ("MATHS", "SP"):
@@ -413,11 +478,11 @@ def teacher_divisions(user_id=None, user_type=None):
     if subject_q:
         try:
             sid = int(subject_q)
-            subj = Subject.query.get(sid)
+            subj = subject_catalog.get_subject(sid)
         except Exception:
             try:
                 sv = str(subject_q).strip()
-                subj = Subject.query.filter((Subject.subject_code == sv) | (Subject.subject_name == sv)).first()
+                subj = subject_catalog.find_subject(sv)
             except Exception:
                 subj = None
 
@@ -447,11 +512,13 @@ def delete_mark(mark_id, user_id=None, user_type=None):
         return {"error": "Not authorized to delete this mark"}, 403
     # (fixed) stray/garbage line removed
 
+    division, batch_id = mark.division, mark.batch_id
     db.session.delete(mark)
     db.session.commit()
 
-    # Note: Teachers update only the `marks` table. Result regeneration is
-    # intentionally skipped here to avoid teachers modifying `Result` rows.
+    # Teachers update only the `marks` table; the division's `Result` rows are
+    # regenerated by the background result job queue.
+    enqueue_division_results(division, batch_id)
 
     return {"message": "Marks deleted"}, 200
 
@@ -480,7 +547,7 @@ def view_complete_table(user_id=None, user_type=None):
 
     # fetch students in canonical order and build rows
     students = Student.query.filter_by(division=division, batch_id=g.active_batch).order_by(Student.roll_no).all()
-    subjects = {s.subject_id: s.subject_code for s in Subject.query.all()}
+    subjects = subject_catalog.code_by_id()
 
     rows = []
     for idx, s in enumerate(students, start=1):
@@ -574,6 +641,9 @@ def marks_from_excel(user_id=None, user_type=None):
 
     default_division = request.form.get('division')
     subject_id_form = request.form.get('subject_id')
+    allocs = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id).all()
+    allowed = _allocation_checker(allocs)
+
     # helper: derive subject_id for this teacher+division when not provided
     def derive_subject_id_for_division(div: str):
         # prefer explicit form value
@@ -584,27 +654,22 @@ def marks_from_excel(user_id=None, user_type=None):
             except Exception:
                 return None
         # find allocations for this teacher in the division
-        allocs = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id, division=div).all()
-        if not allocs:
-            return None
-        if len(allocs) == 1:
-            return allocs[0].subject_id
-        # ambiguous if multiple allocations exist; require explicit subject_id in form
+        div_allocs = [a for a in allocs if a.division == div]
+        if len(div_allocs) == 1:
+            return div_allocs[0].subject_id
+        # none, or ambiguous if multiple allocations exist; require explicit subject_id in form
         return None
 
     try:
-        data = io.BytesIO(f.read())
-        wb = openpyxl.load_workbook(data, data_only=True)
+        rows = _read_upload_rows(f)
     except Exception as e:
         return {"error": "Failed to read Excel file", "details": str(e)}, 400
 
-    if not wb.sheetnames:
+    if rows is None:
         return {"error": "Excel contains no sheets"}, 400
 
     # Use the first sheet (do not enforce exact sheet name). Validate by columns instead.
-    sheet_name = wb.sheetnames[0]
-    sheet = wb[sheet_name]
-    rows_iter = sheet.iter_rows(values_only=True)
+    rows_iter = iter(rows)
     try:
         headers = [str(x).strip().lower() if x is not None else '' for x in next(rows_iter)]
     except StopIteration:
@@ -688,13 +753,30 @@ def marks_from_excel(user_id=None, user_type=None):
     if not requested:
         return {"error": "No valid rows found in Excel"}, 400
 
+    # Resolve every row against pre-fetched students and marks
+    students = _students_by_key((item['roll_no'], item['division']) for item in requested)
+    existing_marks = {}
+    if students:
+        for m in Mark.query.filter(
+            Mark.batch_id == g.active_batch,
+            Mark.roll_no.in_({r for r, _ in students}),
+            Mark.division.in_({d for _, d in students}),
+        ).all():
+            existing_marks[(m.roll_no, m.division, m.subject_id)] = m
+
+    def try_float(v):
+        try:
+            return float(v)
+        except Exception:
+            return None
+
     matched = []
     missing = []
     for item in requested:
         if not item['division']:
             missing.append({"roll_no": item['roll_no'], "division": None, "reason": "division missing"})
             continue
-        student = Student.query.filter_by(roll_no=item['roll_no'], division=item['division'], batch_id=g.active_batch).first()
+        student = students.get((item['roll_no'], item['division']))
         if not student:
             missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "student not found"})
             continue
@@ -714,7 +796,7 @@ def marks_from_excel(user_id=None, user_type=None):
                 if str(sv).isdigit():
                     sid = int(sv)
                 else:
-                    s = Subject.query.filter((Subject.subject_code == sv) | (Subject.subject_name == sv)).first()
+                    s = subject_catalog.find_subject(sv)
                     if s:
                         sid = s.subject_id
             except Exception:
@@ -728,26 +810,19 @@ def marks_from_excel(user_id=None, user_type=None):
             continue
 
         # Ensure teacher is authorized for this subject+division
-        alloc = _check_teacher_allocation(user_id, int(sid), item['division'])
-        if not alloc and user_type != 'ADMIN':
+        if user_type != 'ADMIN' and not allowed(int(sid), item['division']):
             missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "not authorized for this subject/division"})
             continue
 
         # prepare mark object preferring excel values where present
-        def try_float(v):
-            try:
-                return float(v)
-            except Exception:
-                return None
-
         u1 = try_float(item.get('unit1'))
         u2 = try_float(item.get('unit2'))
         t = try_float(item.get('term'))
         a = try_float(item.get('annual'))
-        g = try_float(item.get('internal'))
+        internal_val = try_float(item.get('internal'))
 
         row = {"roll_no": student.roll_no, "name": student.name, "division": student.division}
-        mark = Mark.query.filter_by(subject_id=sid, roll_no=student.roll_no, division=student.division).first()
+        mark = existing_marks.get((student.roll_no, student.division, int(sid)))
         # populate fields: prefer existing DB values, but override with uploaded excel where provided
         row['mark'] = {
             "mark_id": mark.mark_id if mark else None,
@@ -755,10 +830,10 @@ def marks_from_excel(user_id=None, user_type=None):
             "unit2": u2 if u2 is not None else (mark.unit2 if mark else None),
             "term": t if t is not None else (mark.term if mark else None),
             "annual": a if a is not None else (mark.annual if mark else None),
-            "tot": mark.tot if mark else ( ( (u1 or 0) + (u2 or 0) + (t or 0) + (a or 0) + (g or 0)) if any(x is not None for x in (u1,u2,t,a,g)) else None ),
+            "tot": mark.tot if mark else ( ( (u1 or 0) + (u2 or 0) + (t or 0) + (a or 0) + (internal_val or 0)) if any(x is not None for x in (u1,u2,t,a,internal_val)) else None ),
             "sub_avg": mark.sub_avg if mark else None,
-            "internal": g if g is not None else (getattr(mark, 'internal', 0) if mark else 0),
-            "grace": (getattr(mark, 'grace', None) if mark and getattr(mark, 'grace', None) is not None else (g if g is not None else (getattr(mark, 'internal', 0) if mark else 0))),
+            "internal": internal_val if internal_val is not None else (getattr(mark, 'internal', 0) if mark else 0),
+            "grace": (getattr(mark, 'grace', None) if mark and getattr(mark, 'grace', None) is not None else (internal_val if internal_val is not None else (getattr(mark, 'internal', 0) if mark else 0))),
         }
         row['subject_id'] = sid
         matched.append(row)
@@ -777,6 +852,16 @@ def batch_upsert_marks(user_id=None, user_type=None):
     errors = []
     saved = []
     divisions_to_regen = set()
+    rows_by_key = {}
+
+    # Pre-load students and the teacher's allocations for the whole payload
+    students = _students_by_key((e.get('roll_no') or e.get('roll'), e.get('division')) for e in entries)
+    allowed = None
+    if user_type != 'ADMIN':
+        allowed = _allocation_checker(
+            TeacherSubjectAllocation.query.filter_by(teacher_id=user_id).all(), relaxed=True
+        )
+    stamp = now()
 
     for idx, e in enumerate(entries, start=1):
         roll = e.get('roll_no') or e.get('roll')
@@ -786,48 +871,26 @@ def batch_upsert_marks(user_id=None, user_type=None):
             errors.append({"index": idx, "error": "roll_no, division and subject_id are required"})
             continue
 
-        student = Student.query.filter_by(roll_no=str(roll), division=division, batch_id=g.active_batch).first()
+        student = students.get((str(roll), division))
         if not student:
             errors.append({"index": idx, "roll_no": roll, "division": division, "error": "student not found"})
             continue
 
         # Resolve subject: accept numeric id or subject code/name strings
-        subject = None
-        try:
-            sid = int(subject_id)
-            subject = Subject.query.get(sid)
-        except Exception:
-            try:
-                sv = str(subject_id).strip()
-                if sv:
-                    s = Subject.query.filter((Subject.subject_code == sv) | (Subject.subject_name == sv)).first()
-                    if s:
-                        subject = s
-                        sid = s.subject_id
-            except Exception:
-                subject = None
-
+        subject = subject_catalog.find_subject(subject_id)
         if not subject:
             errors.append({"index": idx, "roll_no": roll, "division": division, "error": "Invalid subject"})
             continue
 
-        alloc = _check_teacher_allocation(user_id, subject.subject_id, division)
-        if not alloc and user_type != 'ADMIN':
-            # Relaxed fallback for CORE subjects: allow if teacher has any allocation
-            # (or an allocation in the same division). Mirrors the read/list behaviour.
-            try:
-                if (subject.subject_type or "").upper() == "CORE":
-                    same_div = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id, division=division).first()
-                    any_alloc = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id).first()
-                    if same_div or any_alloc:
-                        alloc = same_div or any_alloc
-            except Exception:
-                pass
-
-        if not alloc and user_type != 'ADMIN':
+        if allowed is not None and not allowed(subject.subject_id, division):
             errors.append({"index": idx, "roll_no": roll, "division": division, "error": "not authorized for subject/division"})
             continue
 
+        # Bulk writes bypass Mark.validate_subject, so keep its guarantee here
+        if subject.subject_eval_type == "GRADE":
+            errors.append({"index": idx, "roll_no": roll, "division": division, "error": f"{subject.subject_code} is a grade-only subject and cannot have numeric marks"})
+            continue
+
         # Ensure student is enrolled in the optional subject when subject is optional
         if subject.subject_code in ("HINDI", "IT") and student.optional_subject != subject.subject_code:
             errors.append({"index": idx, "roll_no": roll, "division": division, "error": "student not enrolled in this optional subject"})
@@ -850,32 +913,23 @@ def batch_upsert_marks(user_id=None, user_type=None):
             errors.append({"index": idx, "roll_no": roll, "division": division, "error": "one or more marks out of allowed ranges"})
             continue
 
-        existing = Mark.query.filter_by(roll_no=str(roll), division=division, subject_id=subject.subject_id, batch_id=g.active_batch).first()
         tot = unit1 + unit2 + term + annual + internal
-        sub_avg = math.ceil(tot / 2)
-        if existing:
-            existing.unit1 = unit1
-            existing.unit2 = unit2
-            existing.term = term
-            existing.annual = annual
-            existing.tot = tot
-            existing.sub_avg = sub_avg
-            existing.internal = internal
-        else:
-            m = Mark()
-            m.roll_no = str(roll)
-            m.division = division
-            m.subject_id = subject.subject_id
-            m.unit1 = unit1
-            m.unit2 = unit2
-            m.term = term
-            m.annual = annual
-            m.tot = tot
-            m.sub_avg = sub_avg
-            m.internal = internal
-            m.entered_by = user_id
-            m.batch_id = g.active_batch
-            db.session.add(m)
+        # Later entries for the same mark win, as with the old row-by-row path
+        rows_by_key[(str(roll), division, subject.subject_id)] = {
+            "batch_id": g.active_batch,
+            "roll_no": str(roll),
+            "division": division,
+            "subject_id": subject.subject_id,
+            "unit1": unit1,
+            "unit2": unit2,
+            "term": term,
+            "annual": annual,
+            "tot": tot,
+            "sub_avg": math.ceil(tot / 2),
+            "internal": internal,
+            "entered_by": user_id,
+            "updated_at": stamp,
+        }
 
         divisions_to_regen.add(division)
         saved.append({"roll_no": str(roll), "division": division, "subject_id": subject.subject_id})
@@ -885,16 +939,25 @@ def batch_upsert_marks(user_id=None, user_type=None):
         return {"error": "Validation failed for all rows", "details": errors}, 400
 
     try:
+        # entered_by is only set on insert; updates keep the original author
+        rows = list(rows_by_key.values())
+        added = len(rows) - count_existing(db.session, Mark, rows, MARK_KEY_COLUMNS)
+        bulk_upsert(
+            db.session, Mark, rows,
+            key_columns=MARK_KEY_COLUMNS,
+            update_columns=MARK_VALUE_COLUMNS,
+        )
+        batch_registry.touch(db.session, g.active_batch, Mark, added, divisions=divisions_to_regen)
         db.session.commit()
     except Exception as ex:
         db.session.rollback()
         return {"error": "Database commit failed", "details": str(ex)}, 500
 
-    # Results regeneration skipped for teacher batch upserts. Leaving `marks`
-    # table writes only; admin or scheduled tasks should regenerate `Result`.
+    # Regenerate affected divisions in the background instead of blocking the save
+    jobs = [enqueue_division_results(div, g.active_batch)["job_id"] for div in sorted(divisions_to_regen)]
 
     # Return success even if some rows had errors, as long as at least one was saved
-    response = {"message": "Marks saved successfully", "saved": saved}
+    response = {"message": "Marks saved successfully", "saved": saved, "result_jobs": jobs}
     if errors:
         response["validation_warnings"] = errors
     return response, 200
@@ -913,18 +976,15 @@ def upload_apply_excel(user_id=None, user_type=None):
         return {"error": "No file uploaded (file)"}, 400
 
     try:
-        data = io.BytesIO(f.read())
-        wb = openpyxl.load_workbook(data, data_only=True)
+        rows = _read_upload_rows(f)
     except Exception as e:
         return {"error": "Failed to read Excel file", "details": str(e)}, 400
 
     # Use first sheet and accept dynamic columns. Require Roll and Division at minimum.
-    sheet_name = wb.sheetnames[0] if wb.sheetnames else None
-    if not sheet_name:
+    if rows is None:
         return {"error": "Excel contains no sheets"}, 400
 
-    sheet = wb[sheet_name]
-    rows_iter = sheet.iter_rows(values_only=True)
+    rows_iter = iter(rows)
     try:
         headers = [str(x).strip().lower() if x is not None else '' for x in next(rows_iter)]
     except StopIteration:
@@ -970,7 +1030,7 @@ def upload_apply_excel(user_id=None, user_type=None):
                 if sv.isdigit():
                     subject_id = int(sv)
                 else:
-                    s = Subject.query.filter((Subject.subject_code == sv) | (Subject.subject_name == sv)).first()
+                    s = subject_catalog.find_subject(sv)
                     if s:
                         subject_id = s.subject_id
             except Exception:
@@ -1000,21 +1060,25 @@ def upload_apply_excel(user_id=None, user_type=None):
     if not requested:
         return {"error": "No valid rows found in Excel"}, 400
 
-    # validate and filter by teacher allocation; derive subject if needed
+    # validate and filter by teacher allocation; derive subject if needed.
+    # Students and allocations are fetched once, so every check is in memory.
+    students = _students_by_key((item['roll_no'], item['division']) for item in requested)
+    allocs = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id).all()
+    allowed = _allocation_checker(allocs)
+    sid_val = request.form.get('subject_id')
     to_apply = []
     missing = []
     for item in requested:
         if not item['division']:
             missing.append({"roll_no": item['roll_no'], "division": None, "reason": "division missing"})
             continue
-        student = Student.query.filter_by(roll_no=item['roll_no'], division=item['division'], batch_id=g.active_batch).first()
+        student = students.get((item['roll_no'], item['division']))
         if not student:
             missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "student not found"})
             continue
 
         # resolve subject: prefer form, then subject cell, then derive from allocation
         sid = None
-        sid_val = request.form.get('subject_id')
         if sid_val:
             try:
                 sid = int(sid_val)
@@ -1027,9 +1091,9 @@ def upload_apply_excel(user_id=None, user_type=None):
                 sid = None
         if sid is None:
             # derive via allocations for this teacher+division
-            allocs = TeacherSubjectAllocation.query.filter_by(teacher_id=user_id, division=item['division']).all()
-            if allocs and len(allocs) == 1:
-                sid = allocs[0].subject_id
+            div_allocs = [a for a in allocs if a.division == item['division']]
+            if len(div_allocs) == 1:
+                sid = div_allocs[0].subject_id
             else:
                 sid = None
 
@@ -1037,8 +1101,7 @@ def upload_apply_excel(user_id=None, user_type=None):
             missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "subject not resolved or ambiguous; provide subject_id"})
             continue
 
-        alloc = _check_teacher_allocation(user_id, int(sid), item['division'])
-        if not alloc and user_type != 'ADMIN':
+        if user_type != 'ADMIN' and not allowed(int(sid), item['division']):
             missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "not authorized for this subject/division"})
             continue
 
@@ -1048,25 +1111,31 @@ def upload_apply_excel(user_id=None, user_type=None):
             u2 = float(item['unit2']) if item.get('unit2') not in (None, '') else 0
             t = float(item['term']) if item.get('term') not in (None, '') else 0
             a = float(item['annual']) if item.get('annual') not in (None, '') else 0
-            g = float(item['internal']) if item.get('internal') not in (None, '') else 0
+            internal_val = float(item['internal']) if item.get('internal') not in (None, '') else 0
         except Exception:
             missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "invalid numeric value"})
             continue
 
         # range checks
-        if u1 < 0 or u1 > 25 or u2 < 0 or u2 > 25 or t < 0 or t > 50 or a < 0 or a > 100 or g < 0 or g > GRACE_MAX:
+        if u1 < 0 or u1 > 25 or u2 < 0 or u2 > 25 or t < 0 or t > 50 or a < 0 or a > 100 or internal_val < 0 or internal_val > GRACE_MAX:
             missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "marks out of allowed ranges"})
             continue
 
-        # Ensure student is enrolled in optional subject if applicable
-        subj_obj = Subject.query.get(int(sid))
-        if subj_obj:
-            if subj_obj.subject_code in ("HINDI", "IT") and student.optional_subject != subj_obj.subject_code:
-                missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "student not enrolled in this optional subject"})
-                continue
-            if subj_obj.subject_code in ("MATHS", "SP") and student.optional_subject_2 != subj_obj.subject_code:
-                missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "student not enrolled in this optional subject"})
-                continue
+        # Bulk writes bypass Mark.validate_subject, so keep its checks here;
+        # then ensure the student is enrolled in an optional subject
+        subj_obj = subject_catalog.get_subject(int(sid))
+        if not subj_obj:
+            missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "Invalid subject"})
+            continue
+        if subj_obj.subject_eval_type == "GRADE":
+            missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": f"{subj_obj.subject_code} is a grade-only subject and cannot have numeric marks"})
+            continue
+        if subj_obj.subject_code in ("HINDI", "IT") and student.optional_subject != subj_obj.subject_code:
+            missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "student not enrolled in this optional subject"})
+            continue
+        if subj_obj.subject_code in ("MATHS", "SP") and student.optional_subject_2 != subj_obj.subject_code:
+            missing.append({"roll_no": item['roll_no'], "division": item['division'], "reason": "student not enrolled in this optional subject"})
+            continue
 
         to_apply.append({
             'roll_no': item['roll_no'],
@@ -1076,54 +1145,56 @@ def upload_apply_excel(user_id=None, user_type=None):
             'unit2': u2,
             'term': t,
             'annual': a,
-            'internal': g
+            'internal': internal_val
         })
 
     if not to_apply:
         return {"error": "No rows authorized/valid to apply", "missing": missing}, 400
 
-    # Apply upserts in transaction
+    # Apply all rows with one bulk upsert in a single transaction
     saved = []
     divisions_to_regen = set()
-    try:
-        for e in to_apply:
-            existing = Mark.query.filter_by(roll_no=str(e['roll_no']), division=e['division'], subject_id=int(e['subject_id']), batch_id=g.active_batch).first()
-            tot = e['unit1'] + e['unit2'] + e['term'] + e['annual'] + e.get('internal', 0)
-            sub_avg = math.ceil(tot / 2)
-            if existing:
-                existing.unit1 = e['unit1']
-                existing.unit2 = e['unit2']
-                existing.term = e['term']
-                existing.annual = e['annual']
-                existing.tot = tot
-                existing.sub_avg = sub_avg
-                existing.internal = e.get('internal', 0)
-            else:
-                m = Mark()
-                m.roll_no = str(e['roll_no'])
-                m.division = e['division']
-                m.subject_id = int(e['subject_id'])
-                m.unit1 = e['unit1']
-                m.unit2 = e['unit2']
-                m.term = e['term']
-                m.annual = e['annual']
-                m.tot = tot
-                m.sub_avg = sub_avg
-                m.internal = e.get('internal', 0)
-                m.entered_by = user_id
-                m.batch_id = g.active_batch
-                db.session.add(m)
-            divisions_to_regen.add(e['division'])
-            saved.append({"roll_no": str(e['roll_no']), "division": e['division'], "subject_id": int(e['subject_id'])})
+    rows_by_key = {}
+    stamp = now()
+    for e in to_apply:
+        tot = e['unit1'] + e['unit2'] + e['term'] + e['annual'] + e.get('internal', 0)
+        # Later rows for the same mark win, as with the old row-by-row path
+        rows_by_key[(str(e['roll_no']), e['division'], e['subject_id'])] = {
+            "batch_id": g.active_batch,
+            "roll_no": str(e['roll_no']),
+            "division": e['division'],
+            "subject_id": e['subject_id'],
+            "unit1": e['unit1'],
+            "unit2": e['unit2'],
+            "term": e['term'],
+            "annual": e['annual'],
+            "tot": tot,
+            "sub_avg": math.ceil(tot / 2),
+            "internal": e.get('internal', 0),
+            "entered_by": user_id,
+            "updated_at": stamp,
+        }
+        divisions_to_regen.add(e['division'])
+        saved.append({"roll_no": str(e['roll_no']), "division": e['division'], "subject_id": e['subject_id']})
 
+    try:
+        rows = list(rows_by_key.values())
+        added = len(rows) - count_existing(db.session, Mark, rows, MARK_KEY_COLUMNS)
+        bulk_upsert(
+            db.session, Mark, rows,
+            key_columns=MARK_KEY_COLUMNS,
+            update_columns=MARK_VALUE_COLUMNS,
+        )
+        batch_registry.touch(db.session, g.active_batch, Mark, added, divisions=divisions_to_regen)
         db.session.commit()
     except Exception as ex:
         db.session.rollback()
         return {"error": "Database commit failed", "details": str(ex)}, 500
 
-    # Results regeneration skipped for excel apply/upload operations initiated by teachers.
+    # Regenerate affected divisions in the background instead of blocking the upload
+    jobs = [enqueue_division_results(div, g.active_batch)["job_id"] for div in sorted(divisions_to_regen)]
 
-    return {"message": "Marks applied successfully", "saved": saved, "missing": missing}, 200
+    return {"message": "Marks applied successfully", "saved": saved, "missing": missing, "result_jobs": jobs}, 200
 
 
 @teacher_bp.route("/students-by-division", methods=["GET"])
@@ -1168,7 +1239,7 @@ def student_marks(user_id=None, user_type=None):
         return {"error": "Student not found"}, 404
 
     # all active subjects
-    all_subjects = Subject.query.filter_by(active=True).order_by(Subject.subject_code).all()
+    all_subjects = subject_catalog.all_subjects(active_only=True)
 
     # determine which optional subjects the student takes
     include_codes = set()
@@ -1227,7 +1298,7 @@ def list_grades(user_id=None, user_type=None):
     if not subject_code or not division:
         return {"error": "subject_code and division are required"}, 400
 
-    subj = Subject.query.filter_by(subject_code=subject_code).first()
+    subj = subject_catalog.get_subject_by_code(subject_code)
     if not subj:
         return {"error": "Invalid subject_code"}, 404
 
@@ -1274,7 +1345,7 @@ def update_grades(user_id=None, user_type=None):
     if not subject_code or not entries or not isinstance(entries, list):
         return {"error": "subject_code and entries (array) are required"}, 400
 
-    subj = Subject.query.filter_by(subject_code=subject_code).first()
+    subj = subject_catalog.get_subject_by_code(subject_code)
     if not subj:
         return {"error": "Invalid subject_code"}, 404
     if subj.subject_eval_type != "GRADE":
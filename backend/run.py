@@ -15,14 +15,25 @@ if SERVE_FRONTEND:
     if not os.path.isdir(build_path):
         print("[WARN] Frontend build not detected. Run 'npm run build' in the frontend directory to enable SPA serving.")
 
-app = create_app(serve_frontend=SERVE_FRONTEND)
+logger = logging.getLogger(__name__)
 
 
+def make_app():
+    return create_app(serve_frontend=SERVE_FRONTEND)
 
-logger = logging.getLogger(__name__)
+
+def __getattr__(name):
+    # `run:app` for WSGI servers. Built lazily rather than at import time:
+    # spawned worker processes (marksheet rendering pool) re-import this
+    # script as __mp_main__ and must not build a whole app each.
+    if name == "app":
+        globals()["app"] = make_app()
+        return globals()["app"]
+    raise AttributeError(name)
 
 
 if __name__ == "__main__":
+    app = make_app()
     try:
         from config import FLASK_ENV
     except ImportError:
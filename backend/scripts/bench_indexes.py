@@ -0,0 +1,172 @@
+"""
+Before/after EXPLAIN (and timings) for the hot division-level queries.
+
+Builds the schema on a scratch database, fills it with synthetic students,
+marks and results, then runs each query with and without the composite
+indexes declared in models.py:
+
+    python scripts/bench_indexes.py                       # in-memory SQLite
+    python scripts/bench_indexes.py --url mysql+pymysql://user:pw@host/scratch_db
+
+The target database is dropped and recreated; never point --url at live data.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path to import models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, case, create_engine, func, insert, select
+
+from app import db
+from models import Student, Mark, Result, Subject
+from scripts.migrate_composite_indexes import COMPOSITE_INDEXES, _index
+
+BATCHES = ("2025-2026", "2026-2027")
+DIVISIONS = ("A", "B", "C", "D", "E", "F")
+SUBJECT_CODES = ("ENG", "ECO", "BK", "OC", "HINDI", "IT", "MATHS", "SP")
+BATCH, DIVISION, SUBJECT_ID = BATCHES[0], "C", 3
+
+# effective grade, as grouped by /analytics/division-summary
+_GRADE = case((Result.percentage.is_(None), None), else_=Result.overall_grade)
+
+
+def _division_summary(division=None):
+    """The single grouped query of analytics_routes.division_summary."""
+    stmt = select(
+        Student.division,
+        _GRADE,
+        func.count(Student.student_id),
+        func.count(Result.result_id),
+        func.sum(case((Result.is_published.is_(True), 1), else_=0)),
+        func.sum(Result.percentage),
+        func.count(Result.percentage),
+    ).select_from(Student).outerjoin(
+        Result,
+        and_(
+            Result.batch_id == Student.batch_id,
+            Result.roll_no == Student.roll_no,
+            Result.division == Student.division,
+        ),
+    ).where(Student.batch_id == BATCH)
+    if division:
+        stmt = stmt.where(Student.division == division)
+    return stmt.group_by(Student.division, _GRADE)
+
+
+# (label, statement) pairs mirroring the route/service queries
+QUERIES = [
+    ("list_marks: marks for one subject of a division",
+     select(Mark).where(Mark.subject_id == SUBJECT_ID, Mark.division == DIVISION, Mark.batch_id == BATCH)),
+    ("generate_results_for_division: division students",
+     select(Student).where(Student.division == DIVISION, Student.batch_id == BATCH)),
+    ("generate_results_for_division: division marks",
+     select(Mark).where(Mark.division == DIVISION, Mark.batch_id == BATCH)),
+    ("division_fingerprint: marks aggregate",
+     select(func.count(Mark.mark_id), func.max(Mark.updated_at), func.sum(Mark.sub_avg))
+     .where(Mark.batch_id == BATCH, Mark.division == DIVISION)),
+    ("view_complete_table: division students by roll no",
+     select(Student).where(Student.division == DIVISION, Student.batch_id == BATCH).order_by(Student.roll_no)),
+    ("analytics division-summary: one division (students LEFT JOIN results, grouped)",
+     _division_summary(DIVISION)),
+    ("analytics division-summary: every division of the batch",
+     _division_summary()),
+    ("analytics topper: top 5 published",
+     select(Result).where(Result.division == DIVISION, Result.is_published.is_(True), Result.batch_id == BATCH)
+     .order_by(Result.percentage.desc()).limit(5)),
+]
+
+
+def _seed(conn, students_per_div):
+    conn.execute(insert(Subject), [
+        {"subject_id": i, "subject_code": c, "subject_name": c, "subject_type": "CORE"}
+        for i, c in enumerate(SUBJECT_CODES, 1)
+    ])
+    students, marks, results = [], [], []
+    for batch in BATCHES:
+        for div in DIVISIONS:
+            for n in range(1, students_per_div + 1):
+                roll = str(n)
+                students.append({"batch_id": batch, "roll_no": roll, "name": f"S{n}", "division": div,
+                                 "optional_subject": "IT", "optional_subject_2": "MATHS"})
+                for sid in range(1, len(SUBJECT_CODES) + 1):
+                    score = (n * 7 + sid * 13) % 100
+                    marks.append({"batch_id": batch, "roll_no": roll, "division": div, "subject_id": sid,
+                                  "annual": score, "tot": score, "sub_avg": score})
+                results.append({"batch_id": batch, "roll_no": roll, "name": f"S{n}", "division": div,
+                                "percentage": (n * 37) % 100, "is_published": n % 3 != 0})
+    conn.execute(insert(Student), students)
+    conn.execute(insert(Mark), marks)
+    conn.execute(insert(Result), results)
+
+
+def _explain(conn, stmt):
+    sql = str(stmt.compile(conn, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        return [row[-1] for row in rows]
+    rows = conn.exec_driver_sql(f"EXPLAIN {sql}").mappings().fetchall()
+    return [
+        f"{r.get('table')}: type={r.get('type')} key={r.get('key')} rows={r.get('rows')} {r.get('Extra') or ''}".strip()
+        for r in rows
+    ]
+
+
+def _time(conn, stmt, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(stmt).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _analyze(conn):
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("ANALYZE")
+    else:
+        for table in ("students", "marks", "results"):
+            conn.exec_driver_sql(f"ANALYZE TABLE {table}")
+
+
+def run(url, students_per_div, repeat):
+    engine = create_engine(url)
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        for model, name in COMPOSITE_INDEXES.items():
+            _index(model, name).drop(conn)
+        _seed(conn, students_per_div)
+        _analyze(conn)
+
+    report = {}
+    for phase in ("before", "after"):
+        with engine.begin() as conn:
+            if phase == "after":
+                for model, name in COMPOSITE_INDEXES.items():
+                    _index(model, name).create(conn)
+                _analyze(conn)
+            for label, stmt in QUERIES:
+                report.setdefault(label, {})[phase] = (_explain(conn, stmt), _time(conn, stmt, repeat))
+
+    total = len(BATCHES) * len(DIVISIONS) * students_per_div
+    print(f"{engine.dialect.name}: {total} students, {total * len(SUBJECT_CODES)} marks, {total} results\n")
+    for label, phases in report.items():
+        print(f"== {label}")
+        for phase in ("before", "after"):
+            plan, ms = phases[phase]
+            print(f"  {phase:6} {ms:8.3f} ms")
+            for line in plan:
+                print(f"           {line}")
+        print()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite://", help="scratch database URL (dropped and recreated)")
+    parser.add_argument("--students", type=int, default=120, help="students per division per batch")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query for the timing")
+    args = parser.parse_args()
+    run(args.url, args.students, args.repeat)
@@ -0,0 +1,34 @@
+import sys
+import os
+
+# Add parent directory to path to import app context
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from models import BatchRegistry
+
+
+def run_migration():
+    app = create_app()
+    with app.app_context():
+        print("Starting migration: batch_registry table...")
+
+        try:
+            # Creates only the new table; existing tables are left untouched
+            BatchRegistry.__table__.create(db.engine, checkfirst=True)
+            print("Table 'batch_registry' ready.")
+
+            # Copy registry.json entries and count every batch's students/marks/results
+            from services.batch_registry import import_legacy_registry
+            added = import_legacy_registry()
+            print(f"Registered {added} new batches.")
+            for b in BatchRegistry.query.order_by(BatchRegistry.batch_id):
+                print(f"  {b.batch_id}: {b.student_count} students, {b.mark_count} marks, {b.result_count} results")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error during migration: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
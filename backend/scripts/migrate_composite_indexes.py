@@ -0,0 +1,38 @@
+import sys
+import os
+
+# Add parent directory to path to import app context
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from models import Student, Mark, Result
+
+# Composite indexes declared in models.py (see scripts/bench_indexes.py for
+# the EXPLAIN plans they change)
+COMPOSITE_INDEXES = {
+    Student: "ix_students_batch_div_roll",
+    Mark: "ix_marks_batch_div_subject",
+    Result: "ix_results_batch_div_pub_pct",
+}
+
+
+def _index(model, name):
+    return next(ix for ix in model.__table__.indexes if ix.name == name)
+
+
+def run_migration():
+    app = create_app()
+    with app.app_context():
+        print("Starting migration: composite indexes on students/marks/results...")
+
+        for model, name in COMPOSITE_INDEXES.items():
+            try:
+                # checkfirst makes re-runs a no-op
+                _index(model, name).create(db.engine, checkfirst=True)
+                print(f"Index '{name}' on '{model.__tablename__}' ready.")
+            except Exception as e:
+                print(f"Error creating index '{name}': {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
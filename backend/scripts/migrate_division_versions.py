@@ -0,0 +1,26 @@
+import sys
+import os
+
+# Add parent directory to path to import app context
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from models import DivisionVersion
+
+
+def run_migration():
+    app = create_app()
+    with app.app_context():
+        print("Starting migration: division_versions table...")
+
+        try:
+            # Creates only the new table; existing tables are left untouched.
+            # Fingerprints change once, so each division regenerates on its next read.
+            DivisionVersion.__table__.create(db.engine, checkfirst=True)
+            print("Table 'division_versions' ready.")
+        except Exception as e:
+            print(f"Error during migration: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,324 @@
+# /backend/services/batch_registry.py
+"""
+Batch registry (the `batch_registry` table) and its row counters.
+
+Every transaction that writes students, marks or results records, per batch,
+how many rows of each it added or removed: ORM inserts/deletes are picked up
+from the flush, and bulk writers (student import, mark upserts, result
+generation) report their inserted rows through `touch()`. Right before the
+commit those deltas are applied as `count = count + :n` to the batch's
+registry row, inside the same transaction, so a save costs one UPDATE per
+batch whatever the batch size, and concurrent writers cannot overwrite each
+other's totals. A batch seen for the first time is registered (and counted
+once) on the way. The /admin/batches endpoints then read one small table
+instead of registry.json or a DISTINCT scan over students.
+
+The counters are exact for ORM writes. A bulk upsert reports its inserts
+from a key lookup taken just before it, so two uploads racing on the same
+new rows can both count them; `list_batches()` therefore reconciles the
+counters with three grouped COUNTs (index-only over batch_id) and corrects
+any row that drifted. `sync_counts()` recounts single batches from scratch
+when registering or migrating them.
+
+The same hook bumps the `division_versions` counter of every division whose
+students or marks the transaction wrote (ORM changes from the flush, bulk
+writes through `touch(..., divisions=...)`). result_service folds it into
+the division fingerprint, so no edit can slip past the result watermark.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.orm import Session
+
+from app import db
+from db_utils import bulk_upsert
+from models import BatchRegistry, DivisionVersion, Student, Mark, Result
+
+COUNTED_MODELS = (Student, Mark, Result)
+COUNT_COLUMNS = ("student_count", "mark_count", "result_count")
+COUNT_COLUMN_BY_MODEL = dict(zip(COUNTED_MODELS, COUNT_COLUMNS))
+
+# Rows whose writes change a division's computed results
+VERSIONED_MODELS = (Student, Mark)
+
+# Legacy JSON registry, imported once by init_db / scripts/migrate_batch_registry.py
+LEGACY_REGISTRY_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "registry.json")
+
+logger = logging.getLogger(__name__)
+
+_ready_lock = threading.Lock()
+_ready_tables = set()   # (engine, table name)
+
+
+def touch(session, batch_id, model=None, added=0, divisions=()):
+    """
+    Record a write to `batch_id` for when `session` commits: `added` rows
+    (negative for deletes) of `model`, for writes that bypass the ORM, and
+    the `divisions` whose students/marks it changed. With no model the
+    registry row only gets a fresh updated_at.
+    """
+    if not batch_id:
+        return
+    deltas = session.info.setdefault("batch_deltas", {}).setdefault(
+        batch_id, dict.fromkeys(COUNT_COLUMNS, 0)
+    )
+    if model is not None and added:
+        deltas[COUNT_COLUMN_BY_MODEL[model]] += added
+    if divisions:
+        session.info.setdefault("divisions_touched", set()).update(
+            (batch_id, d) for d in divisions if d
+        )
+
+
+def _on_flush(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, COUNTED_MODELS):
+            touch(session, obj.batch_id, type(obj), 1,
+                  divisions=[obj.division] if isinstance(obj, VERSIONED_MODELS) else ())
+    for obj in session.deleted:
+        if isinstance(obj, COUNTED_MODELS):
+            touch(session, obj.batch_id, type(obj), -1,
+                  divisions=[obj.division] if isinstance(obj, VERSIONED_MODELS) else ())
+    for obj in session.dirty:
+        if not isinstance(obj, COUNTED_MODELS) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        # a row moved to another batch
+        history = state.attrs.batch_id.history
+        for old in history.deleted or ():
+            touch(session, old, type(obj), -1)
+        for new in history.added or ():
+            touch(session, new, type(obj), 1)
+        if isinstance(obj, VERSIONED_MODELS):
+            # both the division it left and the one it is in now
+            old_batches = history.deleted or [obj.batch_id]
+            old_divisions = state.attrs.division.history.deleted or [obj.division]
+            for batch_id in old_batches:
+                touch(session, batch_id, divisions=old_divisions)
+            touch(session, obj.batch_id, divisions=[obj.division])
+
+
+def _table_ready(session, model=BatchRegistry):
+    key = (session.get_bind(), model.__tablename__)
+    if key in _ready_tables:
+        return True
+    # tolerate databases where the table has not been created yet
+    if not inspect(session.connection()).has_table(model.__tablename__):
+        return False
+    with _ready_lock:
+        _ready_tables.add(key)
+    return True
+
+
+def _on_before_commit(session):
+    # before_commit runs ahead of the commit's own flush; flush now so
+    # pending ORM inserts/deletes are recorded
+    session.flush()
+    deltas = session.info.pop("batch_deltas", None)
+    divisions = session.info.pop("divisions_touched", None)
+    if deltas:
+        if _table_ready(session):
+            apply_deltas(session, deltas)
+        else:
+            logger.warning("batch_registry table missing; counter updates for %s discarded "
+                           "(run scripts/migrate_batch_registry.py)", ", ".join(sorted(deltas)))
+    if divisions:
+        if _table_ready(session, DivisionVersion):
+            bump_division_versions(session, divisions)
+        else:
+            logger.warning("division_versions table missing; version bumps discarded "
+                           "(run scripts/migrate_division_versions.py)")
+
+
+def _on_rollback(session):
+    session.info.pop("batch_deltas", None)
+    session.info.pop("divisions_touched", None)
+
+
+event.listen(Session, "after_flush", _on_flush)
+event.listen(Session, "before_commit", _on_before_commit)
+event.listen(Session, "after_rollback", _on_rollback)
+
+
+def apply_deltas(session, deltas):
+    """Add `{batch_id: {count_column: n}}` to the registry rows (registering new batches)."""
+    stamp = datetime.utcnow()
+    unregistered = []
+    for batch_id in sorted(deltas):
+        values = {
+            column: getattr(BatchRegistry, column) + n
+            for column, n in deltas[batch_id].items() if n
+        }
+        result = session.execute(
+            update(BatchRegistry)
+            .where(BatchRegistry.batch_id == batch_id)
+            .values(updated_at=stamp, **values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            unregistered.append(batch_id)
+    if unregistered:
+        # the flushed rows are already visible to this transaction's recount
+        sync_counts(session, unregistered)
+
+
+def bump_division_versions(session, keys):
+    """Increment the version of each (batch_id, division) in `keys`, creating missing rows."""
+    stamp = datetime.utcnow()
+    rows = [{"batch_id": b, "division": d, "version": 1, "updated_at": stamp} for b, d in sorted(keys)]
+    table = DivisionVersion.__table__
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        session.execute(stmt.on_duplicate_key_update(version=table.c.version + 1, updated_at=stamp), rows)
+        return
+
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(table)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=["batch_id", "division"],
+            set_={"version": table.c.version + 1, "updated_at": stamp},
+        ), rows)
+        return
+
+    for row in rows:
+        result = session.execute(
+            update(table)
+            .where(table.c.batch_id == row["batch_id"], table.c.division == row["division"])
+            .values(version=table.c.version + 1, updated_at=stamp)
+        )
+        if result.rowcount == 0:
+            session.execute(table.insert(), [row])
+
+
+def division_version(session, batch_id, division):
+    """Current write counter of a division (None before its first write or without the table)."""
+    if not _table_ready(session, DivisionVersion):
+        return None
+    return session.query(DivisionVersion.version).filter(
+        DivisionVersion.batch_id == batch_id, DivisionVersion.division == division
+    ).scalar()
+
+
+def counts_for(session, batch_id):
+    return {
+        column: session.query(func.count()).select_from(model).filter(model.batch_id == batch_id).scalar()
+        for column, model in zip(COUNT_COLUMNS, COUNTED_MODELS)
+    }
+
+
+def sync_counts(session, batch_ids):
+    """Recount and upsert the registry rows of `batch_ids` (registering new batches)."""
+    stamp = datetime.utcnow()
+    rows = []
+    for batch_id in batch_ids:
+        row = {"batch_id": batch_id, "updated_at": stamp, "created_at": stamp, "is_active": False}
+        row.update(counts_for(session, batch_id))
+        rows.append(row)
+    bulk_upsert(session, BatchRegistry, rows, ("batch_id",), COUNT_COLUMNS + ("updated_at",))
+
+
+def is_registered(batch_id):
+    return db.session.get(BatchRegistry, batch_id) is not None
+
+
+def reconcile_counts(session):
+    """
+    Compare every registry row with grouped counts of its students, marks
+    and results and correct the ones that drifted. Returns the corrected
+    batch ids.
+    """
+    live = {}
+    for column, model in zip(COUNT_COLUMNS, COUNTED_MODELS):
+        for batch_id, n in session.query(model.batch_id, func.count()).group_by(model.batch_id):
+            live.setdefault(batch_id, dict.fromkeys(COUNT_COLUMNS, 0))[column] = n
+
+    corrected = []
+    for entry in session.query(BatchRegistry):
+        actual = live.get(entry.batch_id, dict.fromkeys(COUNT_COLUMNS, 0))
+        if any(getattr(entry, column) != n for column, n in actual.items()):
+            logger.warning("batch %s counters drifted (%s); corrected to %s", entry.batch_id,
+                           {c: getattr(entry, c) for c in COUNT_COLUMNS}, actual)
+            for column, n in actual.items():
+                setattr(entry, column, n)
+            corrected.append(entry.batch_id)
+    if corrected:
+        session.commit()
+    return corrected
+
+
+def list_batches():
+    reconcile_counts(db.session)
+    return BatchRegistry.query.order_by(BatchRegistry.created_at, BatchRegistry.batch_id).all()
+
+
+def register_batch(batch_id, created_by=None, description=None):
+    """Insert a new registry row; raises IntegrityError if it already exists."""
+    entry = BatchRegistry(
+        batch_id=batch_id,
+        description=description,
+        created_by=str(created_by) if created_by is not None else None,
+        is_active=False,
+    )
+    entry_counts = counts_for(db.session, batch_id)
+    for column, value in entry_counts.items():
+        setattr(entry, column, value)
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+def mark_active(batch_id):
+    """Flag `batch_id` as the active batch (registering it if needed) in one transaction."""
+    if db.session.get(BatchRegistry, batch_id) is None:
+        sync_counts(db.session, [batch_id])
+    db.session.execute(
+        update(BatchRegistry).values(is_active=(BatchRegistry.batch_id == batch_id))
+    )
+    db.session.commit()
+
+
+def import_legacy_registry(path=LEGACY_REGISTRY_FILE):
+    """
+    One-off migration: copy registry.json entries into the table, then
+    register and count every batch that has students. Idempotent.
+    Returns the number of registry rows created.
+    """
+    created = 0
+    entries = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("batches", [])
+
+    existing = {b for (b,) in db.session.query(BatchRegistry.batch_id)}
+    for e in entries:
+        batch_id = str(e.get("batch_id") or "").strip()
+        if not batch_id or batch_id in existing:
+            continue
+        try:
+            created_at = datetime.fromisoformat(e["created_at"]) if e.get("created_at") else None
+        except ValueError:
+            created_at = None
+        db.session.add(BatchRegistry(
+            batch_id=batch_id,
+            description=e.get("description"),
+            is_active=bool(e.get("is_active")),
+            created_by=str(e["created_by"]) if e.get("created_by") is not None else None,
+            created_at=created_at or datetime.utcnow(),
+        ))
+        existing.add(batch_id)
+        created += 1
+    db.session.flush()
+
+    data_batches = {b for (b,) in db.session.query(Student.batch_id).distinct() if b}
+    created += len(data_batches - existing)
+    sync_counts(db.session, sorted(existing | data_batches))
+    db.session.commit()
+    return created
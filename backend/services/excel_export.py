@@ -1,62 +1,169 @@
 from typing import Optional, Dict, List, Set, Any
 from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Alignment, Border, Side, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.utils import get_column_letter
-from datetime import datetime
 
-from models import Student, Result, Mark, Subject
+from models import Student, Result, Mark
 from app import db
+from services import subject_catalog
+
+
+# ---------------- STYLES ----------------
+# Registered once per workbook as named styles, so every cell shares one
+# style record instead of carrying its own font/fill/border/alignment objects.
+_thin_border = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"),
+)
+_center_align = Alignment(horizontal="center", vertical="center")
+_left_align = Alignment(horizontal="left", vertical="center")
+# Dark Blue Header (Main Sheets)
+_header_fill = PatternFill("solid", fgColor="1F4E78")
+# Light Blue Sub-Header
+_sub_header_fill = PatternFill("solid", fgColor="D9E1F2")
+# Lighter blue for the summary tables
+_summary_header_fill = PatternFill("solid", fgColor="BDD7EE")
+
+NAMED_STYLES = {
+    "fyjc_title_14": dict(font=Font(bold=True, size=14), alignment=_center_align),
+    "fyjc_title_12": dict(font=Font(bold=True, size=12), alignment=_center_align),
+    "fyjc_center": dict(font=DEFAULT_FONT, alignment=_center_align),
+    "fyjc_header": dict(
+        font=Font(bold=True, color="FFFFFF"), fill=_header_fill, border=_thin_border,
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+    ),
+    "fyjc_sub_header": dict(
+        font=Font(bold=True, size=9), fill=_sub_header_fill, border=_thin_border,
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+    ),
+    "fyjc_summary_header": dict(
+        font=Font(bold=True, size=10), fill=_summary_header_fill, border=_thin_border,
+        alignment=_center_align,
+    ),
+    "fyjc_division_banner": dict(
+        font=Font(bold=True, size=12), fill=_sub_header_fill, alignment=_center_align,
+    ),
+    "fyjc_list_header": dict(font=Font(bold=True, size=9)),
+    "fyjc_cell": dict(font=DEFAULT_FONT, border=_thin_border),
+    "fyjc_cell_center": dict(font=DEFAULT_FONT, border=_thin_border, alignment=_center_align),
+    "fyjc_cell_left": dict(font=DEFAULT_FONT, border=_thin_border, alignment=_left_align),
+}
+
+
+def _register_styles(wb: Workbook):
+    for name, attrs in NAMED_STYLES.items():
+        wb.add_named_style(NamedStyle(name=name, **attrs))
+
+
+class _SheetBuffer:
+    """
+    One sheet's rows as plain values or (value, style_name) pairs.
+
+    Write-only worksheets need column widths before the first row is
+    streamed, so a sheet is collected here, written in one pass and then
+    dropped; only one sheet's values are held at a time. With
+    `autosize_from`, the longest rendered value per column is tracked as rows
+    are appended (from that row on), so sizing needs no second pass.
+    """
+
+    def __init__(self, title: str, autosize_from: Optional[int] = None, max_width: int = 40):
+        self.title = title
+        self.rows: List[List[Any]] = []
+        self.merges: List[str] = []
+        self.ncols = 0
+        self.autosize_from = autosize_from
+        self.max_width = max_width
+        self.max_len: Dict[int, int] = {}
+
+    def append(self, cells: List[Any]):
+        self.rows.append(cells)
+        self.ncols = max(self.ncols, len(cells))
+        if self.autosize_from is None or len(self.rows) < self.autosize_from:
+            return
+        max_len = self.max_len
+        for col, cell in enumerate(cells, 1):
+            value = cell[0] if isinstance(cell, tuple) else cell
+            if value:
+                n = len(str(value))
+                if n > max_len.get(col, 0):
+                    max_len[col] = n
+
+    def merge(self, start_row, start_col, end_row, end_col):
+        self.merges.append(
+            f"{get_column_letter(start_col)}{start_row}:{get_column_letter(end_col)}{end_row}"
+        )
+        self.ncols = max(self.ncols, end_col)
+
+    def write(self, wb: Workbook):
+        ws = wb.create_sheet(self.title)
+        if self.autosize_from is not None:
+            for col in range(1, self.ncols + 1):
+                width = min(self.max_len.get(col, 0) + 2, self.max_width)
+                ws.column_dimensions[get_column_letter(col)].width = width
+        for ref in self.merges:
+            ws.merged_cells.add(ref)
+
+        for row in self.rows:
+            out = []
+            for cell in row:
+                if isinstance(cell, tuple):
+                    value, style = cell
+                    c = WriteOnlyCell(ws, value=value)
+                    c.style = style
+                    out.append(c)
+                else:
+                    out.append(cell)
+            ws.append(out)
+        self.rows = []
 
 
-def generate_excel_for_batch(batch_id: str) -> Workbook:
+# Sheet groups that can be requested individually:
+#   detail  -> DIV_{X}         ledger -> DIV_{X}_All
+#   names   -> NAME {X}        summary -> Fail List
+SHEET_TYPES = ("detail", "ledger", "names", "summary")
+
+
+def generate_excel_for_batch(
+    batch_id: str,
+    divisions: Optional[List[str]] = None,
+    sheets: Optional[List[str]] = None,
+) -> Workbook:
     """
-    Generates a multi-sheet Excel workbook for the entire batch.
+    Generates a multi-sheet, write-only Excel workbook for the entire batch.
     Sheets per Division:
       - DIV_{X}: Detailed Marksheet (Units, Terms, etc.)
       - DIV_{X}_All: Summary Ledger
       - NAME {X}: Name List
     Global Sheets:
-      - Sheet2: Consolidated Summary (All Divisions)
+      - Fail List: Consolidated failed students (All Divisions)
+
+    `divisions` limits the export to those divisions and `sheets` to a subset
+    of SHEET_TYPES; only the rows the requested sheets need are fetched.
+
+    Rows are streamed into the workbook's temporary sheet files; call
+    `wb.save()` once to produce the .xlsx.
     """
-    wb = Workbook()
-    
-    # Remove default sheet
-    default_ws = wb.active
-    if default_ws:
-        wb.remove(default_ws)
-
-    # ---------------- STYLES ----------------
-    # Dark Blue Header (Main Sheets)
-    header_fill = PatternFill("solid", fgColor="1F4E78")
-    header_font = Font(bold=True, color="FFFFFF")
-    header_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-    # Light Blue Sub-Header
-    sub_header_fill = PatternFill("solid", fgColor="D9E1F2")
-    sub_header_font = Font(bold=True, size=9)
-
-    # Summary Sheet Styles
-    summary_header_fill = PatternFill("solid", fgColor="BDD7EE") # Lighter blue for Sheet2
-    summary_header_font = Font(bold=True, size=10)
-
-    # Common
-    data_font = Font(size=9)
-    center_align = Alignment(horizontal="center", vertical="center")
-    left_align = Alignment(horizontal="left", vertical="center")
-
-    thin_border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
-    )
+    sheets = set(sheets or SHEET_TYPES)
+    unknown = sheets - set(SHEET_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown sheet type(s): {', '.join(sorted(unknown))}")
+
+    wb = Workbook(write_only=True)
+    _register_styles(wb)
 
     # ---------------- DATA FETCHING ----------------
-    students = Student.query.filter_by(batch_id=batch_id).order_by(Student.division, Student.roll_no).all()
+    student_q = Student.query.filter_by(batch_id=batch_id)
+    if divisions:
+        student_q = student_q.filter(Student.division.in_(divisions))
+    students = student_q.order_by(Student.division, Student.roll_no).all()
     if not students:
         # Create empty debug sheet if no data
         ws = wb.create_sheet("No Data")
-        ws["A1"] = "No students found for this batch."
+        ws.append(["No students found for this batch."])
         return wb
 
     divisions = sorted(list(set(s.division for s in students)))
@@ -64,7 +171,7 @@ def generate_excel_for_batch(batch_id: str) -> Workbook:
     import re
 
     def natural_sort_key(s):
-        
+
         return [int(text) if text.isdigit() else text.lower()
                 for text in re.split('([0-9]+)', s.roll_no)]
 
@@ -73,47 +180,39 @@ def generate_excel_for_batch(batch_id: str) -> Workbook:
     # But let's keep consistent Sort
     students.sort(key=natural_sort_key)
 
-    marks = Mark.query.filter_by(batch_id=batch_id).all()
-    results = Result.query.filter_by(batch_id=batch_id).all()
-    all_subjects = Subject.query.all()
-    
-    # Mappings
-    # Mark Map: (roll_no, subject_code) -> Mark Object (for Units/Term breakdown)
-    subject_id_code_map = {s.subject_id: s.subject_code for s in all_subjects}
-    mark_map = {(m.roll_no, subject_id_code_map.get(m.subject_id)): m for m in marks}
-    
-    # Result Map: roll_no -> Result Object (for Averages, Grace, Totals)
-    result_map: Dict[str, Result] = {res.roll_no: res for res in results}
+    # Only the detail sheet reads individual marks; names needs no results
+    marks = []
+    if "detail" in sheets:
+        marks = Mark.query.filter(Mark.batch_id == batch_id, Mark.division.in_(divisions)).all()
+    results = []
+    if sheets & {"detail", "ledger", "summary"}:
+        results = Result.query.filter(Result.batch_id == batch_id, Result.division.in_(divisions)).all()
+
+    # Mappings (roll numbers repeat across divisions, so the division is part of every key)
+    # Mark Map: (division, roll_no, subject_code) -> Mark Object (for Units/Term breakdown)
+    subject_id_code_map = subject_catalog.code_by_id()
+    mark_map = {(m.division, m.roll_no, subject_id_code_map.get(m.subject_id)): m for m in marks}
+
+    # Result Map: (division, roll_no) -> Result Object (for Averages, Grace, Totals)
+    result_map: Dict[tuple, Result] = {(res.division, res.roll_no): res for res in results}
 
     # Student Division Grouping
     students_by_div = {d: [] for d in divisions}
     for s in students:
         students_by_div[s.division].append(s)
 
-
-    # ---------------- HELPER: COLUMN WIDTH ----------------
-    def autosize_columns(ws, data_start_row=1):
-        for col in ws.columns:
-            max_length = 0
-            col_letter = get_column_letter(col[0].column)
-            for cell in col:
-                # Skip header rows for width calculation if overly verbose, usually standard is fine
-                if cell.row < data_start_row: continue 
-                
-                try:
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            # Cap width
-            ws.column_dimensions[col_letter].width = min(adjusted_width, 40)
+    # Latest change to each division's loaded rows: the "Data as of" stamp.
+    # Unlike the render time, it stays true for a cached copy of the file.
+    data_as_of = {}
+    for row in (*students, *marks, *results):
+        if row.updated_at and (row.division not in data_as_of or row.updated_at > data_as_of[row.division]):
+            data_as_of[row.division] = row.updated_at
 
 
     # ---------------- GENERATE SHEETS ----------------
 
-    # We will collect summary rows by division for Sheet2
-    all_summary_rows_by_div = {} 
+    # We will collect failed summary rows by division for the Fail List
+    failed_rows_by_div = {}
 
     # Static summary headers used in DIV_{X}_All and consolidated sheets
     summary_headers = [
@@ -127,340 +226,253 @@ def generate_excel_for_batch(batch_id: str) -> Workbook:
         "TOTAL", "Grace Total", "Per.", "Result"
     ]
 
+    # Fixed Order: ENG, OPT1, ECO, BK, OC, OPT2, EVS, PE
+    detail_cols_struct = [
+        ("ENG", "ENGLISH"),
+        ("OPT1", "HINDI / IT"),
+        ("ECO", "ECONOMICS"),
+        ("BK", "BOOK KEEPING"),
+        ("OC", "ORGANISATION OF COMMERCE"),
+        ("OPT2", "MATHS / SP"),
+        ("EVS", "EVS"),
+        ("PE", "PE"),
+    ]
+
+    # Sub-columns for numeric subjects; PE & EVS are grade-only (single GRADE column)
+    sub_cols_numeric = ["UNIT I", "TERM I", "UNIT II", "INTERNAL", "ANNUAL", "TOTAL", "AVERAGE", "GRACE"]
+    final_headers = ["TOTAL GRACE", "TOTAL", "%", "RESULT"]
+
     for div in divisions:
         div_students = students_by_div[div]
 
-        # ==========================================
-        # 1. DIV_{X} (Detailed Marksheet)
-        # ==========================================
-        ws_detail = wb.create_sheet(f"DIV_{div}")
-        
-        # --- Titles ---
-        ws_detail.merge_cells("A1:AZ1")
-        ws_detail["A1"] = "SIES JUNIOR COLLEGE OF COMMERCE, NERUL"
-        ws_detail["A1"].font = Font(bold=True, size=14)
-        ws_detail["A1"].alignment = center_align
-
-        ws_detail.merge_cells("A2:AZ2")
-        ws_detail["A2"] = f"FYJC ( DIV {div} ) MARKSHEET – {batch_id}"
-        ws_detail["A2"].font = Font(bold=True, size=12)
-        ws_detail["A2"].alignment = center_align
-
-        ws_detail.merge_cells("A3:AZ3")
-        ws_detail["A3"] = f"Generated on: {datetime.now().strftime('%d-%m-%Y %H:%M')}"
-        ws_detail["A3"].alignment = center_align
-
-        # --- Headers ---
-        # Fixed Order: ENG, ECO, BK, OC, OPT1, OPT2, EVS, PE
-        # Display Names: "ENGLISH", "ECONOMICS", "BOOK KEEPING", "ORG OF COMM", "HINDI / IT", "MATHS / SP", "EVS", "PE"
-        
-        detail_cols_struct = [
-            ("ENG", "ENGLISH"),
-            ("OPT1", "HINDI / IT"),
-            ("ECO", "ECONOMICS"),
-            ("BK", "BOOK KEEPING"),
-            ("OC", "ORGANISATION OF COMMERCE"),
-            ("OPT2", "MATHS / SP"),
-            ("EVS", "EVS"),
-            ("PE", "PE"),
-        ]
-
-        # Sub-columns for numeric subjects
-        sub_cols_numeric = ["UNIT I", "TERM I", "UNIT II", "INTERNAL", "ANNUAL", "TOTAL", "AVERAGE", "GRACE"]
-        # Sub-columns for Grade subjects (EVS, PE) -> Just "GRADE" usually? 
-        # Requirement: "PE & EVS are grade-only subjects". 
-        
-        current_col = 1
-        
-        # ROLL NO
-        ws_detail.merge_cells(start_row=4, start_column=current_col, end_row=5, end_column=current_col)
-        ws_detail.cell(4, current_col, "ROLL NO")
-        current_col += 1
-        
-        # NAME
-        ws_detail.merge_cells(start_row=4, start_column=current_col, end_row=5, end_column=current_col)
-        ws_detail.cell(4, current_col, "STUDENT NAME")
-        current_col += 1
-        
-        subject_start_cols = {} # code -> start_col
-
-        for code, title in detail_cols_struct:
-            start = current_col
-            
-            is_grade_only = code in ["EVS", "PE"]
-            
-            if is_grade_only:
-                # Single Column for Grade
-                cols_to_add = ["GRADE"]
-            else:
-                cols_to_add = sub_cols_numeric
-
-            width = len(cols_to_add)
-            
-            ws_detail.merge_cells(start_row=4, start_column=start, end_row=4, end_column=start + width - 1)
-            ws_detail.cell(4, start, title)
-            
-            for i, sub in enumerate(cols_to_add):
-                ws_detail.cell(5, start + i, sub)
-            
-            subject_start_cols[code] = start
-            current_col += width
-
-        # FINAL COLUMNS
-        final_headers = ["TOTAL GRACE", "TOTAL", "%", "RESULT"]
-        for h in final_headers:
-            ws_detail.merge_cells(start_row=4, start_column=current_col, end_row=5, end_column=current_col)
-            ws_detail.cell(4, current_col, h)
-            current_col += 1
-
-        # Apply Header Styles
-        for r in range(4, 6):
-            for c in range(1, current_col):
-                cell = ws_detail.cell(r, c)
-                cell.font = header_font if r==4 else sub_header_font
-                cell.fill = header_fill if r==4 else sub_header_fill
-                cell.alignment = header_align
-                cell.border = thin_border
-        
-        # --- Detail Data Rows ---
-        row = 6
-        for s in div_students:
-            ws_detail.cell(row, 1, s.roll_no).alignment = center_align
-            ws_detail.cell(row, 2, s.name).alignment = left_align
-            
-            res_obj = result_map.get(s.roll_no)
-            
-            # Helper to get numeric marks breakdown
-            def fill_marks(code_key, start_col):
-                # Identify actual subject code for this student
-                actual_code = code_key
-                if code_key == "OPT1": actual_code = s.optional_subject # e.g. HINDI
-                if code_key == "OPT2": actual_code = s.optional_subject_2 # e.g. SP
-                
-                if not actual_code:
-                    return # Empty cells
-
-                # For Marks breakdown, use Mark table
-                m = mark_map.get((s.roll_no, actual_code))
-                
-                # Fetch Grace for this subject from Result
-                sub_grace = 0.0
+        if "detail" in sheets:
+            # ==========================================
+            # 1. DIV_{X} (Detailed Marksheet)
+            # ==========================================
+            detail = _SheetBuffer(f"DIV_{div}", autosize_from=6)
+
+            # --- Titles ---
+            detail.merge(1, 1, 1, 52)
+            detail.append([("SIES JUNIOR COLLEGE OF COMMERCE, NERUL", "fyjc_title_14")])
+            detail.merge(2, 1, 2, 52)
+            detail.append([(f"FYJC ( DIV {div} ) MARKSHEET – {batch_id}", "fyjc_title_12")])
+            detail.merge(3, 1, 3, 52)
+            as_of = data_as_of.get(div)
+            detail.append([(f"Data as of: {as_of.strftime('%d-%m-%Y %H:%M') if as_of else '-'}", "fyjc_center")])
+
+            # --- Headers (rows 4 and 5) ---
+            header_top = ["ROLL NO", "STUDENT NAME"]
+            header_sub = [None, None]
+            detail.merge(4, 1, 5, 1)
+            detail.merge(4, 2, 5, 2)
+
+            subject_start_cols = {}  # code -> start_col
+            current_col = 3
+            for code, title in detail_cols_struct:
+                cols_to_add = ["GRADE"] if code in ["EVS", "PE"] else sub_cols_numeric
+                width = len(cols_to_add)
+                detail.merge(4, current_col, 4, current_col + width - 1)
+                header_top += [title] + [None] * (width - 1)
+                header_sub += cols_to_add
+                subject_start_cols[code] = current_col
+                current_col += width
+
+            for h in final_headers:
+                detail.merge(4, current_col, 5, current_col)
+                header_top.append(h)
+                header_sub.append(None)
+                current_col += 1
+
+            detail.append([(v, "fyjc_header") for v in header_top])
+            detail.append([(v, "fyjc_sub_header") for v in header_sub])
+
+            # --- Detail Data Rows ---
+            for row, s in enumerate(div_students, start=6):
+                cells = [None] * (current_col - 1)
+                cells[0] = (s.roll_no, "fyjc_cell_center")
+                cells[1] = (s.name, "fyjc_cell_left")
+
+                res_obj = result_map.get((div, s.roll_no))
+
+                for code_key, start in subject_start_cols.items():
+                    i = start - 1
+                    if code_key in ["EVS", "PE"]:
+                        # Grade Only
+                        grade_val = ""
+                        if res_obj:
+                            if code_key == "EVS": grade_val = res_obj.evs_grade
+                            if code_key == "PE": grade_val = res_obj.pe_grade
+                        cells[i] = (grade_val or "-", "fyjc_cell_center")
+                        continue
+
+                    # Identify actual subject code for this student
+                    actual_code = code_key
+                    if code_key == "OPT1": actual_code = s.optional_subject  # e.g. HINDI
+                    if code_key == "OPT2": actual_code = s.optional_subject_2  # e.g. SP
+                    if not actual_code:
+                        continue  # Empty cells
+
+                    # For Marks breakdown, use Mark table
+                    m = mark_map.get((div, s.roll_no, actual_code))
+
+                    # Fetch Grace for this subject from Result
+                    sub_grace = 0.0
+                    if res_obj:
+                        _, sub_grace = res_obj.get_subject_data(actual_code)  # returns (avg, grace)
+
+                    vals = [
+                        m.unit1 if m else 0,    # UNIT I
+                        m.term if m else 0,     # TERM I
+                        m.unit2 if m else 0,    # UNIT II
+                        m.internal if m else 0, # INTERNAL
+                        m.annual if m else 0,   # ANNUAL
+                    ]
+                    for k, v in enumerate(vals):
+                        cells[i + k] = (v, "fyjc_cell_center")
+
+                    # TOTAL (Sum of Unit, Term, Unit2, Internal, Annual)
+                    start_let = get_column_letter(start)
+                    end_let = get_column_letter(start + 4)
+                    cells[i + 5] = (f"=SUM({start_let}{row}:{end_let}{row})", "fyjc_cell")
+                    # AVERAGE (DB sub_avg) - The rounded final mark out of 100
+                    cells[i + 6] = (m.sub_avg if m else 0, "fyjc_cell")
+                    # GRACE (from Result)
+                    cells[i + 7] = (sub_grace, "fyjc_cell")
+
+                # Final Results
                 if res_obj:
-                     _, sub_grace = res_obj.get_subject_data(actual_code)  # returns (avg, grace)
-
-                vals = [
-                    m.unit1 if m else 0,   # Col 0: UNIT I
-                    m.term if m else 0,    # Col 1: TERM I
-                    m.unit2 if m else 0,   # Col 2: UNIT II
-                    m.internal if m else 0,# Col 3: INTERNAL
-                    m.annual if m else 0,  # Col 4: ANNUAL
+                    cells[-4] = (res_obj.total_grace, "fyjc_cell")
+                    cells[-3] = (res_obj.overall_tot, "fyjc_cell")
+                    cells[-2] = (res_obj.percentage, "fyjc_cell")
+                    # RESULT Column: Use predefined overall_grade
+                    cells[-1] = (res_obj.overall_grade if res_obj.overall_grade else "-", "fyjc_cell")
+
+                detail.append(cells)
+
+            detail.write(wb)
+
+
+        if "ledger" in sheets or "summary" in sheets:
+            # ==========================================
+            # 2. DIV_{X}_All (Summary Ledger)
+            # ==========================================
+            # Rows are still computed for a summary-only export (Fail List input)
+            ledger = None
+            if "ledger" in sheets:
+                ledger = _SheetBuffer(f"DIV_{div}_All", autosize_from=3)
+
+                # Titles
+                ledger.merge(1, 1, 1, 17)
+                ledger.append([("SIES JUNIOR COLLEGE OF COMMERCE NERUL", "fyjc_title_12")])
+                ledger.append([(h, "fyjc_summary_header") for h in summary_headers])
+
+            for s in div_students:
+                res = result_map.get((div, s.roll_no))
+
+                # Helper to safely get avg/grace
+                def get_ag(code_slot):
+                    if not res: return 0.0, 0.0
+                    if code_slot == "ENG": return res.eng_avg, res.eng_grace
+                    if code_slot == "ECO": return res.eco_avg, res.eco_grace
+                    if code_slot == "BK": return res.bk_avg, res.bk_grace
+                    if code_slot == "OC": return res.oc_avg, res.oc_grace
+                    if code_slot == "OPT1": return res.opt1_avg, res.opt1_grace
+                    if code_slot == "OPT2": return res.opt2_avg, res.opt2_grace
+                    return 0.0, 0.0
+
+                eng_a, eng_g = get_ag("ENG")
+                opt1_a, opt1_g = get_ag("OPT1") # HINDI / IT
+                eco_a, eco_g = get_ag("ECO")
+                bk_a, bk_g = get_ag("BK")
+                oc_a, oc_g = get_ag("OC")
+                opt2_a, opt2_g = get_ag("OPT2") # MATHS / SP
+
+                res_status = "-"
+                if res:
+                    res_status = res.overall_grade if res.overall_grade else "-"
+
+                data_row = [
+                    s.roll_no, s.name,
+                    eng_a, eng_g,
+                    opt1_a, opt1_g,
+                    eco_a, eco_g,
+                    bk_a, bk_g,
+                    oc_a, oc_g,
+                    opt2_a, opt2_g,
+                    res.overall_tot if res else 0,
+                    res.total_grace if res else 0,
+                    res.percentage if res else 0,
+                    res_status
                 ]
-                
-                # Fill Raw Marks
-                for i, v in enumerate(vals):
-                    c = ws_detail.cell(row, start_col + i, v)
-                    c.alignment = center_align
-                    c.border = thin_border
-
-                # Col 5: TOTAL (Sum of Unit, Term, Unit2, Internal, Annual)
-                start_let = get_column_letter(start_col)
-                end_let = get_column_letter(start_col + 4) # Annual is 4th index (5th col)
-                ws_detail.cell(row, start_col + 5, f"=SUM({start_let}{row}:{end_let}{row})").border = thin_border
-                
-                # Col 6: AVERAGE (DB sub_avg) - The rounded final mark out of 100
-                avg_val = m.sub_avg if m else 0
-                ws_detail.cell(row, start_col + 6, avg_val).border = thin_border
-
-                # Col 7: GRACE (from Result)
-                ws_detail.cell(row, start_col + 7, sub_grace).border = thin_border
-
-            # Fill Subjects
-            for code_key, start in subject_start_cols.items():
-                if code_key in ["EVS", "PE"]:
-                    # Grade Only
-                    grade_val = ""
-                    if res_obj:
-                        if code_key == "EVS": grade_val = res_obj.evs_grade
-                        if code_key == "PE": grade_val = res_obj.pe_grade
-                    
-                    c = ws_detail.cell(row, start, grade_val or "-")
-                    c.alignment = center_align
-                    c.border = thin_border
-                else:
-                    fill_marks(code_key, start)
-
-            # Final Results
-            if res_obj:
-                ws_detail.cell(row, current_col-4, res_obj.total_grace).border = thin_border
-                ws_detail.cell(row, current_col-3, res_obj.overall_tot).border = thin_border
-                ws_detail.cell(row, current_col-2, res_obj.percentage).border = thin_border
-                # RESULT Column: Use predefined overall_grade
-                res_str = res_obj.overall_grade if res_obj.overall_grade else "-"
-                ws_detail.cell(row, current_col-1, res_str).border = thin_border
-
-            # Apply specific border to Name/Roll
-            ws_detail.cell(row, 1).border = thin_border
-            ws_detail.cell(row, 2).border = thin_border
-            
-            row += 1
-            
-        # Autosize
-        autosize_columns(ws_detail, data_start_row=6)
 
+                # Save failed students for the Fail List
+                if "FAIL" in str(res_status).strip().upper():
+                    failed_rows_by_div.setdefault(div, []).append(data_row)
 
-        # ==========================================
-        # 2. DIV_{X}_All (Summary Ledger)
-        # ==========================================
-        ws_all = wb.create_sheet(f"DIV_{div}_All")
-
-        # Titles
-        ws_all.merge_cells("A1:Q1")
-        ws_all["A1"] = "SIES JUNIOR COLLEGE OF COMMERCE NERUL"
-        ws_all["A1"].font = Font(bold=True, size=12)
-        ws_all["A1"].alignment = center_align
-        
-        # Headers
-        # Ref: ROLL NO, NAME, ENG, Eng Grace, Hindi/IT, Grace, ECO, Grace, BK, Grace, OC, Grace, MATH/SP, Grace, TOTAL, Grace Total, Per., Result
-        # Wait, reference showed: ['ROLL NO', 'STUDENT NAME', 'ENG ', 'Eng Grace', ' Hindi', 'Hindi Grace', ...]
-        
-        # Note: summary_headers moved to top of function to avoid being conditionally bound
-        
-        for i, h in enumerate(summary_headers, 1):
-            c = ws_all.cell(2, i, h)
-            c.font = summary_header_font
-            c.fill = summary_header_fill
-            c.border = thin_border
-            c.alignment = center_align
-
-        row_all = 3
-        
-        for s in div_students:
-            res = result_map.get(s.roll_no)
-            
-            # Prepare row data
-            # Helper to safely get avg/grace
-            def get_ag(code_slot):
-                if not res: return 0.0, 0.0
-                if code_slot == "ENG": return res.eng_avg, res.eng_grace
-                if code_slot == "ECO": return res.eco_avg, res.eco_grace
-                if code_slot == "BK": return res.bk_avg, res.bk_grace
-                if code_slot == "OC": return res.oc_avg, res.oc_grace
-                if code_slot == "OPT1": return res.opt1_avg, res.opt1_grace
-                if code_slot == "OPT2": return res.opt2_avg, res.opt2_grace
-                return 0.0, 0.0
-
-            eng_a, eng_g = get_ag("ENG")
-            opt1_a, opt1_g = get_ag("OPT1") # HINDI / IT
-            eco_a, eco_g = get_ag("ECO")
-            bk_a, bk_g = get_ag("BK")
-            oc_a, oc_g = get_ag("OC")
-            opt2_a, opt2_g = get_ag("OPT2") # MATHS / SP
-            
-            res_status = "-"
-            if res:
-                res_status = res.overall_grade if res.overall_grade else "-"
-            
-            data_row = [
-                s.roll_no, s.name,
-                eng_a, eng_g,
-                opt1_a, opt1_g,
-                eco_a, eco_g,
-                bk_a, bk_g,
-                oc_a, oc_g,
-                opt2_a, opt2_g,
-                res.overall_tot if res else 0,
-                res.total_grace if res else 0,
-                res.percentage if res else 0,
-                res_status
-            ]
-            
-            # Save for Sheet2
-            if div not in all_summary_rows_by_div:
-                all_summary_rows_by_div[div] = []
-            all_summary_rows_by_div[div].append(data_row)
-            
-            # Write to DIV_All
-            for i, val in enumerate(data_row, 1):
-                c = ws_all.cell(row_all, i, val)
-                c.border = thin_border
-                c.alignment = center_align if i > 2 else left_align
-            
-            row_all += 1
-
-        autosize_columns(ws_all, data_start_row=3)
+                if ledger is not None:
+                    ledger.append(_summary_cells(data_row))
+
+            if ledger is not None:
+                ledger.write(wb)
 
+        if "names" in sheets:
+            # ==========================================
+            # 3. NAME {X} (Name List)
+            # ==========================================
+            ws_name = wb.create_sheet(f"NAME {div}")
+            ws_name.column_dimensions["A"].width = 15
+            ws_name.column_dimensions["B"].width = 30
+
+            header = []
+            for h in ("ROLL NO", "STUDENT NAME"):
+                c = WriteOnlyCell(ws_name, value=h)
+                c.style = "fyjc_list_header"
+                header.append(c)
+            ws_name.append(header)
+            for s in div_students:
+                ws_name.append([s.roll_no, s.name])
+
+
+    if "summary" in sheets:
         # ==========================================
-        # 3. NAME {X} (Name List)
+        # 4. Failed Students (Consolidated Batch Summary)
         # ==========================================
-        ws_name = wb.create_sheet(f"NAME {div}")
-        ws_name["A1"] = "ROLL NO"
-        ws_name["B1"] = "STUDENT NAME"
-        
-        ws_name["A1"].font = sub_header_font
-        ws_name["B1"].font = sub_header_font
-        
-        r_name = 2
-        for s in div_students:
-            ws_name.cell(r_name, 1, s.roll_no)
-            ws_name.cell(r_name, 2, s.name)
-            r_name += 1
-            
-        ws_name.column_dimensions["A"].width = 15
-        ws_name.column_dimensions["B"].width = 30
-
-
-    # ==========================================
-    # 4. Failed Students (Consolidated Batch Summary)
-    # ==========================================
-    ws_sheet2 = wb.create_sheet("Fail List")
-    
-    # Title
-    ws_sheet2.merge_cells("A1:Q1")
-    ws_sheet2["A1"] = "SIES JUNIOR COLLEGE OF COMMERCE, NERUL"
-    ws_sheet2["A1"].font = Font(bold=True, size=14)
-    ws_sheet2["A1"].alignment = center_align
-
-    row_s2 = 3
-    
-    for div in divisions:
-        div_rows = all_summary_rows_by_div.get(div, [])
-        failed_rows = []
-        for r in div_rows:
-            res_val = str(r[-1]).strip().upper() if r[-1] else ""
-            if "FAIL" in res_val:
-                failed_rows.append(r)
-        
-        if not failed_rows:
-            continue
-
-        # Division Header
-        ws_sheet2.merge_cells(start_row=row_s2, start_column=1, end_row=row_s2, end_column=len(summary_headers))
-        ws_sheet2.cell(row_s2, 1, f"DIVISION {div}")
-        ws_sheet2.cell(row_s2, 1).font = Font(bold=True, size=12)
-        ws_sheet2.cell(row_s2, 1).alignment = center_align
-        ws_sheet2.cell(row_s2, 1).fill = sub_header_fill
-        row_s2 += 1
-        
-        # Table Headers
-        for i, h in enumerate(summary_headers, 1):
-            c = ws_sheet2.cell(row_s2, i, h)
-            c.font = summary_header_font
-            c.fill = summary_header_fill
-            c.border = thin_border
-            c.alignment = center_align
-        row_s2 += 1
-        
-        # Data
-        for data_row in failed_rows:
-            for i, val in enumerate(data_row, 1):
-                c = ws_sheet2.cell(row_s2, i, val)
-                c.border = thin_border
-                c.alignment = center_align if i > 2 else left_align
-            row_s2 += 1
-            
-        # Spacing
-        row_s2 += 2
-
-    autosize_columns(ws_sheet2, data_start_row=3)
+        fail_list = _SheetBuffer("Fail List", autosize_from=3)
+
+        # Title
+        fail_list.merge(1, 1, 1, 17)
+        fail_list.append([("SIES JUNIOR COLLEGE OF COMMERCE, NERUL", "fyjc_title_14")])
+        fail_list.append([])
+
+        for div in divisions:
+            failed_rows = failed_rows_by_div.get(div)
+            if not failed_rows:
+                continue
+
+            # Division Header
+            row_s2 = len(fail_list.rows) + 1
+            fail_list.merge(row_s2, 1, row_s2, len(summary_headers))
+            fail_list.append([(f"DIVISION {div}", "fyjc_division_banner")])
+
+            # Table Headers
+            fail_list.append([(h, "fyjc_summary_header") for h in summary_headers])
+
+            # Data
+            for data_row in failed_rows:
+                fail_list.append(_summary_cells(data_row))
+
+            # Spacing
+            fail_list.append([])
+            fail_list.append([])
+
+        fail_list.write(wb)
 
     return wb
+
+
+def _summary_cells(data_row):
+    """Style a DIV_{X}_All / Fail List data row (roll no and name left-aligned)."""
+    return [
+        (val, "fyjc_cell_center" if i > 2 else "fyjc_cell_left")
+        for i, val in enumerate(data_row, 1)
+    ]
@@ -0,0 +1,169 @@
+# /backend/services/export_cache.py
+"""
+On-disk cache of rendered batch Excel exports.
+
+An export is addressed by a hash of its parameters and a cheap fingerprint of
+the batch's data (row counts, latest updated_at and a few sums over students,
+marks and results). The hash doubles as the HTTP ETag. While nothing in the
+batch changes, repeat downloads are served from the stored file (or answered
+with 304 Not Modified); any write produces a new key. Files are written
+atomically and the least recently used ones are evicted once the directory
+grows past EXPORT_CACHE_MAX_MB. Callers get an open file handle rather than
+a path, so an eviction racing a download cannot remove the file first.
+Renders are serialised per key only; unrelated exports build concurrently.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+from sqlalchemy import func
+
+from app import db
+from config import EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_MB
+from models import Student, Mark, Result
+
+_locks_guard = threading.Lock()
+_build_locks = {}   # etag -> [lock, number of requests using it]
+
+
+def batch_fingerprint(batch_id: str, divisions=None) -> str:
+    """
+    Aggregate over everything the export reads; changes on any insert, update
+    or delete. With `divisions`, only those divisions' rows are covered, so
+    edits elsewhere in the batch keep a per-division export cached.
+    """
+    def scoped(query, model):
+        query = query.filter(model.batch_id == batch_id)
+        if divisions:
+            query = query.filter(model.division.in_(divisions))
+        return query.one()
+
+    students = scoped(db.session.query(
+        func.count(Student.student_id),
+        func.max(Student.updated_at),
+    ), Student)
+    marks = scoped(db.session.query(
+        func.count(Mark.mark_id),
+        func.max(Mark.updated_at),
+        func.sum(Mark.tot),
+        func.sum(Mark.sub_avg),
+    ), Mark)
+    results = scoped(db.session.query(
+        func.count(Result.result_id),
+        func.max(Result.updated_at),
+        func.sum(Result.percentage),
+        func.sum(Result.total_grace),
+    ), Result)
+    return "|".join(str(v) for v in (*students, *marks, *results))
+
+
+def export_etag(batch_id: str, variant: str = "", divisions=None) -> str:
+    """
+    Content address (and ETag) of the export of `batch_id` as it stands now.
+    `variant` distinguishes filtered exports; `divisions` scopes the fingerprint.
+    """
+    key = f"{batch_id}|{variant}|{batch_fingerprint(batch_id, divisions)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _path_for(etag: str) -> str:
+    return os.path.join(EXPORT_CACHE_DIR, f"{etag}.xlsx")
+
+
+def _acquire(etag):
+    with _locks_guard:
+        entry = _build_locks.setdefault(etag, [threading.Lock(), 0])
+        entry[1] += 1
+    entry[0].acquire()
+    return entry
+
+
+def _release(etag, entry):
+    entry[0].release()
+    with _locks_guard:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _build_locks[etag]
+
+
+def _open_cached(path):
+    try:
+        fh = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    _touch(path)
+    return fh
+
+
+def get_or_build(etag: str, build):
+    """
+    Return an open binary file handle on the cached export for `etag`,
+    calling `build()` (which returns an unsaved openpyxl Workbook) only when
+    it is not on disk yet. The caller closes the handle (send_file does).
+    """
+    path = _path_for(etag)
+    fh = _open_cached(path)
+    if fh is not None:
+        return fh
+
+    entry = _acquire(etag)
+    try:
+        # another request may have rendered it while we waited
+        fh = _open_cached(path)
+        if fh is not None:
+            return fh
+
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        wb = build()
+        fd, tmp_path = tempfile.mkstemp(dir=EXPORT_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                wb.save(out)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # opened before evicting, so the handle survives even if it is removed
+        fh = open(path, "rb")
+        _evict(keep=path)
+        return fh
+    finally:
+        _release(etag, entry)
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _evict(keep=None):
+    """Drop least recently used exports until the cache fits EXPORT_CACHE_MAX_MB."""
+    limit = EXPORT_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    total = 0
+    for name in os.listdir(EXPORT_CACHE_DIR):
+        if not name.endswith(".xlsx"):
+            continue
+        full = os.path.join(EXPORT_CACHE_DIR, name)
+        try:
+            st = os.stat(full)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, full))
+        total += st.st_size
+
+    for _, size, full in sorted(entries):
+        if total <= limit:
+            break
+        if full == keep:
+            continue
+        try:
+            os.remove(full)
+            total -= size
+        except OSError:
+            pass
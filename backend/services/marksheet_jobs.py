@@ -0,0 +1,164 @@
+# /backend/services/marksheet_jobs.py
+"""
+Background jobs rendering marksheets for a whole division (or batch).
+
+A job regenerates stale results once per division, loads every Result row it
+needs in one query, then renders them with services.marksheet_pdf (a process
+pool for large zips) into MARKSHEET_PDF_DIR under a random file name, kept on the job, so workers
+sharing the directory (or a restarted process reusing job ids) never
+overwrite each other's output. `done`/`total` on the job report progress
+while it runs; the file is downloadable once the status is "done".
+"""
+import itertools
+import os
+import tempfile
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from datetime import datetime
+
+from config import MARKSHEET_PDF_WORKERS, MARKSHEET_PDF_POOL_MIN, MARKSHEET_PDF_DIR
+from services.marksheet_pdf import render_bulk, marksheet_data
+
+# How many finished jobs (and their files) to keep
+MAX_FINISHED_JOBS = 20
+
+
+def load_marksheet_records(batch_id, division=None):
+    """Refresh results, then snapshot every marksheet of the division/batch."""
+    from app import db
+    from models import Result, Student
+    from services.result_service import ensure_results_for_division
+
+    if division:
+        divisions = [division]
+    else:
+        divisions = [d for (d,) in db.session.query(Student.division)
+                     .filter(Student.batch_id == batch_id).distinct().order_by(Student.division)]
+
+    # no-op per division unless its marks changed since the last run
+    for div in divisions:
+        try:
+            ensure_results_for_division(div, batch_id)
+        except Exception:
+            db.session.rollback()
+
+    query = Result.query.filter(Result.batch_id == batch_id)
+    if division:
+        query = query.filter(Result.division == division)
+    results = query.order_by(Result.division, Result.roll_no).all()
+    return [marksheet_data(r) for r in results]
+
+
+class MarksheetJobQueue:
+    def __init__(self, workers: int = MARKSHEET_PDF_WORKERS, pool_min: int = MARKSHEET_PDF_POOL_MIN,
+                 out_dir: str = MARKSHEET_PDF_DIR):
+        self.workers = workers
+        self.pool_min = pool_min
+        self.out_dir = out_dir
+        self._executor = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()   # job_id -> job dict
+        self._futures = set()
+
+    def _get_executor(self):
+        # one job at a time; each job fans out to its own process pool
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="marksheet-jobs")
+        return self._executor
+
+    def enqueue(self, app, batch_id: str, division=None, fmt: str = "pdf") -> dict:
+        with self._lock:
+            job_id = next(self._ids)
+            job = {
+                "job_id": job_id,
+                "batch_id": batch_id,
+                "division": division,
+                "format": fmt,
+                "status": "queued",
+                "total": None,
+                "done": 0,
+                "error": None,
+                "file": None,
+                "enqueued_at": datetime.utcnow().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._jobs[job_id] = job
+            self._trim()
+            snapshot = dict(job)
+
+        future = self._get_executor().submit(self._run, app, job_id)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget_future)
+        return snapshot
+
+    def _forget_future(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _set(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, app, job_id):
+        with self._lock:
+            job = dict(self._jobs[job_id])
+        self._set(job_id, status="running", started_at=datetime.utcnow().isoformat())
+
+        tmp_path = None
+        try:
+            with app.app_context():
+                records = load_marksheet_records(job["batch_id"], job["division"])
+            self._set(job_id, total=len(records))
+
+            os.makedirs(self.out_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.out_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                render_bulk(
+                    records, job["format"], fh,
+                    workers=self.workers, pool_min=self.pool_min,
+                    progress=lambda done: self._set(job_id, done=done),
+                )
+            path = os.path.join(self.out_dir, f"marksheets_{uuid.uuid4().hex}.{job['format']}")
+            os.replace(tmp_path, path)
+            self._set(job_id, file=path)
+            status, error = "done", None
+        except Exception as e:
+            traceback.print_exc()
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            status, error = "failed", str(e)
+
+        self._set(job_id, status=status, error=error, finished_at=datetime.utcnow().isoformat())
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            path = self._jobs.pop(jid)["file"]
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def get(self, job_id: int):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def file_for(self, job_id: int):
+        """Path of a finished job's PDF/zip, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["file"] if job else None
+
+    def wait(self, timeout=None):
+        """Block until every job queued so far has finished (used by tests/scripts)."""
+        with self._lock:
+            futures = list(self._futures)
+        wait_futures(futures, timeout=timeout)
+
+
+marksheet_jobs = MarksheetJobQueue()
@@ -0,0 +1,201 @@
+# /backend/services/marksheet_pdf.py
+"""
+Marksheet PDF rendering (reportlab).
+
+Pages are drawn from plain dicts built by `marksheet_data()` rather than ORM
+rows, so they can be pickled to worker processes. This module imports
+nothing from the app. A spawned worker also re-imports the launching
+script as __mp_main__, so entry points must not build the app at import
+time (run.py only does so under __main__ or when `run:app` is asked for).
+
+The static part of the page (title, table headings) is drawn once per
+document as a form XObject and stamped on every page; only the student's
+own values are drawn per page.
+
+  - render_pdf(records): one document, one page per student
+  - render_bulk(records, fmt, out, ...): a whole division/batch as one
+    multi-page PDF or a zip of per-student PDFs, with progress callbacks.
+    Only zip members are rendered across a process pool (large batches);
+    the multi-page PDF is drawn in one pass, as reportlab cannot join
+    documents rendered separately and no PDF merge library is installed.
+"""
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+from typing import Optional, Any, Callable, Dict, List
+
+letter: Optional[Any] = None
+canvas_module: Optional[Any] = None
+try:
+    import importlib
+    _rl_pages = importlib.import_module('reportlab.lib.pagesizes')
+    _rl_canvas = importlib.import_module('reportlab.pdfgen.canvas')
+    letter = getattr(_rl_pages, 'letter', None)
+    canvas_module = _rl_canvas
+except Exception:
+    letter = None
+    canvas_module = None
+
+BULK_FORMATS = ("pdf", "zip")
+
+# Students handed to a worker process at a time (also the progress step)
+RENDER_CHUNK_SIZE = 25
+
+# Subject rows printed on the marksheet, in order, as Result column prefixes
+# ({slot}_avg / {slot}_grace). Optional slots take their label from
+# {slot}_code (e.g. opt1 -> HINDI or IT, opt2 -> MATHS or SP).
+MARKSHEET_SLOTS = [
+    ('ENG', 'eng'),
+    ('ECO', 'eco'),
+    ('BK', 'bk'),
+    ('OC', 'oc'),
+    (None, 'opt1'),
+    (None, 'opt2'),
+]
+
+STATIC_FORM = "marksheet_static"
+
+
+def reportlab_available() -> bool:
+    return canvas_module is not None and letter is not None and hasattr(canvas_module, 'Canvas')
+
+
+def marksheet_data(res) -> Dict[str, Any]:
+    """Snapshot of a Result row with just what a marksheet page prints."""
+    subjects = []
+    for code, slot in MARKSHEET_SLOTS:
+        avg = getattr(res, f"{slot}_avg", None)
+        if avg is None:
+            continue
+        if code is None:
+            code = getattr(res, f"{slot}_code", None) or slot.upper()
+        subjects.append((code, avg, getattr(res, f"{slot}_grace", 0) or 0))
+    return {
+        "roll_no": res.roll_no,
+        "name": res.name,
+        "division": res.division,
+        "percentage": res.percentage,
+        "subjects": subjects,
+    }
+
+
+def marksheet_filename(data) -> str:
+    return f"{data['division']}_{data['roll_no']}_marksheet.pdf"
+
+
+def _build_static_form(c, width, height):
+    """Title and table headings, shared by every page of the document."""
+    c.beginForm(STATIC_FORM)
+    c.setFont('Helvetica-Bold', 16)
+    c.drawString(40, height - 50, 'Official Marksheet')
+
+    y = height - 110
+    c.setFont('Helvetica-Bold', 11)
+    c.drawString(40, y, 'Subject')
+    c.drawString(260, y, 'Annual')
+    c.drawString(360, y, 'Internal')
+    c.drawString(460, y, 'Final')
+    c.endForm()
+
+
+def _draw_page(c, data, width, height):
+    c.doForm(STATIC_FORM)
+
+    c.setFont('Helvetica', 12)
+    c.drawString(40, height - 70, f"Name: {data['name']}  |  Roll: {data['roll_no']}  |  Division: {data['division']}")
+
+    c.setFont('Helvetica', 11)
+    y = height - 128
+
+    for code, avg, grace in data["subjects"]:
+        final = (avg or 0) + (grace or 0)
+        c.drawString(40, y, code)
+        c.drawRightString(320, y, f'{round(avg,2)}')
+        c.drawRightString(420, y, f'{round(grace,2)}')
+        c.drawRightString(520, y, f'{round(final,2)}')
+        y -= 16
+
+    percentage = data["percentage"]
+    y -= 8
+    c.setFont('Helvetica-Bold', 12)
+    c.drawString(40, y, f'Total: {round(percentage,2) if percentage is not None else "-"}')
+    c.drawRightString(520, y, f'Percentage: {percentage or "-"}')
+
+    c.showPage()
+
+
+def _draw_pages(fh, records, on_page=None):
+    c = canvas_module.Canvas(fh, pagesize=letter)
+    width, height = letter
+    _build_static_form(c, width, height)
+    for i, data in enumerate(records, 1):
+        _draw_page(c, data, width, height)
+        if on_page:
+            on_page(i)
+    c.save()
+
+
+def render_pdf(records: List[Dict[str, Any]]) -> bytes:
+    """Render `records` into one PDF (one page each) and return its bytes."""
+    buf = BytesIO()
+    _draw_pages(buf, records)
+    return buf.getvalue()
+
+
+def _render_chunk(records):
+    """Worker entry point: one standalone PDF per student."""
+    return [(marksheet_filename(data), render_pdf([data])) for data in records]
+
+
+def render_bulk(
+    records: List[Dict[str, Any]],
+    fmt: str,
+    out,
+    workers: int = 1,
+    pool_min: int = 0,
+    progress: Optional[Callable[[int], None]] = None,
+):
+    """
+    Write marksheets for all `records` to the file object `out`.
+
+    fmt="pdf" draws one multi-page document in a single pass (a reportlab
+    document cannot be split across processes). fmt="zip" stores one PDF per
+    student; with `workers` > 1 and at least `pool_min` records, chunks of
+    RENDER_CHUNK_SIZE are rendered in a process pool. `progress(done)` is
+    called as students are rendered.
+    """
+    if fmt not in BULK_FORMATS:
+        raise ValueError(f"Unknown marksheet format: {fmt}")
+
+    if fmt == "pdf":
+        step = RENDER_CHUNK_SIZE
+
+        def on_page(done):
+            if progress and (done % step == 0 or done == len(records)):
+                progress(done)
+
+        _draw_pages(out, records, on_page)
+        return
+
+    chunks = [records[i:i + RENDER_CHUNK_SIZE] for i in range(0, len(records), RENDER_CHUNK_SIZE)]
+    done = 0
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        if workers > 1 and len(chunks) > 1 and len(records) >= pool_min:
+            # spawn: the caller is usually a job thread holding DB connections
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                     mp_context=get_context("spawn")) as pool:
+                rendered = pool.map(_render_chunk, chunks)
+                for files in rendered:
+                    for name, pdf in files:
+                        zf.writestr(name, pdf)
+                    done += len(files)
+                    if progress:
+                        progress(done)
+        else:
+            for chunk in chunks:
+                for name, pdf in _render_chunk(chunk):
+                    zf.writestr(name, pdf)
+                done += len(chunk)
+                if progress:
+                    progress(done)
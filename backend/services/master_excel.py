@@ -0,0 +1,114 @@
+# /backend/services/master_excel.py
+"""
+Process-wide, pre-parsed index of the optional master marks workbook.
+
+The workbook at MASTER_EXCEL_PATH is parsed once into a dict keyed by
+(roll_no, division, subject) and re-parsed only when the file's mtime or size
+changes, so per-student lookups are dict hits instead of workbook loads.
+"""
+import os
+import threading
+
+from config import MASTER_EXCEL_PATH, MASTER_EXCEL_SHEET
+
+MARK_FIELDS = ("unit1", "unit2", "term", "annual", "internal")
+
+_index_lock = threading.Lock()
+_index_cache = {"stamp": None, "index": {}}
+
+
+def _norm(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text.upper() if text else None
+
+
+def _build_index(path, sheet_name):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in wb.sheetnames:
+            return {}
+        it = wb[sheet_name].iter_rows(values_only=True)
+        try:
+            headers = [str(x).strip().lower() if x is not None else '' for x in next(it)]
+        except StopIteration:
+            return {}
+
+        def idx_of(names):
+            for n in names:
+                if n in headers:
+                    return headers.index(n)
+            return None
+
+        r_idx = idx_of(['roll_no', 'roll', 'rollno'])
+        d_idx = idx_of(['division', 'div'])
+        subj_idx = idx_of(['subject', 'subject_code', 'subject_id'])
+        field_idx = {
+            'unit1': idx_of(['unit1']),
+            'unit2': idx_of(['unit2']),
+            'term': idx_of(['term']),
+            'annual': idx_of(['annual']),
+            'internal': idx_of(['internal', 'grace']),
+        }
+        if r_idx is None:
+            return {}
+
+        def at(row, ix):
+            return row[ix] if ix is not None and ix < len(row) else None
+
+        index = {}
+        for row in it:
+            if not row or all(c is None for c in row):
+                continue
+            roll = _norm(at(row, r_idx))
+            if roll is None:
+                continue
+            key = (roll, _norm(at(row, d_idx)), _norm(at(row, subj_idx)))
+            # first matching row wins, as with the old linear scan
+            if key not in index:
+                index[key] = {f: at(row, ix) for f, ix in field_idx.items()}
+        return index
+    finally:
+        wb.close()
+
+
+def get_master_index():
+    """Return the (roll_no, division, subject) -> marks dict index, or {} if no workbook."""
+    path = MASTER_EXCEL_PATH
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+    stamp = (path, st.st_mtime_ns, st.st_size)
+
+    with _index_lock:
+        if _index_cache["stamp"] != stamp:
+            try:
+                index = _build_index(path, MASTER_EXCEL_SHEET)
+            except Exception:
+                index = {}
+            _index_cache["stamp"] = stamp
+            _index_cache["index"] = index
+        return _index_cache["index"]
+
+
+def lookup_master_marks(roll_no, division, subject_keys=()):
+    """
+    Return the master-sheet marks for a student, or None.
+
+    `subject_keys` are tried in order (e.g. subject code, then subject id);
+    sheets without a subject or division column are matched last.
+    """
+    index = get_master_index()
+    if not index:
+        return None
+    roll = _norm(roll_no)
+    for div in (_norm(division), None):
+        for subj in list(subject_keys) + [None]:
+            hit = index.get((roll, div, _norm(subj)))
+            if hit is not None:
+                return hit
+    return None
@@ -0,0 +1,104 @@
+# /backend/services/principal_cache.py
+"""
+Short-lived cache of the principals behind API tokens.
+
+`auth.token_required` resolves a token's (role, user_id) to an active Admin
+or Teacher through this module instead of querying on every request. Entries
+are plain `Principal` tuples (safe to share across sessions and threads) and
+expire after PRINCIPAL_TTL_SECONDS. ORM update/delete events on Teacher and
+Admin drop the affected entries (again once the changing transaction ends),
+so deactivating, editing or deleting a teacher through the admin endpoints
+takes effect on the next request. Unknown or inactive users are never cached.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from models import Admin, Teacher
+
+PRINCIPAL_TTL_SECONDS = 30
+
+# kind/pk identify the row ("teacher" or "admin"); user_id/user_type are what
+# token_required passes on to the view
+Principal = namedtuple("Principal", ["kind", "pk", "user_id", "user_type"])
+
+_cache_lock = threading.Lock()
+_cache = {}   # (engine, role, token user_id) -> (Principal, loaded_at)
+
+
+def invalidate(kind=None, pk=None):
+    """Drop cached principals for one admin/teacher row, or all of them."""
+    with _cache_lock:
+        if kind is None:
+            _cache.clear()
+            return
+        for key in [k for k, (p, _) in _cache.items() if p.kind == kind and p.pk == pk]:
+            del _cache[key]
+
+
+def _identity(target):
+    if isinstance(target, Teacher):
+        return "teacher", target.teacher_id
+    return "admin", target.admin_id
+
+
+def _on_user_change(mapper, connection, target):
+    ident = _identity(target)
+    invalidate(*ident)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("principals_changed", set()).add(ident)
+
+
+def _on_transaction_end(session):
+    # A request between flush and commit/rollback may have cached the old row
+    for ident in session.info.pop("principals_changed", ()):
+        invalidate(*ident)
+
+
+for _model in (Teacher, Admin):
+    for _evt in ("after_update", "after_delete"):
+        event.listen(_model, _evt, _on_user_change)
+event.listen(Session, "after_commit", _on_transaction_end)
+event.listen(Session, "after_rollback", _on_transaction_end)
+
+
+def _resolve(role, user_id):
+    # Prefer the Admin table for ADMIN tokens to avoid id collisions, falling
+    # back to a teacher with the ADMIN role
+    user = None
+    if role == "ADMIN":
+        user = db.session.get(Admin, user_id)
+        if user is None:
+            user = db.session.get(Teacher, user_id)
+    else:
+        user = db.session.get(Teacher, user_id)
+
+    if not user or not getattr(user, "active", True):
+        return None
+
+    kind, pk = _identity(user)
+    return Principal(kind, pk, pk, getattr(user, "role", role))
+
+
+def get_principal(role, user_id):
+    """Active principal for a token's role and user_id, or None."""
+    if user_id is None:
+        return None
+
+    key = (db.engine, role, user_id)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and now - hit[1] < PRINCIPAL_TTL_SECONDS:
+            return hit[0]
+
+    principal = _resolve(role, user_id)
+    if principal is not None:
+        with _cache_lock:
+            _cache[key] = (principal, now)
+    return principal
@@ -0,0 +1,136 @@
+# /backend/services/result_jobs.py
+"""
+In-process queue for "regenerate division X of batch Y" jobs.
+
+Mark writes enqueue a job instead of regenerating inline. Jobs run on a small
+thread pool, each inside its own app context (and therefore its own DB
+session). A job that is still waiting absorbs further requests for the same
+(batch_id, division); once it starts running, a new request queues a fresh
+job so writes made during the run are picked up.
+"""
+import itertools
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from datetime import datetime
+
+from config import RESULT_JOB_WORKERS
+
+# How many finished jobs to keep for the status endpoint
+MAX_FINISHED_JOBS = 200
+
+
+class ResultJobQueue:
+    def __init__(self, max_workers: int = RESULT_JOB_WORKERS):
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()   # job_id -> job dict (all known jobs)
+        self._pending = {}           # (batch_id, division) -> queued job_id
+        self._futures = set()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="result-jobs",
+            )
+        return self._executor
+
+    def enqueue(self, app, division: str, batch_id: str) -> dict:
+        """Queue regeneration of one division; returns the (possibly merged) job."""
+        key = (batch_id, division)
+        with self._lock:
+            job_id = self._pending.get(key)
+            if job_id is not None:
+                job = self._jobs[job_id]
+                job["merged"] += 1
+                return dict(job)
+
+            job_id = next(self._ids)
+            job = {
+                "job_id": job_id,
+                "batch_id": batch_id,
+                "division": division,
+                "status": "queued",
+                "merged": 0,
+                "regenerated": None,
+                "error": None,
+                "enqueued_at": datetime.utcnow().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._jobs[job_id] = job
+            self._pending[key] = job_id
+            self._trim()
+            snapshot = dict(job)
+
+        future = self._get_executor().submit(self._run, app, job_id)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget_future)
+        return snapshot
+
+    def _forget_future(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _run(self, app, job_id):
+        from services.result_service import ensure_results_for_division
+
+        with self._lock:
+            job = self._jobs[job_id]
+            self._pending.pop((job["batch_id"], job["division"]), None)
+            job["status"] = "running"
+            job["started_at"] = datetime.utcnow().isoformat()
+
+        try:
+            with app.app_context():
+                regenerated = ensure_results_for_division(job["division"], job["batch_id"])
+            status, error = "done", None
+        except Exception as e:
+            traceback.print_exc()
+            regenerated, status, error = False, "failed", str(e)
+
+        with self._lock:
+            job["status"] = status
+            job["error"] = error
+            job["regenerated"] = regenerated
+            job["finished_at"] = datetime.utcnow().isoformat()
+
+    def _trim(self):
+        # Drop the oldest finished jobs once the history grows too long
+        finished = [jid for jid, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[jid]
+
+    def get(self, job_id: int):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self, status=None):
+        with self._lock:
+            return [
+                dict(j) for j in reversed(self._jobs.values())
+                if status is None or j["status"] == status
+            ]
+
+    def wait(self, timeout=None):
+        """Block until every job queued so far has finished (used by tests/scripts)."""
+        with self._lock:
+            futures = list(self._futures)
+        wait_futures(futures, timeout=timeout)
+
+
+result_jobs = ResultJobQueue()
+
+
+def enqueue_division_results(division: str, batch_id: str, app=None) -> dict:
+    """Queue regeneration from inside a request (defaults to the current app)."""
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+    return result_jobs.enqueue(app, division, batch_id)
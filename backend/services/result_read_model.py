@@ -0,0 +1,202 @@
+# /backend/services/result_read_model.py
+"""
+Read model for the admin results table (/admin/results).
+
+Students, results and marks for the division are fetched with one query
+each (subjects come from the cached catalog) and the JSON rows are
+assembled in memory, so the endpoint cost no longer scales with
+queries-per-student. Lookups by roll number build their rows with the same
+`build_student_row`.
+"""
+from collections import defaultdict
+
+from models import Student, Mark, Result
+from services import subject_catalog
+
+SUBJECT_ORDER = {
+    "ENG": 1,
+    "HINDI": 2, "IT": 2,
+    "ECO": 3,
+    "BK": 4,
+    "OC": 5,
+    "MATHS": 6, "SP": 6,
+    "EVS": 7,
+    "PE": 8
+}
+
+GRADE_ONLY_CODES = ("EVS", "PE")
+
+EMPTY_MARK = {
+    "unit1": None, "unit2": None, "term": None, "annual": None,
+    "internal": 0, "sub_avg": 0, "tot": 0, "grace": 0
+}
+
+
+def get_subject_order(code):
+    return SUBJECT_ORDER.get(code, 99)
+
+
+def grade_for_annual(a):
+    """Letter grade shown for grade-only subjects that only have a Mark row."""
+    if a >= 75: return 'A+'
+    if a >= 60: return 'A'
+    if a >= 50: return 'B'
+    if a >= 35: return 'C'
+    return 'F'
+
+
+def _grade_entry(code, result, m):
+    res_grade = getattr(result, f"{code.lower()}_grade", None) if result else None
+    if res_grade:
+        return {"code": code, "grade": res_grade, "mark": dict(EMPTY_MARK)}
+
+    if m and m.annual is not None:
+        return {
+            "code": code,
+            "grade": grade_for_annual(m.annual),
+            "mark": {
+                "unit1": m.unit1,
+                "term": m.term,
+                "unit2": m.unit2,
+                "internal": getattr(m, 'internal', 0),
+                "annual": m.annual,
+                "grace": getattr(result, f"{code.lower()}_grace", 0) if result else getattr(m, 'internal', 0),
+                "total": m.tot,
+                "sub_avg": m.sub_avg
+            }
+        }
+
+    # Force entry even if no data (as empty grade)
+    return {"code": code, "grade": "-", "mark": dict(EMPTY_MARK)}
+
+
+def _excel_mark_detail(excel_marks, m):
+    """Mark breakdown taken from a master Excel row (see services.master_excel)."""
+    try:
+        total_val = sum(float(excel_marks.get(k) or 0) for k in ("unit1", "unit2", "term", "annual"))
+    except (TypeError, ValueError):
+        total_val = None
+    return {
+        "unit1": excel_marks.get('unit1'),
+        "term": excel_marks.get('term'),
+        "unit2": excel_marks.get('unit2'),
+        "internal": excel_marks.get('internal'),
+        "annual": excel_marks.get('annual'),
+        "grace": None,
+        "total": total_val,
+        "sub_avg": m.sub_avg if m is not None else 0,
+    }
+
+
+def catalog_codes():
+    """(subject_id -> code, active core codes) from the cached catalog."""
+    subjects = subject_catalog.all_subjects()
+    code_by_id = {sub.subject_id: sub.subject_code for sub in subjects}
+    core_codes = {
+        sub.subject_code for sub in subjects
+        if sub.active and sub.subject_type == 'CORE'
+    }
+    return code_by_id, core_codes
+
+
+def build_student_row(s, result, mark_map, core_codes, excel_marks=None):
+    """
+    Assemble one student's row from pre-fetched Result / Mark objects.
+    `excel_marks(code)`, when given, may return a master Excel row whose
+    values replace the Mark breakdown of that (non grade-only) subject.
+    """
+    subject_entries = []
+    total_avg = 0
+    total_grace = 0
+
+    # Display set: core subjects + student's optionals + any subjects present in marks
+    include_codes = set(core_codes)
+    if s.optional_subject:
+        include_codes.add(s.optional_subject)
+    if s.optional_subject_2:
+        include_codes.add(s.optional_subject_2)
+    include_codes.update(mark_map.keys())
+
+    for code in sorted(include_codes, key=lambda c: (get_subject_order(c), c)):
+        m = mark_map.get(code)
+
+        if code in GRADE_ONLY_CODES:
+            subject_entries.append(_grade_entry(code, result, m))
+            continue
+
+        if result:
+            avg, grace = result.get_subject_data(code)
+        else:
+            avg = m.annual if m and m.annual is not None else None
+            grace = getattr(m, 'internal', 0) if m else 0
+
+        final = None
+        if avg is not None:
+            final = (avg or 0) + (grace or 0)
+            total_avg += avg or 0
+            total_grace += grace or 0
+
+        mark_detail = None
+        excel_row = excel_marks(code) if excel_marks else None
+        if isinstance(excel_row, dict):
+            mark_detail = _excel_mark_detail(excel_row, m)
+        elif m:
+            total_val = m.tot if m.tot is not None else ((m.unit1 or 0) + (m.unit2 or 0) + (m.term or 0) + (m.annual or 0))
+            mark_detail = {
+                "unit1": m.unit1,
+                "term": m.term,
+                "unit2": m.unit2,
+                "internal": getattr(m, 'internal', 0),
+                "annual": m.annual,
+                "grace": grace,
+                "total": total_val,
+                "sub_avg": m.sub_avg,
+            }
+
+        subject_entries.append({"code": code, "avg": avg, "grace": grace, "final": final, "mark": mark_detail})
+
+    final_total = None
+    perc = getattr(result, "percentage", None) if result else None
+    if subject_entries and perc is not None:
+        final_total = total_avg + total_grace
+
+    return {
+        "roll_no": s.roll_no,
+        "name": s.name,
+        "subjects": subject_entries,
+        "total_avg": round(total_avg, 2),
+        "total_grace": round(total_grace, 2),
+        "final_total": round(final_total, 2) if final_total is not None else None,
+        "percentage": perc,
+        "overall_grade": getattr(result, "overall_grade", None) if result else None,
+    }
+
+
+def build_division_rows(division, batch_id):
+    """Return the /admin/results rows for a division using three queries."""
+    students = (
+        Student.query.filter_by(division=division, batch_id=batch_id)
+        .order_by(Student.roll_no)
+        .all()
+    )
+    if not students:
+        return []
+
+    results = {
+        r.roll_no: r
+        for r in Result.query.filter_by(division=division, batch_id=batch_id).all()
+    }
+    marks = Mark.query.filter_by(division=division, batch_id=batch_id).all()
+    code_by_id, core_codes = catalog_codes()
+
+    marks_by_roll = defaultdict(dict)
+    for m in marks:
+        code = code_by_id.get(m.subject_id)
+        if code is not None:
+            marks_by_roll[m.roll_no][code] = m
+
+    rows = []
+    for idx, s in enumerate(students, start=1):
+        row = build_student_row(s, results.get(s.roll_no), marks_by_roll.get(s.roll_no, {}), core_codes)
+        rows.append({"seq": idx, **row})
+    return rows
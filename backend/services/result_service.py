@@ -1,7 +1,11 @@
 # /backend/services/result_service.py
 
-from models import Student, Mark, Result, Subject, TeacherSubjectAllocation
+from models import Student, Mark, Result, TeacherSubjectAllocation, ResultWatermark
 from app import db
+from sqlalchemy import func
+from db_utils import bulk_upsert, count_existing
+from models import now
+from services import subject_catalog, batch_registry
 
 
 # ---------------- SUBJECT GRACE HELPER ----------------
@@ -50,269 +54,368 @@ def apply_subject_grace(mark_map, required_codes):
 
 
 import math
-
-def generate_results_for_division(division: str, batch_id: str):
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import RESULT_BATCH_WORKERS
+
+CORE_CODES = ("ENG", "ECO", "BK", "OC")
+
+# Result columns written by the engine. Identity columns, `name` (set only on
+# creation), the grade-only subjects and `is_published` are left untouched.
+RESULT_COMPUTED_COLUMNS = (
+    "eng_avg", "eng_grace",
+    "eco_avg", "eco_grace",
+    "bk_avg", "bk_grace",
+    "oc_avg", "oc_grace",
+    "opt1_code", "opt1_avg", "opt1_grace",
+    "opt2_code", "opt2_avg", "opt2_grace",
+    "overall_tot", "total_grace", "percentage", "overall_grade",
+    "updated_at",
+)
+RESULT_KEY_COLUMNS = ("batch_id", "roll_no", "division")
+
+
+def get_grade_from_percentage(perc):
+    if perc >= 75: return "Grade I with Distinction"
+    if perc >= 60: return "Grade I"
+    if perc >= 45: return "Grade II"
+    if perc >= 35: return "Pass Class"
+    return "Fail"
+
+
+def _slot_for_code(values, code):
+    """Map a subject code to its Result column prefix (mirrors Result.get_subject_data)."""
+    if code in CORE_CODES:
+        return code.lower()
+    if code == values["opt1_code"]:
+        return "opt1"
+    if code == values["opt2_code"]:
+        return "opt2"
+    return None
+
+
+def compute_student_result(student, marks_by_code):
     """
-    Generate / update results for all students in a division.
+    Compute the Result column values for one student.
 
-    Logic:
-    1. Filter students by division and batch.
-    2. Determine required subjects (Core + Student Optionals).
-    3. Fetch marks and use `sub_avg` (rounded up) as the value.
-    4. Map optionals to `opt1` and `opt2` slots.
-    5. Calculate percentage based on these rounded averages.
+    `marks_by_code` maps subject code -> Mark for this student. Returns a dict
+    keyed by RESULT_COMPUTED_COLUMNS (minus `updated_at`), or None when a
+    required subject (Core + student's optionals) has no `sub_avg` yet.
     """
-    
-    # 1. Fetch Students
-    students = Student.query.filter_by(division=division, batch_id=batch_id).all()
-    if not students:
-        return
+    required_codes = list(CORE_CODES)
+    if student.optional_subject:
+        required_codes.append(student.optional_subject)
+    if student.optional_subject_2:
+        required_codes.append(student.optional_subject_2)
 
-    # 2. Fetch Marks for this division
-    marks = Mark.query.filter_by(
-        division=division, 
-        batch_id=batch_id
-    ).all()
+    for code in required_codes:
+        m = marks_by_code.get(code)
+        if not m or m.sub_avg is None:
+            return None
+
+    # CEILING logic: 64.1 -> 65, 64.0 -> 64
+    def get_rounded_mark(code):
+        return float(math.ceil(marks_by_code[code].sub_avg))
+
+    values = {}
+    total_score = 0.0
+    subject_count = 0
+
+    # --- CORE SUBJECTS ---
+    for code in CORE_CODES:
+        val = get_rounded_mark(code)
+        values[f"{code.lower()}_avg"] = val
+        values[f"{code.lower()}_grace"] = 0.0
+        total_score += val
+        subject_count += 1
+
+    # --- OPTIONAL SLOTS ---
+    # opt1 <- Student.optional_subject, opt2 <- Student.optional_subject_2
+    for slot, code in (("opt1", student.optional_subject), ("opt2", student.optional_subject_2)):
+        values[f"{slot}_code"] = None
+        values[f"{slot}_avg"] = None
+        values[f"{slot}_grace"] = 0.0
+        if code:
+            val = get_rounded_mark(code)
+            values[f"{slot}_code"] = code
+            values[f"{slot}_avg"] = val
+            total_score += val
+            subject_count += 1
+
+    # --- PERCENTAGE & GRACE LOGIC ---
+    # 1. Base Percentage (No Grace)
+    percentage = round(total_score / subject_count, 2) if subject_count > 0 else 0.0
+    values["percentage"] = percentage
+    values["overall_tot"] = total_score
+    values["total_grace"] = 0.0
+
+    # 2. Identify Failed Subjects (< 35), in column order
+    failed_subjects = []
+    for code in CORE_CODES:
+        if values[f"{code.lower()}_avg"] < 35.0:
+            failed_subjects.append(code)
+    for slot in ("opt1", "opt2"):
+        if values[f"{slot}_code"] and values[f"{slot}_avg"] < 35.0:
+            failed_subjects.append(values[f"{slot}_code"])
+
+    # 3. Apply Logic
+    MAX_GRACE_TOTAL = 15
+    MAX_GRACE_SUB = 10
+
+    current_grade = get_grade_from_percentage(percentage)
+
+    if failed_subjects:
+        # --- RULE 1: Subject Passing (Condonation) ---
+        condonation_applied = False
+        if len(failed_subjects) <= 3:
+            needed_grace = 0
+            eligible = True
+            grace_map = {}  # slot -> amount needed
+
+            for code in failed_subjects:
+                slot = _slot_for_code(values, code)
+                val = values[f"{slot}_avg"] if slot else None
+                if val is None: val = 0.0
+
+                deficit = 35.0 - val
+                if deficit > MAX_GRACE_SUB:
+                    eligible = False
+                    break
+
+                if slot:
+                    grace_map[slot] = deficit
+                needed_grace += deficit
+
+            if eligible and needed_grace <= MAX_GRACE_TOTAL:
+                condonation_applied = True
+                values["total_grace"] = needed_grace
+                values["overall_grade"] = "Promoted - Passed with Condonation"
+                for slot, g_val in grace_map.items():
+                    values[f"{slot}_grace"] = g_val
+
+        if not condonation_applied:
+            # Failed and not covered by grace
+            values["overall_grade"] = "Fail"
+    else:
+        # --- RULE 2: Grade II -> Grade I Promotion ---
+        # Only when no subject grace was needed. Total in [357, 359] on the
+        # 6 x 100 scale is lifted to 360 (60%) with up to 3 grace marks.
+        if current_grade == "Grade II" and 357 <= total_score <= 359:
+            values["total_grace"] = 360.0 - total_score
+            values["overall_grade"] = "Grade I"
+        else:
+            values["overall_grade"] = current_grade
+
+    return values
 
-    # Organize marks by (roll_no, subject_code) for fast lookup
-    # Need subject map to convert subject_id -> code
-    subjects_map = {s.subject_id: s.subject_code for s in Subject.query.all()}
-    
-    # mark_map key: (roll_no, subject_code) -> Mark object
-    mark_map = {}
+
+def _marks_by_roll(marks):
+    """Group Mark rows as roll_no -> subject_code -> Mark."""
+    subjects_map = subject_catalog.code_by_id()
+    grouped = defaultdict(dict)
     for m in marks:
         code = subjects_map.get(m.subject_id)
         if code:
-            mark_map[(m.roll_no, code)] = m
+            grouped[m.roll_no][code] = m
+    return grouped
+
 
-    # 3. Process each student
+def _write_results(students, marks_by_roll, division, batch_id):
+    """
+    Compute `students` in memory and stage the Result writes on the session:
+    one UPDATE clearing incomplete results and one bulk upsert for the rest.
+    The caller commits. Returns (rows upserted, students incomplete).
+    """
+    stamp = now()
+    rows = []
+    incomplete_rolls = []
     for student in students:
-        # Determine strict required subjects
-        # Core + Student's selected optionals
-        required_codes = ["ENG", "ECO", "BK", "OC"]
-        if student.optional_subject:
-            required_codes.append(student.optional_subject)
-        if student.optional_subject_2:
-            required_codes.append(student.optional_subject_2)
-
-        # Check if all required marks are present (using sub_avg check as proxy for valid mark entry)
-        # Note: We rely on `sub_avg` being present.
-        missing_required = False
-        student_marks = {} 
-
-        for code in required_codes:
-            m = mark_map.get((student.roll_no, code))
-            if not m or m.sub_avg is None:
-                missing_required = True
-                break
-            student_marks[code] = m
-
-        if missing_required:
-            # If Result exists, clear valid flag or percentage to indicate incomplete
-            existing = Result.query.filter_by(roll_no=student.roll_no, division=student.division, batch_id=batch_id).first()
-            if existing:
-                existing.percentage = None
-                existing.total_grace = 0.0
-                db.session.add(existing)
+        values = compute_student_result(student, marks_by_roll.get(student.roll_no, {}))
+        if values is None:
+            incomplete_rolls.append(student.roll_no)
             continue
 
-        # All marks present. Prepare Result row.
-        result = Result.query.filter_by(
+        values.update(
+            batch_id=batch_id,
             roll_no=student.roll_no,
             division=student.division,
-            batch_id=batch_id,
-        ).first()
-
-        if not result:
-            result = Result()
-            result.roll_no = student.roll_no
-            result.name = student.name
-            result.division = student.division
-            result.batch_id = batch_id
-        
-        # Reset all slots to None/0 before populating
-        result.opt1_code = None
-        result.opt1_avg = None
-        result.opt1_grace = 0.0
-        result.opt2_code = None
-        result.opt2_avg = None
-        result.opt2_grace = 0.0
-
-        total_score = 0.0
-        subject_count = 0
-
-        # Helper to get rounded mark
-        def get_rounded_mark(code):
-            m = student_marks.get(code)
-            if m and m.sub_avg is not None:
-                # CEILING logic: 64.1 -> 65, 64.0 -> 64
-                return float(math.ceil(m.sub_avg))
-            return 0.0
-
-        # --- CORE SUBJECTS ---
-        # ENG
-        val_eng = get_rounded_mark("ENG")
-        result.eng_avg = val_eng
-        result.eng_grace = 0.0 # Grace logic placeholder
-        total_score += val_eng
-        subject_count += 1
+            name=student.name,
+            updated_at=stamp,
+        )
+        rows.append(values)
+
+    if incomplete_rolls:
+        Result.query.filter(
+            Result.batch_id == batch_id,
+            Result.division == division,
+            Result.roll_no.in_(incomplete_rolls),
+        ).update(
+            {"percentage": None, "total_grace": 0.0, "updated_at": stamp},
+            synchronize_session=False,
+        )
+
+    if rows:
+        added = len(rows) - count_existing(db.session, Result, rows, RESULT_KEY_COLUMNS)
+        bulk_upsert(db.session, Result, rows, RESULT_KEY_COLUMNS, RESULT_COMPUTED_COLUMNS)
+        batch_registry.touch(db.session, batch_id, Result, added)
+    return len(rows), len(incomplete_rolls)
+
+
+def division_fingerprint(division: str, batch_id: str) -> str:
+    """
+    The division's write counter (DivisionVersion, bumped with every
+    student/mark write made through the app) plus a cheap aggregate over its
+    marks and students (count, latest updated_at, sum of sub_avg) as a
+    backstop for writes made outside it.
+    """
+    version = batch_registry.division_version(db.session, batch_id, division)
+    marks_agg = db.session.query(
+        func.count(Mark.mark_id),
+        func.max(Mark.updated_at),
+        func.sum(Mark.sub_avg),
+    ).filter(Mark.batch_id == batch_id, Mark.division == division).one()
+    students_agg = db.session.query(
+        func.count(Student.student_id),
+        func.max(Student.updated_at),
+    ).filter(Student.batch_id == batch_id, Student.division == division).one()
+    return "|".join(str(v) for v in (version, *marks_agg, *students_agg))
+
+
+def _record_watermark(division, batch_id, fingerprint):
+    bulk_upsert(
+        db.session,
+        ResultWatermark,
+        [{
+            "batch_id": batch_id,
+            "division": division,
+            "fingerprint": fingerprint,
+            "generated_at": now(),
+        }],
+        ("batch_id", "division"),
+        ("fingerprint", "generated_at"),
+    )
 
-        # ECO
-        val_eco = get_rounded_mark("ECO")
-        result.eco_avg = val_eco
-        result.eco_grace = 0.0
-        total_score += val_eco
-        subject_count += 1
 
-        # BK
-        val_bk = get_rounded_mark("BK")
-        result.bk_avg = val_bk
-        result.bk_grace = 0.0
-        total_score += val_bk
-        subject_count += 1
+def generate_results_for_division(division: str, batch_id: str):
+    """
+    Generate / update results for all students in a division.
 
-        # OC
-        val_oc = get_rounded_mark("OC")
-        result.oc_avg = val_oc
-        result.oc_grace = 0.0
-        total_score += val_oc
-        subject_count += 1
+    Set-based: students, marks and subjects are read with one query each,
+    every student is computed in memory with `compute_student_result`, and
+    the Result rows are written back with a single bulk upsert. Students with
+    missing required marks get their existing Result (if any) cleared in one
+    UPDATE instead of being recomputed.
 
-        # --- OPTIONAL SLOT 1 ---
-        # Mapped from Student.optional_subject
-        if student.optional_subject:
-            code = student.optional_subject
-            val = get_rounded_mark(code)
-            result.opt1_code = code
-            result.opt1_avg = val
-            result.opt1_grace = 0.0
-            total_score += val
-            subject_count += 1
+    The division fingerprint is taken before reading and stored as the
+    watermark, so writes that race with generation leave it stale.
 
-        # --- OPTIONAL SLOT 2 ---
-        # Mapped from Student.optional_subject_2
-        if student.optional_subject_2:
-            code = student.optional_subject_2
-            val = get_rounded_mark(code)
-            result.opt2_code = code
-            result.opt2_avg = val
-            result.opt2_grace = 0.0
-            total_score += val
-            subject_count += 1
+    Returns counts: {"students", "results", "incomplete"}.
+    """
+    fingerprint = division_fingerprint(division, batch_id)
 
-        # --- PERCENTAGE & GRACE LOGIC ---
-        
-        # 1. Base Percentage (No Grace)
-        if subject_count > 0:
-            result.percentage = round(total_score / subject_count, 2)
-        else:
-            result.percentage = 0.0
-        
-        result.overall_tot = total_score
-        
-        # 2. Identify Failed Subjects
-        # Collect (code, score) for subjects < 35
-        # Note: We track by code to assign grace later
-        failed_subjects = []
-        
-        # Helper to check pass/fail
-        def check_fail(code, score):
-            if score < 35.0:
-                failed_subjects.append(code)
-
-        check_fail("ENG", result.eng_avg)
-        check_fail("ECO", result.eco_avg)
-        check_fail("BK", result.bk_avg)
-        check_fail("OC", result.oc_avg)
-        if result.opt1_code: check_fail(result.opt1_code, result.opt1_avg)
-        if result.opt2_code: check_fail(result.opt2_code, result.opt2_avg)
-
-        # 3. Apply Logic
-        MAX_GRACE_TOTAL = 15
-        MAX_GRACE_SUB = 10
-        
-        # Reset grace
-        result.total_grace = 0.0
-        
-        # Default Grade Calculation (Based on Percentage)
-        def get_grade_from_percentage(perc):
-            if perc >= 75: return "Grade I with Distinction"
-            if perc >= 60: return "Grade I"
-            if perc >= 45: return "Grade II"
-            if perc >= 35: return "Pass Class"
-            return "Fail"
-
-        current_grade = get_grade_from_percentage(result.percentage)
+    students = Student.query.filter_by(division=division, batch_id=batch_id).all()
+    if not students:
+        return {"students": 0, "results": 0, "incomplete": 0}
 
-        # --- RULE 1: Subject Passing (Condonation) ---
-        condonation_applied = False
-        
-        if failed_subjects:
-            # Check eligibility
-            if len(failed_subjects) <= 3:
-                needed_grace = 0
-                eligible = True
-                grace_map = {} # code -> amount needed
-                
-                for code in failed_subjects:
-                    # fetch current val
-                    val, _ = result.get_subject_data(code)
-                    if val is None: val = 0.0
-                    
-                    deficit = 35.0 - val
-                    if deficit > MAX_GRACE_SUB:
-                        eligible = False
-                        break
-                    
-                    grace_map[code] = deficit
-                    needed_grace += deficit
-                
-                if eligible and needed_grace <= MAX_GRACE_TOTAL:
-                    # APPLY CONDONATION
-                    condonation_applied = True
-                    result.total_grace = needed_grace
-                    result.overall_grade = "Promoted - Passed with Condonation"
-                    
-                    # Distribute grace to fields
-                    for code, g_val in grace_map.items():
-                        if code == "ENG": result.eng_grace = g_val
-                        elif code == "ECO": result.eco_grace = g_val
-                        elif code == "BK": result.bk_grace = g_val
-                        elif code == "OC": result.oc_grace = g_val
-                        elif code == result.opt1_code: result.opt1_grace = g_val
-                        elif code == result.opt2_code: result.opt2_grace = g_val
-            
-            if not condonation_applied:
-                # Failed and not covered by grace
-                result.overall_grade = "Fail"
-        else:
-            # No failed subjects -> Passed
-            # --- RULE 2: Grade II -> Grade I Promotion ---
-            # Only if NO subject grace was needed (condition: failed_subjects empty here)
-            promotion_applied = False
-            
-            if current_grade == "Grade II":
-                # Check tot score range [357, 359]
-                # target is 360 (60% of 6 subjects usually, assuming 600 total?)
-                # Wait, "percentage based" means 60% of total marks. 
-                # If subject_count=6 and max=100 each, total=600. 60% is 360.
-                # If subject_count is different, scale accordingly?
-                # User prompt said: "total_marks \u2208 [357, 359]" explicitly. 
-                # I will adhere to 357-359 range assuming 6 subjects * 100.
-                
-                if 357 <= result.overall_tot <= 359:
-                    deficit = 360.0 - result.overall_tot
-                    # Logic says "Up to 3 grace marks". 360-357=3. 360-359=1.
-                    # Fits 3 limit.
-                    
-                    result.total_grace = deficit
-                    result.overall_grade = "Grade I"
-                    promotion_applied = True
-            
-            if not promotion_applied:
-                result.overall_grade = current_grade
-
-        db.session.add(result)
+    marks = Mark.query.filter_by(division=division, batch_id=batch_id).all()
+    written, incomplete = _write_results(students, _marks_by_roll(marks), division, batch_id)
+    _record_watermark(division, batch_id, fingerprint)
 
     db.session.commit()
+    return {"students": len(students), "results": written, "incomplete": incomplete}
+
+
+def _generate_division_timed(app, division, batch_id):
+    """Worker body for generate_results_for_batch: own app context, own session."""
+    start = time.perf_counter()
+    with app.app_context():
+        counts = generate_results_for_division(division, batch_id)
+    counts.update(division=division, seconds=round(time.perf_counter() - start, 3))
+    return counts
+
+
+def generate_results_for_batch(batch_id: str, app=None, max_workers: int = RESULT_BATCH_WORKERS):
+    """
+    Regenerate every division of `batch_id` in parallel.
+
+    Each division runs on a pool thread inside its own app context, so every
+    worker has its own DB session and connection. SQLite serialises writers,
+    so there the divisions simply run one after another.
+
+    Returns one entry per division with its row counts and timing.
+    """
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+
+    divisions = sorted(
+        d for (d,) in db.session.query(Student.division)
+        .filter(Student.batch_id == batch_id)
+        .distinct()
+        .all()
+        if d
+    )
+    if not divisions:
+        return []
+
+    if db.session.get_bind().dialect.name == "sqlite":
+        max_workers = 1
+    workers = max(1, min(max_workers, len(divisions)))
+
+    # Release this request's connection while the workers run
+    db.session.remove()
 
+    if workers == 1:
+        return [_generate_division_timed(app, d, batch_id) for d in divisions]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="result-batch") as pool:
+        return list(pool.map(lambda d: _generate_division_timed(app, d, batch_id), divisions))
+
+
+def ensure_results_for_division(division: str, batch_id: str) -> bool:
+    """
+    Regenerate the division's results only if its marks or students changed
+    since the last generation. Returns True when a regeneration ran.
+    """
+    watermark = ResultWatermark.query.filter_by(
+        batch_id=batch_id, division=division
+    ).first()
+    if watermark is not None and watermark.fingerprint == division_fingerprint(division, batch_id):
+        return False
+
+    generate_results_for_division(division, batch_id)
+    return True
+
+
+def generate_result_for_student(roll_no: str, division: str, batch_id: str, fingerprint_before=None):
+    """
+    Recompute the single Result row for (batch_id, roll_no, division).
+
+    Used after a mark write: applies the same rules as
+    `generate_results_for_division` but only reads this student's marks.
+
+    `fingerprint_before` is the division fingerprint taken before that mark
+    write. If the watermark still matches it, the rest of the division was
+    already up to date, so the watermark moves to the current fingerprint
+    and the next read does not regenerate the whole division.
+    """
+    student = Student.query.filter_by(
+        roll_no=roll_no, division=division, batch_id=batch_id
+    ).first()
+    if not student:
+        return
+
+    fingerprint = division_fingerprint(division, batch_id)
+    marks = Mark.query.filter_by(
+        roll_no=roll_no, division=division, batch_id=batch_id
+    ).all()
+    _write_results([student], _marks_by_roll(marks), division, batch_id)
+
+    if fingerprint_before is not None:
+        watermark = ResultWatermark.query.filter_by(batch_id=batch_id, division=division).first()
+        if watermark is not None and watermark.fingerprint == fingerprint_before:
+            _record_watermark(division, batch_id, fingerprint)
+
+    db.session.commit()
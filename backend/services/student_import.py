@@ -0,0 +1,192 @@
+# /backend/services/student_import.py
+"""
+Bulk student import for /admin/students/import.
+
+Rows are streamed from read-only worksheets and handled in chunks of
+IMPORT_CHUNK_SIZE, so peak memory stays bounded for large admission files.
+Rows are checked against the column lengths and against one pre-fetched set
+of existing (roll_no, division) keys for the batch, compared
+case-insensitively like the MySQL collation, so a row the database would
+reject is reported on its own instead of failing the bulk write; each chunk's new students and their
+placeholder core Mark rows are written with one executemany each, and the
+whole import is committed once at the end.
+"""
+from itertools import islice
+
+from sqlalchemy import insert
+
+from app import db
+from models import Student, Mark
+from services import subject_catalog, batch_registry
+
+# Core subjects that get an all-zero Mark row for every new student
+PLACEHOLDER_CODES = ("ENG", "ECO", "BK", "OC")
+
+# Parsed rows validated and written per round trip
+IMPORT_CHUNK_SIZE = 500
+
+# Sheet column label per Student field, for length errors
+FIELD_LABELS = {
+    "roll_no": "Roll Number",
+    "name": "Name",
+    "division": "Division",
+    "optional_subject": "Optional Subject 1",
+    "optional_subject_2": "Optional Subject 2",
+}
+
+
+def _text(row, idx):
+    if len(row) <= idx or row[idx] is None:
+        return None
+    text = str(row[idx]).strip()
+    return text or None
+
+
+def iter_student_rows(wb):
+    """
+    Stream every sheet (Roll Number, Name, Division, Optional Subject 1,
+    Optional Subject 2; first row is a header) as
+    (sheet_name, row_idx, fields) tuples, skipping blank rows.
+    """
+    for sheet_name in wb.sheetnames:
+        for row_idx, row in enumerate(wb[sheet_name].iter_rows(values_only=True)):
+            if row_idx == 0:
+                continue
+            if not row or all(cell is None or str(cell).strip() == '' for cell in row):
+                continue
+            yield sheet_name, row_idx + 1, {
+                "roll_no": str(row[0]).strip() if len(row) > 0 and row[0] is not None else None,
+                "name": str(row[1]).strip() if len(row) > 1 and row[1] is not None else None,
+                "division": str(row[2]).strip() if len(row) > 2 and row[2] is not None else None,
+                "optional_subject": _text(row, 3),
+                "optional_subject_2": _text(row, 4),
+            }
+
+
+def _placeholder_marks(students, batch_id):
+    subjects = [
+        s for s in (subject_catalog.get_subject_by_code(c) for c in PLACEHOLDER_CODES)
+        if s is not None and s.subject_eval_type != "GRADE"
+    ]
+    if not subjects or not students:
+        return []
+
+    existing = set(
+        db.session.query(Mark.roll_no, Mark.division, Mark.subject_id)
+        .filter(
+            Mark.batch_id == batch_id,
+            Mark.roll_no.in_({s["roll_no"] for s in students}),
+            Mark.division.in_({s["division"] for s in students}),
+            Mark.subject_id.in_([s.subject_id for s in subjects]),
+        )
+        .all()
+    )
+
+    rows = []
+    for st in students:
+        for subj in subjects:
+            if (st["roll_no"], st["division"], subj.subject_id) in existing:
+                continue
+            rows.append({
+                "roll_no": st["roll_no"],
+                "division": st["division"],
+                "subject_id": subj.subject_id,
+                "batch_id": batch_id,
+                "unit1": 0, "unit2": 0, "term": 0, "annual": 0,
+                "tot": 0, "sub_avg": 0, "internal": 0,
+                "entered_by": None,
+            })
+    return rows
+
+
+def _dup_key(roll_no, division):
+    return (str(roll_no).upper(), str(division).upper())
+
+
+def _too_long(fields):
+    """Label of the first field longer than its Student column, or None."""
+    for field, label in FIELD_LABELS.items():
+        value = fields[field]
+        limit = Student.__table__.c[field].type.length
+        if value is not None and len(value) > limit:
+            return f"{label} longer than {limit} characters"
+    return None
+
+
+def _validate_chunk(chunk, existing, batch_id, errors):
+    students = []
+    for sheet_name, row_idx, f in chunk:
+        roll_no, name, division = f["roll_no"], f["name"], f["division"]
+        where = f"Sheet '{sheet_name}', Row {row_idx}"
+
+        if not roll_no or not name or not division:
+            errors.append(f"{where}: Missing required fields (Roll Number, Name, Division)")
+            continue
+
+        problem = _too_long(f)
+        if problem:
+            errors.append(f"{where}: Failed to create student - {problem}")
+            continue
+
+        key = _dup_key(roll_no, division)
+        if key in existing:
+            errors.append(f"{where}: Student {roll_no} in division {division} already exists")
+            continue
+
+        if not f["optional_subject"] or not f["optional_subject_2"]:
+            errors.append(f"{where}: Failed to create student - Optional Subject 1 and Optional Subject 2 are required")
+            continue
+
+        existing.add(key)
+        students.append({
+            "batch_id": batch_id,
+            "roll_no": roll_no,
+            "name": name,
+            "division": division.upper(),
+            "optional_subject": f["optional_subject"],
+            "optional_subject_2": f["optional_subject_2"],
+        })
+    return students
+
+
+def import_students(wb, batch_id, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import all students in `wb` (ideally opened with read_only=True) into
+    `batch_id`.
+
+    Returns (students_created, errors); `errors` holds one message per
+    rejected row, in sheet/row order. Raises if a bulk write fails, after
+    rolling the whole import back.
+    """
+    existing = {
+        _dup_key(roll_no, division)
+        for roll_no, division in db.session.query(Student.roll_no, Student.division)
+        .filter(Student.batch_id == batch_id)
+    }
+
+    errors = []
+    created = 0
+    rows = iter_student_rows(wb)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            students = _validate_chunk(chunk, existing, batch_id, errors)
+            if not students:
+                continue
+            db.session.execute(insert(Student), students)
+            batch_registry.touch(db.session, batch_id, Student, len(students),
+                                 divisions={s["division"] for s in students})
+            marks = _placeholder_marks(students, batch_id)
+            if marks:
+                db.session.execute(insert(Mark), marks)
+                batch_registry.touch(db.session, batch_id, Mark, len(marks))
+            created += len(students)
+        if created:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return created, errors
@@ -0,0 +1,143 @@
+# /backend/services/subject_catalog.py
+"""
+Process-wide cache of the (tiny, almost static) `subjects` table.
+
+Handlers look subjects up by id, code or name through this module instead of
+re-querying. Entries are plain `SubjectInfo` tuples carrying the same
+attribute names as the model, so they are safe to share across sessions and
+threads. The cache is invalidated by ORM insert/update/delete events on
+`Subject` (again once the changing transaction ends), and reloaded after
+CATALOG_TTL_SECONDS so changes made by other processes are picked up too.
+Code and name lookups are case-insensitive, like the MySQL collation.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from models import Subject
+
+CATALOG_TTL_SECONDS = 60
+
+SubjectInfo = namedtuple(
+    "SubjectInfo",
+    ["subject_id", "subject_code", "subject_name", "subject_type", "subject_eval_type", "active"],
+)
+
+_catalog_lock = threading.Lock()
+_catalog = {"engine": None, "loaded_at": 0.0, "by_id": {}, "by_code": {}, "by_name": {}, "ordered": []}
+
+
+def invalidate():
+    """Drop the cached catalog; the next lookup reloads it."""
+    with _catalog_lock:
+        _catalog["engine"] = None
+
+
+def _on_subject_change(mapper, connection, target):
+    invalidate()
+    session = object_session(target)
+    if session is not None:
+        session.info["subjects_changed"] = True
+
+
+def _on_transaction_end(session):
+    # A reload between flush and commit/rollback may have cached stale rows
+    if session.info.pop("subjects_changed", False):
+        invalidate()
+
+
+for _evt in ("after_insert", "after_update", "after_delete"):
+    event.listen(Subject, _evt, _on_subject_change)
+event.listen(Session, "after_commit", _on_transaction_end)
+event.listen(Session, "after_rollback", _on_transaction_end)
+
+
+def _key(text):
+    return str(text).strip().upper()
+
+
+def _load():
+    engine = db.engine
+    with _catalog_lock:
+        fresh = (
+            _catalog["engine"] is engine
+            and time.monotonic() - _catalog["loaded_at"] < CATALOG_TTL_SECONDS
+        )
+        if fresh:
+            return _catalog
+
+    # Query outside the lock: autoflushing a dirty Subject fires
+    # _on_subject_change -> invalidate(), which takes the lock itself
+    rows = db.session.query(
+        Subject.subject_id,
+        Subject.subject_code,
+        Subject.subject_name,
+        Subject.subject_type,
+        Subject.subject_eval_type,
+        Subject.active,
+    ).order_by(Subject.subject_code).all()
+    ordered = [SubjectInfo(*r) for r in rows]
+
+    with _catalog_lock:
+        _catalog.update(
+            engine=engine,
+            loaded_at=time.monotonic(),
+            ordered=ordered,
+            by_id={s.subject_id: s for s in ordered},
+            by_code={_key(s.subject_code): s for s in ordered},
+            by_name={_key(s.subject_name): s for s in ordered},
+        )
+        return _catalog
+
+
+def all_subjects(active_only: bool = False):
+    """All subjects ordered by subject_code."""
+    subjects = _load()["ordered"]
+    if active_only:
+        return [s for s in subjects if s.active]
+    return list(subjects)
+
+
+def get_subject(subject_id):
+    try:
+        return _load()["by_id"].get(int(subject_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_subject_by_code(code):
+    if code is None:
+        return None
+    return _load()["by_code"].get(_key(code))
+
+
+def find_subject(value):
+    """Resolve a numeric id, subject code or subject name (as sent by uploads/forms)."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    if text.isdigit():
+        return get_subject(text)
+    catalog = _load()
+    return catalog["by_code"].get(_key(text)) or catalog["by_name"].get(_key(text))
+
+
+def code_by_id():
+    """subject_id -> subject_code map."""
+    return {sid: s.subject_code for sid, s in _load()["by_id"].items()}
+
+
+def eval_type(subject_id):
+    s = get_subject(subject_id)
+    return s.subject_eval_type if s else None
+
+
+def subject_type(subject_id):
+    s = get_subject(subject_id)
+    return s.subject_type if s else None
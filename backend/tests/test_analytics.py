@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import event
+from app import create_app, db
+import config
+from models import Mark, Student, Subject, Teacher
+from auth import generate_token, hash_password
+from services.result_service import generate_results_for_division
+
+BATCH = "2025-2026"
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def _seed():
+    codes = ["ENG", "ECO", "BK", "OC", "IT", "MATHS"]
+    subjects = [Subject(subject_code=c, subject_name=c, subject_type="CORE") for c in codes]
+    db.session.add_all(subjects)
+    db.session.commit()
+    # roll -> (division, ENG average, other subjects' average); None = no marks yet
+    students = {"1": ("A", 80, 80), "2": ("A", 30, 60), "3": ("A", 10, 60), "4": ("A", 80, 80),
+                "5": ("B", 50, 50), "6": ("B", None, None)}
+    for roll, (div, eng, other) in students.items():
+        db.session.add(Student(roll_no=roll, name=f"S{roll}", division=div, batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+        if eng is None:
+            continue
+        for subj in subjects:
+            avg = eng if subj.subject_code == "ENG" else other
+            db.session.add(Mark(roll_no=roll, division=div, subject_id=subj.subject_id, batch_id=BATCH,
+                                annual=avg, sub_avg=avg))
+    db.session.commit()
+    for div in ("A", "B"):
+        generate_results_for_division(div, BATCH)
+
+
+def test_division_summary_aggregates_in_one_query(app):
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH):
+        _seed()
+        teacher = Teacher(name="T", userid="t1", password_hash=hash_password("x"))
+        db.session.add(teacher)
+        db.session.commit()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(teacher.teacher_id, 'TEACHER')}"}
+        client.get("/analytics/division-summary?division=A", headers=headers)   # warm the principal cache
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            one = client.get("/analytics/division-summary?division=A", headers=headers).get_json()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        assert len(statements) == 1
+
+        assert one["total_students"] == 4 and one["results"] == 4
+        assert (one["passed"], one["failed"], one["condonation"], one["pending"]) == (3, 1, 1, 0)
+        assert one["grade_distribution"] == {
+            "Grade I with Distinction": 2,
+            "Promoted - Passed with Condonation": 1,
+            "Fail": 1,
+        }
+        assert one["average_percentage"] == round((80 + 55 + 51.67 + 80) / 4, 2)
+
+        every = client.get("/analytics/division-summary", headers=headers).get_json()
+        assert every["batch_id"] == BATCH
+        assert [d["division"] for d in every["divisions"]] == ["A", "B"]
+        b = every["divisions"][1]
+        assert (b["total_students"], b["passed"], b["pending"]) == (2, 1, 1)
+        assert b["grade_distribution"] == {"Grade II": 1}
+
+        lower = client.get("/analytics/division-summary?division=%20a%20", headers=headers).get_json()
+        assert lower == one
+
+        empty = client.get("/analytics/division-summary?division=Z", headers=headers).get_json()
+        assert empty["total_students"] == 0 and empty["average_percentage"] == 0
@@ -0,0 +1,35 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+import batch_config
+
+
+@pytest.fixture
+def batch_file(tmp_path, monkeypatch):
+    path = tmp_path / "active_batch.json"
+    monkeypatch.setattr(batch_config, "ACTIVE_BATCH_FILE", str(path))
+    monkeypatch.setattr(batch_config, "WATCH_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(batch_config, "_state", None)
+    return path
+
+
+def test_missing_file_falls_back_to_default(batch_file):
+    assert batch_config.get_active_batch() == batch_config.DEFAULT_BATCH
+    assert json.loads(batch_file.read_text()) == {"active_batch": batch_config.DEFAULT_BATCH}
+
+
+def test_active_batch_is_served_from_memory_and_follows_file_changes(batch_file):
+    batch_config.set_active_batch("2025-2026")
+
+    with patch("builtins.open", side_effect=AssertionError("active batch read from disk")):
+        assert batch_config.get_active_batch() == "2025-2026"
+        batch_config.refresh()   # unchanged file -> nothing to read
+
+    # another worker switches the batch
+    tmp = batch_file.with_suffix(".new")
+    tmp.write_text(json.dumps({"active_batch": "2026-2027"}))
+    os.replace(tmp, batch_file)
+    assert batch_config.get_active_batch() == "2025-2026"
+    batch_config.refresh()
+    assert batch_config.get_active_batch() == "2026-2027"
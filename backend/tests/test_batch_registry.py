@@ -0,0 +1,180 @@
+import json
+import pytest
+from unittest.mock import patch
+from sqlalchemy import event
+from app import create_app, db
+import config
+from models import Admin, BatchRegistry, Mark, Student, Subject, Teacher
+from auth import generate_token, hash_password
+from services.batch_registry import import_legacy_registry, reconcile_counts, touch
+from services.result_service import generate_results_for_division
+
+BATCH = "2025-2026"
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def test_counts_follow_orm_and_bulk_writes(app):
+    with app.app_context():
+        subjects = [Subject(subject_code=c, subject_name=c, subject_type="CORE")
+                    for c in ("ENG", "ECO", "BK", "OC", "IT", "MATHS")]
+        db.session.add_all(subjects)
+        db.session.commit()
+        assert BatchRegistry.query.count() == 0
+
+        for roll in ("1", "2"):
+            db.session.add(Student(roll_no=roll, name=f"S{roll}", division="A", batch_id=BATCH,
+                                   optional_subject="IT", optional_subject_2="MATHS"))
+            for subj in subjects:
+                db.session.add(Mark(roll_no=roll, division="A", subject_id=subj.subject_id, batch_id=BATCH,
+                                    annual=50, sub_avg=50))
+        db.session.commit()
+
+        entry = db.session.get(BatchRegistry, BATCH)
+        assert (entry.student_count, entry.mark_count, entry.result_count) == (2, 12, 0)
+
+        generate_results_for_division("A", BATCH)   # bulk upsert, outside the ORM unit of work
+        db.session.commit()
+        db.session.refresh(entry)
+        assert entry.result_count == 2
+
+        db.session.delete(Student.query.filter_by(roll_no="2").first())
+        db.session.commit()
+        db.session.refresh(entry)
+        assert entry.student_count == 1
+
+
+def test_counts_are_incremented_not_recounted(app):
+    with app.app_context():
+        eng = Subject(subject_code="ENG", subject_name="ENG", subject_type="CORE")
+        db.session.add(eng)
+        db.session.add(Student(roll_no="1", name="S1", division="A", batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+        db.session.commit()
+        entry = db.session.get(BatchRegistry, BATCH)
+        assert entry.student_count == 1
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            db.session.add(Mark(roll_no="1", division="A", subject_id=eng.subject_id, batch_id=BATCH,
+                                annual=50, sub_avg=50))
+            touch(db.session, BATCH, Mark, 2)   # e.g. a bulk insert of two rows
+            db.session.commit()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        assert not [s for s in statements if "count(" in s.lower()]
+        db.session.refresh(entry)
+        assert (entry.student_count, entry.mark_count) == (1, 3)
+
+        # the over-count (no such bulk rows exist) heals when batches are listed
+        assert reconcile_counts(db.session) == [BATCH]
+        db.session.refresh(entry)
+        assert (entry.student_count, entry.mark_count, entry.result_count) == (1, 1, 0)
+        assert reconcile_counts(db.session) == []
+
+
+def test_batch_endpoints_use_registry_table(app, tmp_path):
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH), \
+            patch("routes.admin_routes.get_active_batch", return_value=BATCH), \
+            patch("routes.admin_routes.set_active_batch") as set_active:
+        admin = Admin(username="admin", password_hash=hash_password("x"))
+        db.session.add(admin)
+        db.session.commit()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(admin.admin_id, 'ADMIN')}"}
+
+        legacy = tmp_path / "registry.json"
+        legacy.write_text(json.dumps({"batches": [
+            {"batch_id": BATCH, "created_at": "2026-01-21T18:46:37", "is_active": True, "created_by": 1},
+        ]}))
+        assert import_legacy_registry(str(legacy)) == 1
+        assert import_legacy_registry(str(legacy)) == 0
+
+        resp = client.post("/admin/batches/create", json={"batch_id": "2026-2027"}, headers=headers)
+        assert resp.status_code == 201
+        assert resp.get_json()["batch"]["student_count"] == 0
+        dup = client.post("/admin/batches/create", json={"batch_id": "2026-2027"}, headers=headers)
+        assert dup.status_code == 409
+
+        assert client.post("/admin/batches/switch", json={"batch_id": "2026-2027"},
+                           headers=headers).status_code == 200
+        set_active.assert_called_once_with("2026-2027")
+
+        body = client.get("/admin/batches", headers=headers).get_json()
+        assert body["active_batch"] == BATCH
+        assert [(b["batch_id"], b["is_active"]) for b in body["batches"]] == [
+            (BATCH, False), ("2026-2027", True),
+        ]
+
+        # the batch file cannot be written: the registry flag goes back
+        set_active.side_effect = OSError("read-only")
+        with patch("routes.admin_routes.get_active_batch", return_value="2026-2027"):
+            resp = client.post("/admin/batches/switch", json={"batch_id": BATCH}, headers=headers)
+        assert resp.status_code == 500
+        assert [(b.batch_id, b.is_active) for b in BatchRegistry.query.order_by(BatchRegistry.batch_id)] == [
+            (BATCH, False), ("2026-2027", True),
+        ]
+
+
+def test_request_can_select_a_registered_batch(app):
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH):
+        admin = Admin(username="admin", password_hash=hash_password("x"))
+        db.session.add(admin)
+        for batch, div in ((BATCH, "A"), ("2026-2027", "B")):
+            db.session.add(Student(roll_no="1", name="S", division=div, batch_id=batch,
+                                   optional_subject="IT", optional_subject_2="MATHS"))
+        db.session.commit()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(admin.admin_id, 'ADMIN')}"}
+
+        assert client.get("/admin/divisions", headers=headers).get_json() == ["A"]
+        assert client.get("/admin/divisions", headers={**headers, "X-Batch-Id": "2026-2027"}).get_json() == ["B"]
+        assert client.get("/admin/divisions?batch_id=2026-2027", headers=headers).get_json() == ["B"]
+
+        unknown = client.get("/admin/divisions", headers={**headers, "X-Batch-Id": "1999"})
+        assert unknown.status_code == 400
+
+        # teachers work in the active batch only
+        teacher = Teacher(name="T", userid="t1", password_hash=hash_password("x"))
+        db.session.add(teacher)
+        db.session.commit()
+        teacher_headers = {"Authorization": f"Bearer {generate_token(teacher.teacher_id, 'TEACHER')}"}
+        assert client.get("/teacher/divisions", headers=teacher_headers).status_code == 200
+        refused = client.get("/teacher/divisions", headers={**teacher_headers, "X-Batch-Id": "2026-2027"})
+        assert refused.status_code == 403
+        assert client.get("/teacher/divisions?batch_id=2026-2027", headers=teacher_headers).status_code == 403
+        # no token: the override is ignored and the route answers 401 itself
+        assert client.get("/admin/divisions", headers={"X-Batch-Id": "2026-2027"}).status_code == 401
+
+        with patch("routes.admin_routes.get_active_batch", return_value=BATCH):
+            body = client.get("/admin/batches", headers=headers).get_json()
+            assert (body["active_batch"], body["batch_override"]) == (BATCH, None)
+            body = client.get("/admin/batches", headers={**headers, "X-Batch-Id": "2026-2027"}).get_json()
+            assert (body["active_batch"], body["batch_override"]) == (BATCH, "2026-2027")
+
+
+def test_missing_registry_table_logs_discarded_deltas(app, caplog):
+    from services import batch_registry
+
+    with app.app_context():
+        BatchRegistry.__table__.drop(db.engine)
+        batch_registry._ready_tables.clear()
+        db.session.add(Student(roll_no="1", name="S1", division="A", batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+        with caplog.at_level("WARNING", logger="services.batch_registry"):
+            db.session.commit()
+        assert "counter updates for 2025-2026 discarded" in caplog.text
+        BatchRegistry.__table__.create(db.engine)
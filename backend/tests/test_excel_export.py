@@ -0,0 +1,192 @@
+import io
+import pytest
+from unittest.mock import patch
+import openpyxl
+from app import create_app, db
+import config
+from models import Student, Mark, Result, Subject
+from services.result_service import generate_results_for_division
+from services.excel_export import generate_excel_for_batch
+
+BATCH = "2025-2026"
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def _seed():
+    codes = ["ENG", "ECO", "BK", "OC", "IT", "MATHS"]
+    subjects = {c: Subject(subject_code=c, subject_name=c, subject_type="CORE") for c in codes}
+    db.session.add_all(subjects.values())
+    db.session.commit()
+    for roll, div, avg in (("1", "A", 80), ("2", "B", 20)):
+        db.session.add(Student(roll_no=roll, name=f"Student {div}", division=div, batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+        for c in codes:
+            db.session.add(Mark(roll_no=roll, division=div, subject_id=subjects[c].subject_id, batch_id=BATCH,
+                                unit1=10, annual=avg, sub_avg=avg))
+    db.session.commit()
+    for div in ("A", "B"):
+        generate_results_for_division(div, BATCH)
+
+
+def test_batch_export_writes_all_sheets(app):
+    with app.app_context():
+        _seed()
+        buf = io.BytesIO()
+        generate_excel_for_batch(BATCH).save(buf)
+        latest = max(r.updated_at for r in Result.query.filter_by(division="A"))
+
+    wb = openpyxl.load_workbook(buf)
+    assert wb.sheetnames == ["DIV_A", "DIV_A_All", "NAME A", "DIV_B", "DIV_B_All", "NAME B", "Fail List"]
+
+    detail = wb["DIV_A"]
+    assert detail["A3"].value == f"Data as of: {latest.strftime('%d-%m-%Y %H:%M')}"
+    assert "A1:AZ1" in {str(r) for r in detail.merged_cells.ranges}
+    assert detail["A4"].value == "ROLL NO" and detail["A4"].fill.fgColor.rgb == "001F4E78"
+    assert (detail["A6"].value, detail["B6"].value, detail["C6"].value) == ("1", "Student A", 10)
+    assert detail["H6"].value == "=SUM(C6:G6)"
+    assert detail["C6"].border.left.style == "thin"
+    assert detail.column_dimensions["B"].width == len("Student A") + 2
+
+    fail = wb["Fail List"]
+    assert fail["A3"].value == "DIVISION B"
+    assert fail["B5"].value == "Student B"
+
+
+def test_export_endpoint_serves_cached_file_with_etag(app, tmp_path):
+    from auth import generate_token, hash_password
+    from models import Admin
+
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH), \
+            patch("services.export_cache.EXPORT_CACHE_DIR", str(tmp_path)), \
+            patch("services.excel_export.generate_excel_for_batch", wraps=generate_excel_for_batch) as build:
+        _seed()
+        admin = Admin(username="admin", password_hash=hash_password("x"))
+        db.session.add(admin)
+        db.session.commit()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(admin.admin_id, 'ADMIN')}"}
+
+        first = client.get("/admin/results/export-excel", headers=headers)
+        assert first.status_code == 200
+        etag = first.headers["ETag"].strip('"')
+        body = first.get_data()
+        first.close()
+
+        again = client.get("/admin/results/export-excel", headers=headers)
+        assert again.get_data() == body
+        again.close()
+        assert build.call_count == 1
+
+        cached = client.get("/admin/results/export-excel",
+                            headers={**headers, "If-None-Match": f'"{etag}"'})
+        assert cached.status_code == 304
+
+        mark = Mark.query.first()
+        mark.unit1 = 12
+        db.session.commit()
+        changed = client.get("/admin/results/export-excel",
+                             headers={**headers, "If-None-Match": f'"{etag}"'})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"].strip('"') != etag
+        changed.close()
+        assert build.call_count == 2
+        assert len(list(tmp_path.glob("*.xlsx"))) == 2
+
+
+def test_filtered_export_keeps_divisions_apart(app):
+    with app.app_context():
+        _seed()
+        # same roll number in another division must not pick up division A's marks
+        db.session.add(Student(roll_no="1", name="Other One", division="C", batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+        db.session.commit()
+
+        buf = io.BytesIO()
+        generate_excel_for_batch(BATCH, divisions=["A", "C"], sheets=["detail", "summary"]).save(buf)
+
+        with pytest.raises(ValueError):
+            generate_excel_for_batch(BATCH, sheets=["charts"])
+
+    wb = openpyxl.load_workbook(buf)
+    assert wb.sheetnames == ["DIV_A", "DIV_C", "Fail List"]
+    assert wb["DIV_A"]["C6"].value == 10
+    assert wb["DIV_C"]["B6"].value == "Other One"
+    assert wb["DIV_C"]["C6"].value == 0
+    # division C has no result yet, and B was filtered out
+    assert wb["Fail List"]["A3"].value is None
+
+
+def test_export_endpoint_filters_by_query(app, tmp_path):
+    from auth import generate_token, hash_password
+    from models import Admin
+
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH), \
+            patch("services.export_cache.EXPORT_CACHE_DIR", str(tmp_path)):
+        _seed()
+        admin = Admin(username="admin", password_hash=hash_password("x"))
+        db.session.add(admin)
+        db.session.commit()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(admin.admin_id, 'ADMIN')}"}
+
+        bad = client.get("/admin/results/export-excel?sheets=detail,charts", headers=headers)
+        assert bad.status_code == 400
+
+        resp = client.get("/admin/results/export-excel?divisions=b&sheets=names", headers=headers)
+        assert resp.status_code == 200
+        assert "DIV B" in resp.headers["Content-Disposition"]
+        wb = openpyxl.load_workbook(io.BytesIO(resp.get_data()))
+        resp.close()
+        assert wb.sheetnames == ["NAME B"]
+
+
+def test_cache_hands_out_handles_and_locks_per_key(tmp_path):
+    import threading
+    from openpyxl import Workbook
+    from services import export_cache
+
+    def workbook():
+        wb = Workbook(write_only=True)
+        wb.create_sheet("S").append(["x"])
+        return wb
+
+    with patch("services.export_cache.EXPORT_CACHE_DIR", str(tmp_path)):
+        fh = export_cache.get_or_build("a" * 40, workbook)
+        # evicted between the lookup and send_file: the open handle still reads
+        (tmp_path / ("a" * 40 + ".xlsx")).unlink()
+        assert fh.read(2) == b"PK"
+        fh.close()
+
+        # a slow render of one export does not hold up another
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            assert release.wait(10)
+            return workbook()
+
+        worker = threading.Thread(target=lambda: export_cache.get_or_build("b" * 40, slow).close())
+        worker.start()
+        assert started.wait(10)
+        other = threading.Thread(target=lambda: export_cache.get_or_build("c" * 40, workbook).close())
+        other.start()
+        other.join(5)
+        finished_first = not other.is_alive()
+        release.set()
+        other.join(10)
+        assert finished_first
+        worker.join(10)
+        assert not worker.is_alive()
+        assert export_cache._build_locks == {}
@@ -0,0 +1,121 @@
+import io
+import zipfile
+import pytest
+from unittest.mock import patch
+from app import create_app, db
+import config
+from models import Student, Mark, Subject, Admin, Result
+from auth import generate_token, hash_password
+from services.marksheet_jobs import MarksheetJobQueue, marksheet_jobs
+from services.marksheet_pdf import render_bulk, render_pdf, marksheet_data
+
+BATCH = "2025-2026"
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def _seed():
+    codes = ["ENG", "ECO", "BK", "OC", "IT", "MATHS"]
+    subjects = {c: Subject(subject_code=c, subject_name=c, subject_type="CORE") for c in codes}
+    db.session.add_all(subjects.values())
+    db.session.commit()
+    for div, rolls in (("A", range(1, 4)), ("B", range(11, 13))):
+        for roll in rolls:
+            db.session.add(Student(roll_no=str(roll), name=f"Student {roll}", division=div, batch_id=BATCH,
+                                   optional_subject="IT", optional_subject_2="MATHS"))
+            for c in codes:
+                db.session.add(Mark(roll_no=str(roll), division=div, subject_id=subjects[c].subject_id,
+                                    batch_id=BATCH, unit1=10, annual=60, sub_avg=60))
+    db.session.add(Admin(username="admin", password_hash=hash_password("x")))
+    db.session.commit()
+
+
+def _pages(pdf):
+    return pdf.count(b"/Type /Page\n") + pdf.count(b"/Type /Page ")
+
+
+def test_bulk_marksheets_job_renders_division_and_batch(app, tmp_path):
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH), \
+            patch.object(marksheet_jobs, "out_dir", str(tmp_path)):
+        _seed()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(1, 'ADMIN')}"}
+
+        bad = client.post("/admin/results/marksheets", json={"format": "docx"}, headers=headers)
+        assert bad.status_code == 400
+
+        # results are generated by the job itself (one load for the division)
+        resp = client.post("/admin/results/marksheets", json={"division": "a"}, headers=headers)
+        assert resp.status_code == 202
+        pdf_job = resp.get_json()["job_id"]
+
+        resp = client.post("/admin/results/marksheets", json={"format": "zip"}, headers=headers)
+        zip_job = resp.get_json()["job_id"]
+        marksheet_jobs.wait(timeout=60)
+
+        status = client.get(f"/admin/results/marksheets/{pdf_job}", headers=headers).get_json()
+        assert status["status"] == "done"
+        assert (status["done"], status["total"], status["progress"]) == (3, 3, 100.0)
+
+        pdf = client.get(f"/admin/results/marksheets/{pdf_job}/download", headers=headers)
+        assert pdf.status_code == 200 and pdf.mimetype == "application/pdf"
+        assert _pages(pdf.get_data()) == 3
+        pdf.close()
+
+        zipped = client.get(f"/admin/results/marksheets/{zip_job}/download", headers=headers)
+        names = zipfile.ZipFile(io.BytesIO(zipped.get_data())).namelist()
+        zipped.close()
+        assert sorted(names) == ["A_1_marksheet.pdf", "A_2_marksheet.pdf", "A_3_marksheet.pdf",
+                                 "B_11_marksheet.pdf", "B_12_marksheet.pdf"]
+
+        assert "file" not in status
+        assert client.get("/admin/results/marksheets/999", headers=headers).status_code == 404
+
+        # another worker process sharing the directory, its job ids starting over
+        other = MarksheetJobQueue(workers=1, out_dir=str(tmp_path))
+        for _ in range(pdf_job):
+            job = other.enqueue(app, BATCH, "B", "pdf")
+        other.wait(timeout=60)
+        assert job["job_id"] == pdf_job
+        assert other.file_for(pdf_job) != marksheet_jobs.file_for(pdf_job)
+        with open(marksheet_jobs.file_for(pdf_job), "rb") as fh:
+            assert _pages(fh.read()) == 3
+
+
+def test_render_bulk_zip_uses_process_pool(monkeypatch):
+    monkeypatch.setattr("services.marksheet_pdf.RENDER_CHUNK_SIZE", 2)
+    records = [{"roll_no": str(i), "name": f"S{i}", "division": "A", "percentage": 50.0,
+                "subjects": [("ENG", 50.0, 0)]} for i in range(5)]
+    seen = []
+    out = io.BytesIO()
+    render_bulk(records, "zip", out, workers=2, pool_min=0, progress=seen.append)
+
+    zf = zipfile.ZipFile(out)
+    assert len(zf.namelist()) == 5
+    assert all(_pages(zf.read(n)) == 1 for n in zf.namelist())
+    assert seen == [2, 4, 5]
+
+
+def test_marksheet_uses_optional_slots_and_one_static_form():
+    res = Result(roll_no="7", name="Asha", division="A", eng_avg=55.5, eng_grace=2.0,
+                 eco_avg=40.0, bk_avg=35.0, oc_avg=None, opt1_code="IT", opt1_avg=70.0, opt1_grace=0.0,
+                 opt2_code="MATHS", opt2_avg=30.0, opt2_grace=5.0, percentage=61.2)
+    data = marksheet_data(res)
+    assert [code for code, _, _ in data["subjects"]] == ["ENG", "ECO", "BK", "IT", "MATHS"]
+    assert data["subjects"][-1] == ("MATHS", 30.0, 5.0)
+
+    pdf = render_pdf([data, dict(data, roll_no="8")])
+    assert _pages(pdf) == 2
+    # headings live in one form XObject that both pages reference
+    assert pdf.count(b"/Subtype /Form") == 1
@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import patch
+from app import create_app, db
+import config
+from models import Admin, Teacher
+from auth import generate_token, hash_password
+from services import principal_cache
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def test_token_principal_is_cached_until_teacher_changes(app):
+    with app.app_context(), patch("app.get_active_batch", return_value="2025-2026"), \
+            patch("services.principal_cache._resolve", wraps=principal_cache._resolve) as resolve:
+        admin = Admin(username="admin", password_hash=hash_password("x"))
+        teacher = Teacher(name="T", userid="t1", password_hash=hash_password("x"))
+        db.session.add_all([admin, teacher])
+        db.session.commit()
+        client = app.test_client()
+        teacher_headers = {"Authorization": f"Bearer {generate_token(teacher.teacher_id, 'TEACHER')}"}
+        admin_headers = {"Authorization": f"Bearer {generate_token(admin.admin_id, 'ADMIN')}"}
+
+        for _ in range(3):
+            assert client.get("/auth/me", headers=teacher_headers).status_code == 200
+        assert resolve.call_count == 1
+
+        resp = client.put(f"/admin/teachers/{teacher.teacher_id}", json={"active": False}, headers=admin_headers)
+        assert resp.status_code == 200
+        assert client.get("/auth/me", headers=teacher_headers).status_code == 401
+
+        db.session.get(Teacher, teacher.teacher_id).active = True
+        db.session.commit()
+        assert client.get("/auth/me", headers=teacher_headers).status_code == 200
+
+        resp = client.delete(f"/admin/teachers/{teacher.teacher_id}", headers=admin_headers)
+        assert resp.status_code == 200
+        assert client.get("/auth/me", headers=teacher_headers).status_code == 401
@@ -0,0 +1,239 @@
+import threading
+import pytest
+from unittest.mock import patch
+from app import create_app, db
+import config
+from models import Student, Mark, Result, Subject
+from services.result_service import (
+    generate_results_for_division,
+    generate_result_for_student,
+    ensure_results_for_division,
+    generate_results_for_batch,
+)
+from services.result_jobs import ResultJobQueue
+
+BATCH = "2025-2026"
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def _seed_division(avgs_by_roll):
+    """Create subjects, students (IT / MATHS optionals) and marks for division A."""
+    codes = [("ENG", "CORE"), ("ECO", "CORE"), ("BK", "CORE"), ("OC", "CORE"),
+             ("IT", "OPTIONAL"), ("MATHS", "OPTIONAL")]
+    subjects = [Subject(subject_code=c, subject_name=c, subject_type=t) for c, t in codes]
+    db.session.add_all(subjects)
+    db.session.commit()
+    s_map = {s.subject_code: s.subject_id for s in subjects}
+
+    for roll, avgs in avgs_by_roll.items():
+        db.session.add(Student(
+            roll_no=roll, name=f"Student {roll}", division="A",
+            optional_subject="IT", optional_subject_2="MATHS", batch_id=BATCH,
+        ))
+        for code, val in avgs.items():
+            db.session.add(Mark(
+                roll_no=roll, division="A", subject_id=s_map[code],
+                batch_id=BATCH, sub_avg=val,
+            ))
+    db.session.commit()
+    return s_map
+
+
+def test_division_generation_upserts_rows(app):
+    with app.app_context():
+        _seed_division({
+            "1": {"ENG": 60, "ECO": 60, "BK": 60, "OC": 60, "IT": 60, "MATHS": 58},
+            "2": {"ENG": 80, "ECO": 80, "BK": 80, "OC": 80, "IT": 80, "MATHS": 80},
+            "3": {"ENG": 80, "ECO": 80, "BK": 80, "OC": 80, "IT": 80},  # MATHS missing
+        })
+
+        generate_results_for_division("A", BATCH)
+        generate_results_for_division("A", BATCH)  # second run takes the update path
+
+        rows = {r.roll_no: r for r in Result.query.all()}
+        assert set(rows) == {"1", "2"}
+        assert rows["1"].overall_grade == "Grade I"
+        assert rows["1"].total_grace == 2.0
+        assert rows["1"].name == "Student 1"
+        assert rows["2"].overall_grade == "Grade I with Distinction"
+        assert rows["2"].percentage == 80.0
+
+
+def test_student_recompute_only_touches_that_row(app):
+    with app.app_context():
+        s_map = _seed_division({
+            "1": {"ENG": 70, "ECO": 70, "BK": 70, "OC": 70, "IT": 70, "MATHS": 70},
+            "2": {"ENG": 70, "ECO": 70, "BK": 70, "OC": 70, "IT": 70, "MATHS": 70},
+        })
+        generate_results_for_division("A", BATCH)
+        before = {r.roll_no: r.updated_at for r in Result.query.all()}
+
+        m = Mark.query.filter_by(roll_no="1", subject_id=s_map["ENG"]).first()
+        m.sub_avg = 28.0
+        db.session.commit()
+
+        generate_result_for_student("1", "A", BATCH)
+
+        rows = {r.roll_no: r for r in Result.query.all()}
+        assert rows["1"].eng_avg == 28.0
+        assert rows["1"].eng_grace == 7.0
+        assert rows["1"].overall_grade == "Promoted - Passed with Condonation"
+        assert rows["2"].eng_avg == 70.0
+        assert rows["2"].updated_at == before["2"]
+
+        # Removing a required mark clears the computed percentage
+        db.session.delete(Mark.query.filter_by(roll_no="1", subject_id=s_map["IT"]).first())
+        db.session.commit()
+        generate_result_for_student("1", "A", BATCH)
+        assert db.session.get(Result, rows["1"].result_id).percentage is None
+
+
+def test_ensure_results_skips_unchanged_division(app):
+    with app.app_context():
+        s_map = _seed_division({
+            "1": {"ENG": 70, "ECO": 70, "BK": 70, "OC": 70, "IT": 70, "MATHS": 70},
+        })
+        assert ensure_results_for_division("A", BATCH) is True
+        assert ensure_results_for_division("A", BATCH) is False
+
+        m = Mark.query.filter_by(roll_no="1", subject_id=s_map["ENG"]).first()
+        m.sub_avg = 90.0
+        db.session.commit()
+
+        assert ensure_results_for_division("A", BATCH) is True
+        assert Result.query.filter_by(roll_no="1").first().eng_avg == 90.0
+        assert ensure_results_for_division("A", BATCH) is False
+
+
+def test_result_jobs_merge_and_run(app):
+    with app.app_context():
+        _seed_division({
+            "1": {"ENG": 70, "ECO": 70, "BK": 70, "OC": 70, "IT": 70, "MATHS": 70},
+        })
+
+    queue = ResultJobQueue(max_workers=1)
+    gate = threading.Event()
+    queue._get_executor().submit(gate.wait)  # hold the single worker
+
+    first = queue.enqueue(app, "A", BATCH)
+    second = queue.enqueue(app, "A", BATCH)
+    assert second["job_id"] == first["job_id"]
+    assert second["merged"] == 1
+
+    gate.set()
+    queue.wait(timeout=10)
+
+    job = queue.get(first["job_id"])
+    assert job["status"] == "done"
+    assert job["regenerated"] is True
+    with app.app_context():
+        assert Result.query.filter_by(roll_no="1").first().percentage == 70.0
+
+
+def test_generate_results_for_batch_reports_each_division(app):
+    with app.app_context():
+        _seed_division({
+            "1": {"ENG": 70, "ECO": 70, "BK": 70, "OC": 70, "IT": 70, "MATHS": 70},
+            "2": {"ENG": 70, "ECO": 70, "BK": 70, "OC": 70, "IT": 70},
+        })
+        db.session.add(Student(
+            roll_no="1", name="Other", division="B",
+            optional_subject="IT", optional_subject_2="MATHS", batch_id=BATCH,
+        ))
+        db.session.commit()
+
+        report = generate_results_for_batch(BATCH, app=app)
+
+        by_div = {r["division"]: r for r in report}
+        assert set(by_div) == {"A", "B"}
+        assert by_div["A"]["students"] == 2
+        assert by_div["A"]["results"] == 1
+        assert by_div["A"]["incomplete"] == 1
+        assert by_div["B"]["results"] == 0
+        assert all(r["seconds"] >= 0 for r in report)
+        assert Result.query.count() == 1
+
+
+def test_roll_no_lookup_matches_division_table_row(app):
+    from models import Admin
+    from auth import generate_token, hash_password
+
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH), \
+            patch("routes.admin_routes.lookup_master_marks", return_value=None):
+        _seed_division({
+            "1": {"ENG": 60, "ECO": 60, "BK": 60, "OC": 60, "IT": 60, "MATHS": 58},
+            "2": {"ENG": 80, "ECO": 80, "BK": 80, "OC": 80, "IT": 80},  # MATHS missing
+        })
+        db.session.add(Admin(username="admin", password_hash=hash_password("x")))
+        db.session.commit()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(1, 'ADMIN')}"}
+
+        table = client.get("/admin/results?division=A", headers=headers).get_json()
+        for row in table:
+            single = client.get(f"/admin/results?roll_no={row['roll_no']}", headers=headers).get_json()
+            expected = {k: v for k, v in row.items() if k != "seq"}
+            assert single == dict(expected, division="A")
+
+
+def test_fingerprint_sees_edits_that_keep_aggregates(app):
+    from datetime import datetime
+    from services.result_service import division_fingerprint
+
+    with app.app_context():
+        s_map = _seed_division({"1": {"ENG": 70, "ECO": 70}})
+        m = Mark.query.filter_by(roll_no="1", subject_id=s_map["ENG"]).first()
+        m.unit1, m.unit2 = 10, 20
+        # another mark holds max(updated_at), like an edit within the same MySQL second
+        Mark.query.filter_by(roll_no="1", subject_id=s_map["ECO"]).first().updated_at = datetime(2100, 1, 1)
+        db.session.commit()
+        before = division_fingerprint("A", BATCH)
+
+        # unit1/unit2 swap: count, sum(sub_avg) and max(updated_at) unchanged
+        m.unit1, m.unit2 = 20, 10
+        db.session.commit()
+        assert division_fingerprint("A", BATCH) != before
+
+
+def test_single_mark_write_keeps_division_watermark(app):
+    from models import Admin, Teacher, TeacherSubjectAllocation
+    from auth import generate_token, hash_password
+
+    with app.app_context(), patch("app.get_active_batch", return_value=BATCH):
+        s_map = _seed_division({
+            "1": {"ENG": 70, "ECO": 70, "BK": 70, "OC": 70, "IT": 70, "MATHS": 70},
+            "2": {"ENG": 60, "ECO": 60, "BK": 60, "OC": 60, "IT": 60, "MATHS": 60},
+        })
+        teacher = Teacher(name="T", userid="t1", password_hash=hash_password("x"))
+        db.session.add_all([teacher, Admin(username="admin", password_hash=hash_password("x"))])
+        db.session.commit()
+        db.session.add(TeacherSubjectAllocation(teacher_id=teacher.teacher_id,
+                                                subject_id=s_map["ENG"], division="A"))
+        db.session.commit()
+        assert ensure_results_for_division("A", BATCH) is True
+
+        client = app.test_client()
+        teacher_headers = {"Authorization": f"Bearer {generate_token(teacher.teacher_id, 'TEACHER')}"}
+        admin_headers = {"Authorization": f"Bearer {generate_token(1, 'ADMIN')}"}
+        mark_id = Mark.query.filter_by(roll_no="1", subject_id=s_map["ENG"]).first().mark_id
+        resp = client.put(f"/teacher/marks/{mark_id}", headers=teacher_headers,
+                          json={"unit1": 25, "unit2": 25, "term": 50, "annual": 80})
+        assert resp.status_code == 200
+
+        with patch("services.result_service.generate_results_for_division") as regenerate:
+            rows = client.get("/admin/results?division=A", headers=admin_headers).get_json()
+        regenerate.assert_not_called()
+        eng = next(s for s in rows[0]["subjects"] if s["code"] == "ENG")
+        assert eng["avg"] == 90
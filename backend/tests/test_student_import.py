@@ -0,0 +1,132 @@
+import pytest
+from unittest.mock import patch
+import openpyxl
+from app import create_app, db
+import config
+from models import Student, Mark, Subject
+from services.student_import import import_students
+
+BATCH = "2025-2026"
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def _workbook(sheets):
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        ws.append(["Roll Number", "Name", "Division", "Optional Subject 1", "Optional Subject 2"])
+        for row in rows:
+            ws.append(row)
+    return wb
+
+
+def test_import_bulk_inserts_students_and_placeholder_marks(app):
+    with app.app_context():
+        for code in ("ENG", "ECO", "BK", "OC"):
+            db.session.add(Subject(subject_code=code, subject_name=code, subject_type="CORE"))
+        db.session.add(Subject(subject_code="PE", subject_name="PE", subject_type="CORE", subject_eval_type="GRADE"))
+        db.session.add(Student(roll_no="1", name="Existing", division="A", batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+        db.session.commit()
+
+        wb = _workbook({
+            "A": [
+                ["1", "Dup of existing", "a", "IT", "MATHS"],
+                ["2", "Two", "a", "HINDI", "SP"],
+                [None, None, None, None, None],
+                ["3", None, "A", "IT", "MATHS"],
+                ["2", "Dup in file", "A", "IT", "MATHS"],
+            ],
+            "B": [
+                ["1", "One B", "B", "IT", "SP"],
+                ["4", "No optionals", "B", None, None],
+            ],
+        })
+
+        created, errors = import_students(wb, BATCH)
+
+        assert created == 2
+        assert errors == [
+            "Sheet 'A', Row 2: Student 1 in division a already exists",
+            "Sheet 'A', Row 5: Missing required fields (Roll Number, Name, Division)",
+            "Sheet 'A', Row 6: Student 2 in division A already exists",
+            "Sheet 'B', Row 3: Failed to create student - Optional Subject 1 and Optional Subject 2 are required",
+        ]
+        assert {(s.roll_no, s.division) for s in Student.query.all()} == {("1", "A"), ("2", "A"), ("1", "B")}
+        new = Student.query.filter_by(roll_no="2", division="A").first()
+        assert new.created_at is not None and new.optional_subject == "HINDI"
+
+        marks = Mark.query.all()
+        assert len(marks) == 8
+        assert {m.roll_no for m in marks} == {"2", "1"}
+        assert all(m.batch_id == BATCH and m.annual == 0 for m in marks)
+
+
+def test_import_reports_rows_the_database_would_reject(app):
+    with app.app_context():
+        db.session.add(Student(roll_no="R1", name="Existing", division="A", batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+        db.session.commit()
+
+        wb = _workbook({"A": [
+            ["r1", "Case dup of existing", "A", "IT", "MATHS"],
+            ["2", "Long division", "A" * 11, "IT", "MATHS"],
+            ["3", "Long optional", "A", "X" * 21, "MATHS"],
+            ["4" * 51, "Long roll", "A", "IT", "MATHS"],
+            ["5", "N" * 201, "A", "IT", "MATHS"],
+            ["6", "Six", "A", "IT", "MATHS"],
+            ["X7", "Seven", "A", "IT", "MATHS"],
+            ["x7", "Case dup in file", "a", "IT", "MATHS"],
+        ]})
+
+        created, errors = import_students(wb, BATCH)
+
+        assert created == 2
+        assert errors == [
+            "Sheet 'A', Row 2: Student r1 in division A already exists",
+            "Sheet 'A', Row 3: Failed to create student - Division longer than 10 characters",
+            "Sheet 'A', Row 4: Failed to create student - Optional Subject 1 longer than 20 characters",
+            "Sheet 'A', Row 5: Failed to create student - Roll Number longer than 50 characters",
+            "Sheet 'A', Row 6: Failed to create student - Name longer than 200 characters",
+            "Sheet 'A', Row 9: Student x7 in division a already exists",
+        ]
+        assert {s.roll_no for s in Student.query.all()} == {"R1", "6", "X7"}
+
+
+def test_import_streams_read_only_workbook_in_chunks(app, tmp_path):
+    with app.app_context():
+        db.session.add(Subject(subject_code="ENG", subject_name="ENG", subject_type="CORE"))
+        db.session.commit()
+
+        rows = [[str(i), f"S{i}", "A", "IT", "MATHS"] for i in range(1, 12)]
+        rows[6] = ["7", None, "A", "IT", "MATHS"]
+        path = tmp_path / "admissions.xlsx"
+        _workbook({"A": rows}).save(path)
+
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            with patch("services.student_import.db.session.execute", wraps=db.session.execute) as execute:
+                created, errors = import_students(wb, BATCH, chunk_size=4)
+        finally:
+            wb.close()
+
+        assert created == 10
+        assert errors == ["Sheet 'A', Row 8: Missing required fields (Roll Number, Name, Division)"]
+        assert Student.query.count() == 10
+        assert Mark.query.count() == 10
+        # three chunks, each written with one student insert and one mark insert
+        inserts = [c for c in execute.call_args_list if "INSERT" in str(c.args[0]).upper()]
+        assert len(inserts) == 6
@@ -0,0 +1,117 @@
+import threading
+import pytest
+from unittest.mock import patch
+from app import create_app, db
+import config
+from models import Subject
+from services import subject_catalog
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def test_lookups_by_id_code_and_name(app):
+    with app.app_context():
+        db.session.add_all([
+            Subject(subject_code="ENG", subject_name="English", subject_type="CORE"),
+            Subject(subject_code="PE", subject_name="Physical Education",
+                    subject_type="CORE", subject_eval_type="GRADE"),
+        ])
+        db.session.commit()
+        eng = Subject.query.filter_by(subject_code="ENG").first()
+
+        assert subject_catalog.get_subject(eng.subject_id).subject_code == "ENG"
+        assert subject_catalog.get_subject(str(eng.subject_id)).subject_code == "ENG"
+        assert subject_catalog.get_subject_by_code("eng").subject_id == eng.subject_id
+        assert subject_catalog.find_subject("Physical Education").subject_code == "PE"
+        assert subject_catalog.find_subject(str(eng.subject_id)).subject_code == "ENG"
+        assert subject_catalog.find_subject("XYZ") is None
+        assert subject_catalog.eval_type(eng.subject_id) == "MARKS"
+        assert [s.subject_code for s in subject_catalog.all_subjects()] == ["ENG", "PE"]
+
+
+def test_orm_writes_invalidate_the_catalog(app):
+    with app.app_context():
+        db.session.add(Subject(subject_code="ENG", subject_name="English", subject_type="CORE"))
+        db.session.commit()
+        assert [s.subject_code for s in subject_catalog.all_subjects(active_only=True)] == ["ENG"]
+
+        db.session.add(Subject(subject_code="ECO", subject_name="Economics", subject_type="CORE"))
+        eng = Subject.query.filter_by(subject_code="ENG").first()
+        eng.active = False
+        db.session.commit()
+
+        assert [s.subject_code for s in subject_catalog.all_subjects(active_only=True)] == ["ECO"]
+        assert subject_catalog.get_subject_by_code("ECO") is not None
+
+
+def test_mark_subject_validation_uses_catalog(app):
+    from sqlalchemy import event
+    from models import Mark
+
+    with app.app_context():
+        db.session.add_all([
+            Subject(subject_code="ENG", subject_name="English", subject_type="CORE"),
+            Subject(subject_code="PE", subject_name="Physical Education",
+                    subject_type="CORE", subject_eval_type="GRADE"),
+        ])
+        db.session.commit()
+        eng = subject_catalog.get_subject_by_code("ENG")
+        pe = subject_catalog.get_subject_by_code("PE")
+
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            marks = [Mark(roll_no=str(i), division="A", subject_id=eng.subject_id, batch_id="2025-2026")
+                     for i in range(20)]
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        assert len(marks) == 20
+        assert statements == []
+
+        with pytest.raises(ValueError, match="grade-only"):
+            Mark(roll_no="1", division="A", subject_id=pe.subject_id, batch_id="2025-2026")
+        with pytest.raises(ValueError, match="Invalid subject"):
+            Mark(roll_no="1", division="A", subject_id=9999, batch_id="2025-2026")
+
+
+class _GuardLock:
+    """Stands in for the catalog lock; fails instead of hanging on re-entry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        assert self._lock.acquire(timeout=5), "catalog lock re-entered"
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def test_reload_with_dirty_subject_does_not_deadlock(app):
+    with app.app_context():
+        db.session.add(Subject(subject_code="ENG", subject_name="English", subject_type="CORE"))
+        db.session.commit()
+        subject_catalog.invalidate()
+
+        eng = Subject.query.filter_by(subject_code="ENG").first()
+        eng.subject_name = "English Language"   # pending change -> autoflush during the reload
+        with patch.object(subject_catalog, "_catalog_lock", _GuardLock()):
+            assert subject_catalog.find_subject("English Language").subject_code == "ENG"
+        db.session.commit()
+        assert subject_catalog.find_subject("English Language").subject_code == "ENG"
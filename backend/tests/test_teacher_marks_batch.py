@@ -0,0 +1,139 @@
+import pytest
+from unittest.mock import patch
+from app import create_app, db
+import config
+from auth import generate_token, hash_password
+from models import Student, Mark, Subject, Teacher, TeacherSubjectAllocation
+
+BATCH = "2025-2026"
+
+
+@pytest.fixture
+def app():
+    with patch.object(config.Config, 'SQLALCHEMY_DATABASE_URI', "sqlite:///:memory:"), \
+            patch("app.get_active_batch", return_value=BATCH), \
+            patch("routes.teacher_routes.enqueue_division_results", return_value={"job_id": 1}):
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        app.config["TESTING"] = True
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+
+def _seed():
+    subjects = {
+        code: Subject(subject_code=code, subject_name=code, subject_type=t, subject_eval_type=ev)
+        for code, t, ev in [("ENG", "CORE", "MARKS"), ("IT", "OPTIONAL", "MARKS"),
+                            ("HINDI", "OPTIONAL", "MARKS"), ("PE", "CORE", "GRADE")]
+    }
+    db.session.add_all(subjects.values())
+    teacher = Teacher(name="T", userid="t1", password_hash=hash_password("x"))
+    db.session.add(teacher)
+    db.session.commit()
+    db.session.add(TeacherSubjectAllocation(teacher_id=teacher.teacher_id,
+                                            subject_id=subjects["IT"].subject_id, division="A"))
+    for roll in ("1", "2"):
+        db.session.add(Student(roll_no=roll, name=f"S{roll}", division="A", batch_id=BATCH,
+                               optional_subject="IT", optional_subject_2="MATHS"))
+    db.session.commit()
+    return teacher, {c: s.subject_id for c, s in subjects.items()}
+
+
+def test_batch_upsert_inserts_updates_and_reports_per_row(app):
+    with app.app_context():
+        teacher, sid = _seed()
+        db.session.add(Mark(roll_no="1", division="A", subject_id=sid["ENG"], batch_id=BATCH,
+                            unit1=1, entered_by=teacher.teacher_id))
+        db.session.commit()
+
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(teacher.teacher_id, 'TEACHER')}"}
+        entries = [
+            {"roll_no": "1", "division": "A", "subject_id": sid["ENG"], "unit1": 20, "term": 40, "annual": 70},
+            {"roll_no": "2", "division": "A", "subject_id": "IT", "unit1": 10},
+            {"roll_no": "2", "division": "A", "subject_id": "IT", "unit1": 12},
+            {"roll_no": "9", "division": "A", "subject_id": sid["ENG"]},
+            {"roll_no": "1", "division": "A", "subject_id": "HINDI"},
+            {"roll_no": "1", "division": "A", "subject_id": sid["PE"]},
+            {"roll_no": "2", "division": "A", "subject_id": sid["ENG"], "unit1": 99},
+            {"roll_no": "2", "division": "A"},
+        ]
+        resp = client.post("/teacher/marks/batch", json={"entries": entries}, headers=headers)
+
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert len(body["saved"]) == 3
+        assert [(w["index"], w["error"]) for w in body["validation_warnings"]] == [
+            (4, "student not found"),
+            (5, "not authorized for subject/division"),
+            (6, "PE is a grade-only subject and cannot have numeric marks"),
+            (7, "one or more marks out of allowed ranges"),
+            (8, "roll_no, division and subject_id are required"),
+        ]
+
+        db.session.expire_all()
+        marks = {(m.roll_no, m.subject_id): m for m in Mark.query.all()}
+        assert len(marks) == 2
+        eng = marks[("1", sid["ENG"])]
+        assert (eng.unit1, eng.tot, eng.sub_avg) == (20, 130, 65)
+        assert marks[("2", sid["IT"])].unit1 == 12
+        assert marks[("2", sid["IT"])].entered_by == teacher.teacher_id
+
+
+def _upload(rows):
+    import io
+    import openpyxl
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["roll", "name", "division", "subject", "unit1", "unit2", "term", "annual", "internal"])
+    for row in rows:
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return {"file": (buf, "marks.xlsx")}
+
+
+def test_upload_apply_and_preview_resolve_rows_in_bulk(app):
+    with app.app_context():
+        teacher, sid = _seed()
+        db.session.add(TeacherSubjectAllocation(teacher_id=teacher.teacher_id,
+                                                subject_id=sid["PE"], division="A"))
+        db.session.commit()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {generate_token(teacher.teacher_id, 'TEACHER')}"}
+        rows = [
+            ["1", "S1", "A", "ENG", 20, 20, 40, 70, 2],
+            ["2", "S2", "A", "IT", 10, 10, 30, 50, 0],
+            ["1", "S1", "A", "PE", 10, 10, 10, 10, 0],
+            ["2", "S2", "A", "ENG", 30, 0, 0, 0, 0],
+            ["7", "S7", "A", "ENG", 1, 1, 1, 1, 0],
+        ]
+
+        resp = client.post("/teacher/marks/upload-apply", data=_upload(rows), headers=headers,
+                           content_type="multipart/form-data")
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert body["saved"] == [
+            {"roll_no": "1", "division": "A", "subject_id": sid["ENG"]},
+            {"roll_no": "2", "division": "A", "subject_id": sid["IT"]},
+        ]
+        assert [m["reason"] for m in body["missing"]] == [
+            "PE is a grade-only subject and cannot have numeric marks",
+            "marks out of allowed ranges",
+            "student not found",
+        ]
+        db.session.expire_all()
+        eng = Mark.query.filter_by(roll_no="1", subject_id=sid["ENG"]).first()
+        assert (eng.tot, eng.sub_avg, eng.entered_by) == (152, 76, teacher.teacher_id)
+
+        resp = client.post("/teacher/marks/from-excel", data=_upload(rows[:2]), headers=headers,
+                           content_type="multipart/form-data")
+        assert resp.status_code == 200
+        matched = resp.get_json()["matched"]
+        assert [m["mark"]["mark_id"] is not None for m in matched] == [True, True]
+        assert matched[0]["mark"]["internal"] == 2
@@ -7,6 +7,8 @@ export default function BatchSelector() {
   const [active, setActive] = useState(null);
   const [loading, setLoading] = useState(false);
   const [newBatchId, setNewBatchId] = useState("");
+  // Batch viewed in this tab only (sent as X-Batch-Id by services/api.js)
+  const [override, setOverride] = useState(() => sessionStorage.getItem("batchOverride") || "");
 
   const isAdmin = user && (user.role || "").toUpperCase() === "ADMIN";
 
@@ -66,6 +68,17 @@ export default function BatchSelector() {
     }
   };
 
+  const handleOverrideChange = (ev) => {
+    const batch = ev.target.value;
+    if (batch && batch !== active) {
+      sessionStorage.setItem("batchOverride", batch);
+    } else {
+      sessionStorage.removeItem("batchOverride");
+    }
+    setOverride(batch && batch !== active ? batch : "");
+    window.location.reload();
+  };
+
   const handleCreate = async () => {
     const bid = (newBatchId || "").toString().trim();
     if (!bid) return alert("Enter batch id (e.g. 25-26)");
@@ -110,6 +123,26 @@ export default function BatchSelector() {
         <div style={{ fontWeight: 600 }}>Batch: {active || "—"}</div>
       )}
 
+      {/* Per-tab view: another batch in this tab without switching the global one */}
+      {isAdmin && batches.length > 1 && (
+        <select
+          value={override}
+          onChange={handleOverrideChange}
+          disabled={loading}
+          title="Batch shown in this tab only"
+          style={override ? { fontWeight: 600 } : undefined}
+        >
+          <option value="">This tab: active batch</option>
+          {batches
+            .filter((b) => (b.batch_id || b) !== active)
+            .map((b) => (
+              <option key={b.batch_id || b} value={b.batch_id || b}>
+                This tab: {b.batch_id || b}
+              </option>
+            ))}
+        </select>
+      )}
+
       {/* Admin create form */}
       {isAdmin && (
         <div style={{ display: "flex", gap: 6, alignItems: "center" }}>
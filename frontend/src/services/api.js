@@ -29,6 +29,12 @@ api.interceptors.request.use((config) => {
     config.headers.Authorization = `Bearer ${token}`;
   }
 
+  // Per-tab batch (e.g. reviewing last year) without switching the global one
+  const batchOverride = sessionStorage.getItem("batchOverride");
+  if (batchOverride) {
+    config.headers["X-Batch-Id"] = batchOverride;
+  }
+
   // 🔒 Cache busting (safe across DB switch)
   if (config.method === "get") {
     config.params = config.params || {};
@@ -48,6 +54,15 @@ api.interceptors.response.use(
       return Promise.reject(err);
     }
 
+    // Per-tab batch no longer registered: fall back to the active batch
+    if (
+      err.response?.status === 400 &&
+      sessionStorage.getItem("batchOverride") &&
+      String(err.response?.data?.error || "").startsWith("Unknown batch")
+    ) {
+      sessionStorage.removeItem("batchOverride");
+    }
+
     if (err.response?.status === 401) {
       err.message = "Session expired. Please login again.";
     } else if (err.response?.status === 403) {